@@ -1,20 +1,480 @@
+import gc
+import os
+import re
+import itertools
+import time
+import bisect
+import sqlite3
+from collections import defaultdict, namedtuple
 from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QListWidget, QPushButton, QMessageBox, QApplication
-from PyQt5.QtCore import QUrl
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListView, QPushButton, QMessageBox, QApplication,
+                             QInputDialog, QAbstractItemView, QLineEdit)
+from PyQt5.QtCore import QUrl, Qt, QObject, QAbstractListModel, QModelIndex, QStandardPaths, pyqtSignal
 
+BOOKMARKS_FILE = "bookmarks.db"
+PAGE_SIZE = 1000  # Rows the bookmark list loads at a time as it scrolls
+
+WORD_PATTERN = re.compile(r"\w+")
+URL_SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://(www\d*\.)?")
+SHORT_PREFIX_LENGTH = 2  # Prefixes up to this length keep a precomputed id set, since they match the most words
+MIN_INFIX_LENGTH = 3  # Shorter terms only match word prefixes
+MATCH_CACHE_SIZE = 64
+
+Bookmark = namedtuple("Bookmark", ["id", "title", "url", "folder"])
+
+
+def bookmarks_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, BOOKMARKS_FILE)
+
+
+class BookmarkStore(QObject):
+    """SQLite bookmark store with a unique URL index, folders and tags."""
+
+    bookmark_added = pyqtSignal(object)
+    bookmark_removed = pyqtSignal(object)
+    bookmark_changed = pyqtSignal(object)
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self._index = None
+        self.db = sqlite3.connect(path or bookmarks_path())
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS bookmarks (
+                    id INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    url TEXT NOT NULL UNIQUE,
+                    folder TEXT NOT NULL DEFAULT '',
+                    created REAL NOT NULL
+                )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS bookmarks_folder ON bookmarks (folder)")
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS bookmark_tags (
+                    bookmark_id INTEGER NOT NULL REFERENCES bookmarks (id) ON DELETE CASCADE,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (tag, bookmark_id)
+                )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS bookmark_tags_bookmark ON bookmark_tags (bookmark_id)")
+
+    def index(self):
+        """Return the search index, building it on first use and keeping it in step with later changes."""
+        if self._index is None:
+            self._index = BookmarkIndex(self.all())
+            self.bookmark_added.connect(self._index.add)
+            self.bookmark_removed.connect(self._index.remove)
+            self.bookmark_changed.connect(self._index.update)
+        return self._index
+
+    def has_index(self):
+        return self._index is not None
+
+    def contains(self, url):
+        return self.get(url) is not None
+
+    def get(self, url):
+        row = self.db.execute("SELECT id, title, url, folder FROM bookmarks WHERE url = ?", (url,)).fetchone()
+        return Bookmark(*row) if row else None
+
+    def all(self):
+        return [Bookmark(*row) for row in self.db.execute("SELECT id, title, url, folder FROM bookmarks ORDER BY id")]
+
+    def page(self, after_id, limit):
+        """Return up to limit bookmarks with an id above after_id; keyset paging stays correct across deletes."""
+        return [Bookmark(*row) for row in self.db.execute(
+            "SELECT id, title, url, folder FROM bookmarks WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))]
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0]
+
+    def add(self, title, url, folder="", tags=()):
+        """Add a bookmark and return it, or None if the URL is already bookmarked."""
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO bookmarks (title, url, folder, created) VALUES (?, ?, ?, ?)",
+                (title or url, url, folder, time.time()))
+            if not cursor.rowcount:
+                return None
+            bookmark = Bookmark(cursor.lastrowid, title or url, url, folder)
+            self.db.executemany("INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag) VALUES (?, ?)",
+                                [(bookmark.id, tag) for tag in tags])
+        self.bookmark_added.emit(bookmark)
+        return bookmark
+
+    def remove(self, url):
+        bookmark = self.get(url)
+        if bookmark is None:
+            return False
+        with self.db:
+            self.db.execute("DELETE FROM bookmarks WHERE id = ?", (bookmark.id,))
+        self.bookmark_removed.emit(bookmark)
+        return True
+
+    def set_folder(self, url, folder):
+        bookmark = self.get(url)
+        if bookmark is None:
+            return
+        with self.db:
+            self.db.execute("UPDATE bookmarks SET folder = ? WHERE id = ?", (folder, bookmark.id))
+        self.bookmark_changed.emit(bookmark._replace(folder=folder))
+
+    def folders(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT folder FROM bookmarks WHERE folder != '' ORDER BY folder")]
+
+    def tags(self, url):
+        return [row[0] for row in self.db.execute(
+            "SELECT tag FROM bookmark_tags JOIN bookmarks ON bookmarks.id = bookmark_id WHERE url = ? ORDER BY tag",
+            (url,))]
+
+    def set_tags(self, url, tags):
+        bookmark = self.get(url)
+        if bookmark is None:
+            return
+        with self.db:
+            self.db.execute("DELETE FROM bookmark_tags WHERE bookmark_id = ?", (bookmark.id,))
+            self.db.executemany("INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag) VALUES (?, ?)",
+                                [(bookmark.id, tag) for tag in tags])
+        self.bookmark_changed.emit(bookmark)
+
+    def with_tag(self, tag):
+        return [Bookmark(*row) for row in self.db.execute(
+            "SELECT id, title, url, folder FROM bookmarks JOIN bookmark_tags ON bookmark_id = id WHERE tag = ?"
+            " ORDER BY id", (tag,))]
+
+
+def title_words(title):
+    return set(WORD_PATTERN.findall(title.lower()))
+
+
+def url_words(url):
+    # Scheme and www carry no information and would match every bookmark
+    return set(WORD_PATTERN.findall(URL_SCHEME_PATTERN.sub("", url.lower())))
+
+
+def trigrams(word):
+    # Numbers in URLs (ids, dates) are mostly unique, so indexing their trigrams costs far more than it finds
+    if word.isdigit():
+        return set()
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class WordIndex:
+    """Maps words to bookmark ids, with a sorted vocabulary for prefix lookups and trigrams for infix lookups."""
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.short_prefixes = {}
+        self.trigrams = {}
+
+    def build(self, documents):
+        """Bulk load (bookmark id, words) pairs; much faster than repeated add()."""
+        postings = defaultdict(set)
+        for bookmark_id, words in documents:
+            for word in words:
+                postings[word].add(bookmark_id)
+        short_prefixes = defaultdict(set)
+        word_trigrams = defaultdict(set)
+        for word, ids in postings.items():
+            for length in range(1, min(len(word), SHORT_PREFIX_LENGTH) + 1):
+                short_prefixes[word[:length]].update(ids)
+            for gram in trigrams(word):
+                word_trigrams[gram].add(word)
+        self.postings = dict(postings)
+        self.vocabulary = sorted(postings)
+        self.short_prefixes = dict(short_prefixes)
+        self.trigrams = dict(word_trigrams)
+
+    def add(self, bookmark_id, words):
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.vocabulary, word)
+                for gram in trigrams(word):
+                    self.trigrams.setdefault(gram, set()).add(word)
+            ids.add(bookmark_id)
+            for length in range(1, min(len(word), SHORT_PREFIX_LENGTH) + 1):
+                self.short_prefixes.setdefault(word[:length], set()).add(bookmark_id)
+
+    def remove(self, bookmark_id, words):
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(bookmark_id)
+            for length in range(1, min(len(word), SHORT_PREFIX_LENGTH) + 1):
+                self.short_prefixes[word[:length]].discard(bookmark_id)
+            if not ids:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+                for gram in trigrams(word):
+                    self.trigrams[gram].discard(word)
+
+    def exact(self, term):
+        return self.postings.get(term, set())
+
+    def prefix(self, term):
+        """Ids of bookmarks with a word starting with term. The result may be shared, so do not modify it."""
+        if len(term) <= SHORT_PREFIX_LENGTH:
+            return self.short_prefixes.get(term, set())
+        position = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + "\uffff", position)
+        if end - position == 1:
+            return self.postings[self.vocabulary[position]]
+        return set().union(*(self.postings[word] for word in self.vocabulary[position:end]))
+
+    def infix(self, term):
+        """Ids of bookmarks with a word containing term past its first letter; prefix() already covers the rest."""
+        grams = sorted((self.trigrams.get(gram, set()) for gram in trigrams(term)), key=len)
+        if not grams:
+            return set()
+        words = grams[0].intersection(*grams[1:])
+        return set().union(*(self.postings[word] for word in words if term in word and not word.startswith(term)))
+
+
+def ranked(buckets):
+    """Yield ids bucket by bucket, lowest score first and oldest first within a bucket.
+
+    Buckets are only sorted once the consumer gets to them, so showing the first page of a huge match is cheap.
+    """
+    for score in sorted(buckets):
+        yield from sorted(buckets[score])
+
+
+class BookmarkIndex:
+    """In-memory prefix/trigram index over bookmark titles and URLs for as-you-type filtering."""
+
+    def __init__(self, bookmarks=()):
+        self.bookmarks = {}
+        self.matches = {}  # Term -> tiers, so earlier words of a query are not matched again on every keystroke
+        self.title_index = WordIndex()
+        self.url_index = WordIndex()
+        for bookmark in bookmarks:
+            self.bookmarks[bookmark.id] = bookmark
+        # The build allocates hundreds of thousands of sets that all live on, so cyclic GC passes would only slow it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.title_index.build((bookmark.id, title_words(bookmark.title)) for bookmark in self.bookmarks.values())
+            self.url_index.build((bookmark.id, url_words(bookmark.url)) for bookmark in self.bookmarks.values())
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def __len__(self):
+        return len(self.bookmarks)
+
+    def add(self, bookmark):
+        self.matches.clear()
+        self.bookmarks[bookmark.id] = bookmark
+        self.title_index.add(bookmark.id, title_words(bookmark.title))
+        self.url_index.add(bookmark.id, url_words(bookmark.url))
+
+    def remove(self, bookmark):
+        bookmark = self.bookmarks.pop(bookmark.id, None)
+        if bookmark is not None:
+            self.matches.clear()
+            self.title_index.remove(bookmark.id, title_words(bookmark.title))
+            self.url_index.remove(bookmark.id, url_words(bookmark.url))
+
+    def update(self, bookmark):
+        self.remove(bookmark)
+        self.add(bookmark)
+
+    def match(self, term):
+        """Return the ids matching one term as disjoint tiers, best first: exact title word, title prefix, URL prefix, infix."""
+        tiers = self.matches.get(term)
+        if tiers is not None:
+            return tiers
+        exact = self.title_index.exact(term)
+        title = self.title_index.prefix(term)
+        url = self.url_index.prefix(term)
+        # exact is a subset of title, so equal sizes mean the term is a whole word and nothing else starts with it
+        tiers = [exact, title - exact if len(title) > len(exact) else set(), url - title]
+        if len(term) >= MIN_INFIX_LENGTH:
+            infix = self.title_index.infix(term)
+            infix |= self.url_index.infix(term)
+            tiers.append(infix - title - url)
+        if len(self.matches) >= MATCH_CACHE_SIZE:
+            self.matches.clear()
+        self.matches[term] = tiers
+        return tiers
+
+    def search(self, query):
+        """Return an iterator over the ids matching every term, best first, or None if the query is empty.
+
+        Ids are ranked by the sum of their tier for each term. Ranking works on whole sets rather than per id,
+        so the cost stays in C even when a one-letter query matches most bookmarks.
+        """
+        terms = list(dict.fromkeys(WORD_PATTERN.findall(query.lower())))
+        if not terms:
+            return None
+        buckets = {rank: tier for rank, tier in enumerate(self.match(terms[0])) if tier}
+        for term in terms[1:]:
+            tiers = self.match(term)
+            merged = {}
+            for score, ids in buckets.items():
+                for rank, tier in enumerate(tiers):
+                    both = ids & tier
+                    if both:
+                        merged.setdefault(score + rank, set()).update(both)
+            buckets = merged
+        return ranked(buckets)
+
+
+class BookmarkModel(QAbstractListModel):
+    """Paged list model over a BookmarkStore that applies adds and removes as incremental row changes.
+
+    With a filter set, it pages through ranked search results instead of the store.
+    """
+
+    UrlRole = Qt.UserRole + 1
+    TitleRole = Qt.UserRole + 2
+    FolderRole = Qt.UserRole + 3
+
+    def __init__(self, store, site_cache=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.site_cache = site_cache  # Site_cache.SiteCache the favicons come from, if any
+        self.bookmarks = []
+        self.exhausted = False  # True once every stored bookmark (or search result) has been fetched
+        self.results = None  # Iterator over ranked bookmark ids while a filter is set
+        self.bookmarks = self.next_page()
+        store.bookmark_added.connect(self.on_bookmark_added)
+        store.bookmark_removed.connect(self.on_bookmark_removed)
+        store.bookmark_changed.connect(self.on_bookmark_changed)
+        if site_cache is not None:
+            site_cache.icon_changed.connect(self.on_icon_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.bookmarks)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        page = self.next_page()
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.bookmarks), len(self.bookmarks) + len(page) - 1)
+            self.bookmarks.extend(page)
+            self.endInsertRows()
+
+    def next_page(self):
+        """Bookmarks that follow the loaded ones, noting when there are no more."""
+        if self.results is not None:
+            bookmarks = self.store.index().bookmarks
+            ids = list(itertools.islice(self.results, PAGE_SIZE))
+            self.exhausted = len(ids) < PAGE_SIZE
+            # Bookmarks removed since the search are skipped
+            page = [bookmarks[bookmark_id] for bookmark_id in ids if bookmark_id in bookmarks]
+        else:
+            last_id = self.bookmarks[-1].id if self.bookmarks else 0
+            page = self.store.page(last_id, PAGE_SIZE)
+            self.exhausted = len(page) < PAGE_SIZE
+        return page
+
+    def set_filter(self, results):
+        """Show ranked bookmark ids from BookmarkIndex.search(), or every bookmark again if results is None."""
+        self.beginResetModel()
+        self.results = results
+        self.bookmarks = []
+        self.bookmarks = self.next_page()  # Row inserts are not allowed inside a reset
+        self.endResetModel()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        bookmark = self.bookmarks[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{bookmark.title} - {bookmark.url}"
+        if role == Qt.ToolTipRole:
+            return f"{bookmark.folder}/{bookmark.title}" if bookmark.folder else bookmark.url
+        if role == Qt.DecorationRole and self.site_cache is not None:
+            return self.site_cache.icon(bookmark.url)
+        if role == self.UrlRole:
+            return bookmark.url
+        if role == self.TitleRole:
+            return bookmark.title
+        if role == self.FolderRole:
+            return bookmark.folder
+        return None
+
+    def row_of(self, bookmark_id):
+        """Binary search for a bookmark's row; unfiltered rows are always in ascending id order."""
+        if self.results is not None:
+            return next((row for row, bookmark in enumerate(self.bookmarks) if bookmark.id == bookmark_id), -1)
+        low, high = 0, len(self.bookmarks)
+        while low < high:
+            middle = (low + high) // 2
+            if self.bookmarks[middle].id < bookmark_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.bookmarks) and self.bookmarks[low].id == bookmark_id:
+            return low
+        return -1
+
+    def on_bookmark_added(self, bookmark):
+        if self.results is not None:
+            return  # Filtered rows are ranked, so a new bookmark shows up when the filter next changes
+        if not self.exhausted:
+            return  # New bookmarks have the highest ids, so a later fetchMore picks them up
+        row = len(self.bookmarks)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.bookmarks.append(bookmark)
+        self.endInsertRows()
+
+    def on_bookmark_removed(self, bookmark):
+        row = self.row_of(bookmark.id)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.bookmarks[row]
+            self.endRemoveRows()
+
+    def on_bookmark_changed(self, bookmark):
+        row = self.row_of(bookmark.id)
+        if row >= 0:
+            self.bookmarks[row] = bookmark
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def on_icon_changed(self, host):
+        # Only the visible rows ask for their icon again, so repainting them all is cheap
+        if self.bookmarks:
+            self.dataChanged.emit(self.index(0), self.index(len(self.bookmarks) - 1), [Qt.DecorationRole])
 
 
 class BookmarkManager(QDialog):
-    def __init__(self, parent=None, bookmarks=None):
+    def __init__(self, parent=None, store=None, site_cache=None):
         super().__init__(parent)
         self.setWindowTitle("Bookmark Manager")
         self.setGeometry(300, 200, 400, 300)
         self.setWindowIcon(QIcon("favicon.ico"))
 
         self.layout = QVBoxLayout(self)
+        self.store = store if store is not None else BookmarkStore()
+
+        # Filter box that narrows the list as you type
+        self.filter_edit = QLineEdit(self)
+        self.filter_edit.setPlaceholderText("Filter bookmarks...")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.layout.addWidget(self.filter_edit)
 
-        # List widget to display the bookmarks
-        self.bookmark_list = QListWidget(self)
+        # List view to display the bookmarks
+        self.model = BookmarkModel(self.store, site_cache, self)
+        self.bookmark_list = QListView(self)
+        self.bookmark_list.setUniformItemSizes(True)  # Lets the view lay out 100k rows without measuring each
+        self.bookmark_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.bookmark_list.setModel(self.model)
+        self.bookmark_list.doubleClicked.connect(self.visit_bookmark)
         self.layout.addWidget(self.bookmark_list)
 
         # Button to visit selected bookmark
@@ -22,59 +482,80 @@ class BookmarkManager(QDialog):
         self.visit_button.clicked.connect(self.visit_bookmark)
         self.layout.addWidget(self.visit_button)
 
+        # Buttons to organize the selected bookmarks
+        organize_layout = QHBoxLayout()
+        self.folder_button = QPushButton("Move to Folder...", self)
+        self.folder_button.clicked.connect(self.move_selected_to_folder)
+        organize_layout.addWidget(self.folder_button)
+        self.tags_button = QPushButton("Edit Tags...", self)
+        self.tags_button.clicked.connect(self.edit_selected_tags)
+        organize_layout.addWidget(self.tags_button)
+        self.layout.addLayout(organize_layout)
+
         # Button to remove selected bookmark
         self.remove_button = QPushButton("Remove", self)
         self.remove_button.clicked.connect(self.remove_selected_bookmark)
         self.layout.addWidget(self.remove_button)
 
-        # Initialize bookmarks list
-        self.bookmarks = bookmarks if bookmarks else []
-        self.load_bookmarks()
+    def apply_filter(self, text):
+        if not self.store.has_index():
+            # The index is built on first use, which takes a moment with many bookmarks
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.store.index()
+            finally:
+                QApplication.restoreOverrideCursor()
+        self.model.set_filter(self.store.index().search(text))
 
-    def load_bookmarks(self):
-        """Load bookmarks and display them in the list."""
-        self.bookmark_list.clear()
-        for title, url in self.bookmarks:
-            self.bookmark_list.addItem(f"{title} - {url}")
+    def selected_urls(self):
+        return [index.data(BookmarkModel.UrlRole) for index in self.bookmark_list.selectionModel().selectedRows()]
 
     def add_bookmark(self, title, url):
-        """Add a new bookmark and refresh the list."""
-        self.bookmarks.append((title, url))
-        self.load_bookmarks()
+        """Add a new bookmark; the list picks it up through the model."""
+        self.store.add(title, url)
 
     def visit_bookmark(self):
-        """Visit the selected bookmark."""
-        selected_items = self.bookmark_list.selectedItems()
-        for item in selected_items:
-            bookmark = item.text().split(" - ")
-            url = bookmark[1]
+        """Open the selected bookmarks in new browser tabs."""
+        for url in self.selected_urls():
+            if hasattr(self.parent(), "add_new_tab"):
+                self.parent().add_new_tab(url)
+            else:
+                print(f"Visiting: {url}")  # Running on its own there is no browser to open the URL in
 
-            # Here, we simulate opening the URL in a new tab in a browser
-            # You should replace this with actual browser functionality in your project
-            print(f"Visiting: {url}")  # This simulates opening a URL in a new tab
+    def move_selected_to_folder(self):
+        urls = self.selected_urls()
+        if not urls:
+            return
+        folder, ok = QInputDialog.getItem(self, "Move to Folder", "Folder:", [""] + self.store.folders(), 0, True)
+        if ok:
+            for url in urls:
+                self.store.set_folder(url, folder.strip())
 
-            # Actual browser tab opening should be implemented in the parent
-            # current_webview = self.parent().tab_widget.currentWidget()
-            # if current_webview:
-            #     current_webview.load(QUrl(url))
+    def edit_selected_tags(self):
+        urls = self.selected_urls()
+        if not urls:
+            return
+        current = ", ".join(self.store.tags(urls[0]))
+        text, ok = QInputDialog.getText(self, "Edit Tags", "Tags (comma separated):", text=current)
+        if ok:
+            tags = [tag.strip() for tag in text.split(",") if tag.strip()]
+            for url in urls:
+                self.store.set_tags(url, tags)
 
     def remove_selected_bookmark(self):
         """Remove the selected bookmark(s) after confirmation."""
-        selected_items = self.bookmark_list.selectedItems()
-        if selected_items:
-            for item in selected_items:
-                bookmark = item.text().split(" - ")
-                url = bookmark[1]
-
-                # Confirm deletion for each selected bookmark
-                confirmation = QMessageBox.question(self, "Confirm Removal",
-                                                    f"Are you sure you want to remove the bookmark '{bookmark[0]}'?",
-                                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-
-                if confirmation == QMessageBox.Yes:
-                    # Remove the bookmark
-                    self.bookmarks = [bm for bm in self.bookmarks if bm[1] != url]
-            self.load_bookmarks()  # Reload the updated bookmark list
+        indexes = self.bookmark_list.selectionModel().selectedRows()
+        if indexes:
+            if len(indexes) == 1:
+                question = f"Are you sure you want to remove the bookmark '{indexes[0].data(BookmarkModel.TitleRole)}'?"
+            else:
+                question = f"Are you sure you want to remove {len(indexes)} bookmarks?"
+            confirmation = QMessageBox.question(self, "Confirm Removal", question,
+                                                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+
+            if confirmation == QMessageBox.Yes:
+                for url in [index.data(BookmarkModel.UrlRole) for index in indexes]:
+                    self.store.remove(url)
 
     def exec_(self):
         """Override exec_ to make sure the dialog is modal."""
@@ -86,6 +567,8 @@ class BookmarkManager(QDialog):
 # Test the BookmarkManager when run separately
 if __name__ == "__main__":
     app = QApplication([])
-    bookmarks = [("Google", "https://www.google.com"), ("PyQt5", "https://www.riverbankcomputing.com/software/pyqt/intro")]
-    window = BookmarkManager(bookmarks=bookmarks)
+    store = BookmarkStore(":memory:")
+    store.add("Google", "https://www.google.com")
+    store.add("PyQt5", "https://www.riverbankcomputing.com/software/pyqt/intro")
+    window = BookmarkManager(store=store)
     window.exec_()
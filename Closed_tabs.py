@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import uuid
+from PyQt5.QtCore import QObject, QIODevice, QSaveFile, QStandardPaths, QTimer, QUrl, pyqtSignal
+from PyQt5.QtWebEngineWidgets import QWebEngineDownloadItem, QWebEnginePage
+import Session_manager
+from Tab_manager import HAS_LIFECYCLE
+
+SNAPSHOT_DIRECTORY = "closed_tabs"
+INDEX_FILE = "closed_tabs.json"
+SNAPSHOT_SUFFIX = ".mhtml"
+DEFAULT_MAX_CLOSED_TABS = 25
+DEFAULT_SNAPSHOT_BUDGET_MB = 256  # 0 keeps the closed tabs without snapshots
+SAVE_TIMEOUT_MS = 30 * 1000  # A page still saving after this long is given up on and freed
+
+
+def snapshot_directory():
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), SNAPSHOT_DIRECTORY)
+
+
+class ClosedTabs(QObject):
+    """Recently closed tabs, newest last, each with an MHTML snapshot of its page on disk.
+
+    Snapshots are written in the background after the tab is gone and evicted oldest first once they pass the
+    disk budget; the list itself is kept across restarts.
+    """
+
+    changed = pyqtSignal()
+
+    def __init__(self, settings, directory=None, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.directory = directory or snapshot_directory()
+        os.makedirs(self.directory, exist_ok=True)
+        self.entries = self.load_index()
+        self.saving = {}  # Snapshot path -> (page being saved, its entry, the download writing it once it starts)
+        self.remove_unlisted()
+        self.load_settings()
+
+    def load_settings(self):
+        self.max_tabs = self.settings.value("closed_tabs/max_tabs", DEFAULT_MAX_CLOSED_TABS, type=int)
+        self.max_bytes = self.settings.value(
+            "closed_tabs/snapshot_budget_mb", DEFAULT_SNAPSHOT_BUDGET_MB, type=int) * 1024 * 1024
+        if self.enforce_limits():
+            self.save_index()
+            self.changed.emit()
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as file:
+                return [entry for entry in json.load(file) if entry.get("url")]
+        except (OSError, ValueError):
+            return []
+
+    def save_index(self):
+        file = QSaveFile(os.path.join(self.directory, INDEX_FILE))
+        if file.open(QIODevice.WriteOnly):
+            file.write(json.dumps(self.entries).encode("utf-8"))
+            file.commit()
+
+    def remove_unlisted(self):
+        """Delete snapshots no entry refers to, left behind by a crash or a reopened tab."""
+        listed = {entry.get("snapshot") for entry in self.entries}
+        for name in os.listdir(self.directory):
+            if name.endswith(SNAPSHOT_SUFFIX) and name not in listed:
+                self.remove_file(name)
+
+    def remove_file(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def snapshot_path(self, entry):
+        """The snapshot file of an entry, or None if it has none (yet)."""
+        name = entry.get("snapshot")
+        path = os.path.join(self.directory, name) if name else None
+        return path if path and os.path.exists(path) else None
+
+    def push(self, entry, page=None):
+        """Remember a closed tab from its session entry.
+
+        page, if given, is saved as the snapshot and then deleted, so the caller must no longer parent it. An entry
+        that already has a snapshot (a reopened tab closed again before its live page loaded) keeps it.
+        """
+        if self.max_tabs <= 0 or not entry.get("url"):
+            if page is not None:
+                page.setParent(self)
+                page.deleteLater()
+            return
+        entry = dict(entry, closed=time.time())
+        entry.setdefault("snapshot", None)
+        entry.setdefault("size", 0)
+        if page is not None:
+            page.setParent(self)
+            if entry["snapshot"] is None and self.max_bytes and QUrl(entry["url"]).scheme() in ("http", "https"):
+                self.save_snapshot(page, entry)
+            else:
+                page.deleteLater()
+        self.entries.append(entry)
+        self.enforce_limits()
+        self.save_index()
+        self.changed.emit()
+
+    def save_snapshot(self, page, entry):
+        if HAS_LIFECYCLE:
+            state = page.lifecycleState()
+            if state == QWebEnginePage.LifecycleState.Discarded:
+                page.deleteLater()  # Nothing left to save, and waking it would load the page again
+                return
+            if state == QWebEnginePage.LifecycleState.Frozen:
+                page.setLifecycleState(QWebEnginePage.LifecycleState.Active)  # Frozen pages cannot serialize
+        page.setAudioMuted(True)  # The page lives on until it is saved; the tab is already gone for the user
+        name = uuid.uuid4().hex + SNAPSHOT_SUFFIX
+        path = os.path.join(self.directory, name)
+        self.saving[path] = (page, entry, None)
+        page.save(path, QWebEngineDownloadItem.MHTMLSaveFormat)
+        QTimer.singleShot(SAVE_TIMEOUT_MS, lambda: self.save_timed_out(path))
+
+    def handle_download(self, download):
+        """Claim the page saves started for snapshots; returns False for every other download."""
+        path = download.path()
+        if download.savePageFormat() == QWebEngineDownloadItem.UnknownSaveFormat or path not in self.saving:
+            return False
+        page, entry, _ = self.saving[path]
+        self.saving[path] = (page, entry, download)
+        download.finished.connect(lambda: self.on_save_finished(path, download))
+        return True
+
+    def on_save_finished(self, path, download):
+        if path not in self.saving:
+            self.remove_file(os.path.basename(path))  # Cancelled after timing out; nothing refers to the file
+            return
+        self.snapshot_saved(path, download.state() == QWebEngineDownloadItem.DownloadCompleted)
+
+    def save_timed_out(self, path):
+        if path not in self.saving:
+            return  # Finished in time
+        download = self.saving[path][2]
+        self.snapshot_saved(path, False)
+        if download is not None:
+            download.cancel()  # Its finished signal removes whatever it wrote
+
+    def snapshot_saved(self, path, ok):
+        page, entry, _ = self.saving.pop(path)
+        page.deleteLater()
+        name = os.path.basename(path)
+        if not ok or not any(listed is entry for listed in self.entries):
+            self.remove_file(name)  # Failed, or the tab was reopened without its snapshot in the meantime
+            return
+        entry["snapshot"] = name
+        entry["size"] = os.path.getsize(path)
+        self.enforce_limits()
+        self.save_index()
+        self.changed.emit()
+
+    def enforce_limits(self):
+        """Drop the oldest entries past max_tabs and the oldest snapshots past the disk budget."""
+        changed = False
+        while len(self.entries) > max(self.max_tabs, 0):
+            self.forget(self.entries.pop(0))
+            changed = True
+        used = sum(entry["size"] for entry in self.entries)
+        for entry in self.entries:
+            if used <= self.max_bytes:
+                break
+            if entry["snapshot"]:
+                used -= entry["size"]
+                self.remove_file(entry["snapshot"])
+                entry.update(snapshot=None, size=0)
+                changed = True
+        return changed
+
+    def forget(self, entry):
+        if entry.get("snapshot"):
+            self.remove_file(entry["snapshot"])
+
+    def pop(self, position=-1):
+        """Take an entry off the list to reopen it; its snapshot file stays until release is called."""
+        if not self.entries:
+            return None
+        entry = self.entries.pop(position)
+        self.save_index()
+        self.changed.emit()
+        return entry
+
+    def release(self, entry):
+        """Delete the snapshot of a reopened entry once its live page has loaded."""
+        self.forget(entry)
+
+    def clear(self):
+        for entry in self.entries:
+            self.forget(entry)
+        self.entries = []
+        self.save_index()
+        self.changed.emit()
+
+
+class Revalidation(QObject):
+    """Shows a closed tab's snapshot in a web view while the live page loads off screen, then swaps it in.
+
+    failed is emitted when the live page does not load; the snapshot stays up and retry tries again. finished is
+    emitted once the snapshot is no longer needed, with True if the live page was swapped in and False if the
+    user navigated away from the snapshot first.
+    """
+
+    failed = pyqtSignal()
+    finished = pyqtSignal(bool)
+
+    def __init__(self, webview, entry, snapshot_path, profile, parent=None):
+        super().__init__(parent)
+        self.webview = webview
+        self.entry = entry
+        self.profile = profile
+        self.snapshot_page = webview.page()
+        self.live_page = None
+        webview.snapshot_entry = entry  # Session_manager saves the live page's entry, not the snapshot file
+        webview.load(QUrl.fromLocalFile(snapshot_path))
+        self.snapshot_page.urlChanged.connect(self.on_snapshot_url_changed)
+        self.retry()
+
+    def retry(self):
+        if self.live_page is not None:
+            self.live_page.deleteLater()
+        self.live_page = QWebEnginePage(self.profile, self.webview)
+        self.live_page.loadFinished.connect(self.on_live_loaded)
+        if not (self.entry.get("history")
+                and Session_manager.restore_history(self.live_page.history(), self.entry["history"])):
+            self.live_page.load(QUrl(self.entry["url"]))
+
+    def on_live_loaded(self, ok):
+        if not ok:
+            self.failed.emit()
+            return
+        self.snapshot_page.urlChanged.disconnect(self.on_snapshot_url_changed)
+        self.webview.setPage(self.live_page)
+        self.webview.setZoomFactor(self.entry.get("zoom", 1.0))
+        self.snapshot_page.deleteLater()
+        self.live_page.loadFinished.disconnect(self.on_live_loaded)
+        self.live_page = None
+        del self.webview.snapshot_entry
+        self.finished.emit(True)
+
+    def on_snapshot_url_changed(self, url):
+        if url.isEmpty() or url.isLocalFile():
+            return
+        # A link followed from the snapshot; the live page would now replace something else
+        self.snapshot_page.urlChanged.disconnect(self.on_snapshot_url_changed)
+        self.cancel()
+        del self.webview.snapshot_entry
+        self.finished.emit(False)
+
+    def cancel(self):
+        """Stop loading the live page, e.g. because the tab is being closed."""
+        if self.live_page is not None:
+            self.live_page.deleteLater()
+            self.live_page = None
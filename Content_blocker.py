@@ -0,0 +1,344 @@
+import os
+import re
+import sys
+import pickle
+import hashlib
+from PyQt5.QtCore import QThread, QUrl, QStandardPaths, pyqtSignal
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+
+FILTERS_DIRECTORY = "filters"  # Filter lists (*.txt) are read from here, both next to the browser and in app data
+BUILTIN_FILTERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), FILTERS_DIRECTORY)
+CACHE_FILE = "filters.bin"
+CACHE_VERSION = 1  # Bump when FilterRules changes shape so old caches are recompiled
+
+# Adblock Plus resource type options, as bits so a rule's types are one integer
+TYPE_OPTIONS = {
+    "script": 1, "image": 2, "stylesheet": 4, "object": 8, "xmlhttprequest": 16,
+    "subdocument": 32, "font": 64, "media": 128, "ping": 256, "other": 512,
+}
+ALL_TYPES = sum(TYPE_OPTIONS.values())
+RESOURCE_TYPES = {
+    QWebEngineUrlRequestInfo.ResourceTypeScript: TYPE_OPTIONS["script"],
+    QWebEngineUrlRequestInfo.ResourceTypeImage: TYPE_OPTIONS["image"],
+    QWebEngineUrlRequestInfo.ResourceTypeFavicon: TYPE_OPTIONS["image"],
+    QWebEngineUrlRequestInfo.ResourceTypeStylesheet: TYPE_OPTIONS["stylesheet"],
+    QWebEngineUrlRequestInfo.ResourceTypeObject: TYPE_OPTIONS["object"],
+    QWebEngineUrlRequestInfo.ResourceTypePluginResource: TYPE_OPTIONS["object"],
+    QWebEngineUrlRequestInfo.ResourceTypeXhr: TYPE_OPTIONS["xmlhttprequest"],
+    QWebEngineUrlRequestInfo.ResourceTypeSubFrame: TYPE_OPTIONS["subdocument"],
+    QWebEngineUrlRequestInfo.ResourceTypeFontResource: TYPE_OPTIONS["font"],
+    QWebEngineUrlRequestInfo.ResourceTypeMedia: TYPE_OPTIONS["media"],
+    QWebEngineUrlRequestInfo.ResourceTypePing: TYPE_OPTIONS["ping"],
+}
+BLOCKABLE_SCHEMES = ("http", "https", "ws", "wss")
+
+HOSTS_LINE = re.compile(r"^(?:0\.0\.0\.0|127\.0\.0\.1|::1?)\s+([^\s#]+)")
+PLAIN_DOMAIN = re.compile(r"^[a-z0-9_-]+(?:\.[a-z0-9_-]+)+$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9%]{3,}")
+HOSTS_IGNORED = {"localhost", "localhost.localdomain", "local", "broadcasthost", "0.0.0.0"}
+COSMETIC_MARKERS = ("##", "#@#", "#?#", "#$#")
+
+
+def filter_paths():
+    """Filter list files, sorted so the cache key does not depend on directory order."""
+    directories = [BUILTIN_FILTERS,
+                   os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), FILTERS_DIRECTORY)]
+    paths = []
+    for directory in directories:
+        if os.path.isdir(directory):
+            paths.extend(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".txt"))
+    return sorted(paths)
+
+
+def cache_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, CACHE_FILE)
+
+
+def host_suffixes(host):
+    """Yield host and each parent domain: a.b.com, b.com, com."""
+    yield host
+    dot = host.find(".")
+    while dot >= 0:
+        yield host[dot + 1:]
+        dot = host.find(".", dot + 1)
+
+
+def base_domain(host):
+    # Without a public suffix list, the last two labels are close enough to tell first from third party
+    return ".".join(host.rsplit(".", 2)[-2:])
+
+
+def pattern_regex(pattern):
+    """Translate an Adblock Plus URL pattern to a regular expression."""
+    regex = ""
+    if pattern.startswith("||"):
+        regex, pattern = r"^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?", pattern[2:]
+    elif pattern.startswith("|"):
+        regex, pattern = "^", pattern[1:]
+    end = ""
+    if pattern.endswith("|"):
+        end, pattern = "$", pattern[:-1]
+    for char in pattern:
+        if char == "*":
+            regex += ".*"
+        elif char == "^":
+            regex += r"(?:[^a-z0-9_.%-]|$)"  # Separator: anything but a letter, digit or _ - . %, or the end
+        else:
+            regex += re.escape(char)
+    return re.compile(regex + end)
+
+
+def rule_tokens(pattern):
+    """List the tokens that must appear whole in every URL the pattern matches."""
+    body = pattern.lstrip("|")
+    anchored_start = body != pattern
+    anchored_end = body.endswith("|")
+    body = body.rstrip("|")
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(body):
+        start, end = match.span()
+        # A token at an open end of the pattern could be part of a longer token in the URL
+        if (start == 0 and not anchored_start) or (end == len(body) and not anchored_end):
+            continue
+        if body[start - 1:start] == "*" or body[end:end + 1] == "*":
+            continue
+        tokens.append(match.group())
+    return tokens
+
+
+def parse_options(text):
+    """Return (types, third_party, include, exclude) for a rule's $options, or None if they are not supported."""
+    types = 0
+    excluded_types = 0
+    third_party = None
+    include = exclude = frozenset()
+    for option in text.split(","):
+        option = option.strip()
+        negated = option.startswith("~")
+        name = option.lstrip("~")
+        if name in TYPE_OPTIONS:
+            if negated:
+                excluded_types |= TYPE_OPTIONS[name]
+            else:
+                types |= TYPE_OPTIONS[name]
+        elif name in ("third-party", "3p"):
+            third_party = not negated
+        elif name in ("first-party", "1p"):
+            third_party = negated
+        elif name.startswith("domain="):
+            domains = name[len("domain="):].split("|")
+            include = frozenset(domain for domain in domains if not domain.startswith("~"))
+            exclude = frozenset(domain[1:] for domain in domains if domain.startswith("~"))
+        elif name == "important":
+            pass
+        else:
+            return None  # document, popup, csp, redirect, ... change more than whether a request is blocked
+    return (types or ALL_TYPES) & ~excluded_types, third_party, include, exclude
+
+
+class FilterRules:
+    """Compiled EasyList and hosts-file rules.
+
+    Plain domain rules go into hash sets that are checked once per parent domain of the request host. The other
+    URL rules are indexed by one token they require, so a request is only tested against the rules whose token
+    appears in its URL.
+    """
+
+    def __init__(self):
+        self.block_hosts = set()
+        self.allow_hosts = set()
+        self.block_host_rules = {}  # Domain -> rules for ||domain^$options
+        self.allow_host_rules = {}
+        self.block_tokens = {}  # Token -> rules
+        self.allow_tokens = {}
+        self.block_generic = []  # Rules without a usable token, tested against every request
+        self.allow_generic = []
+        self.rule_count = 0
+        self.skipped_count = 0
+        self.regexes = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["regexes"] = {}  # Compiled lazily again after loading
+        return state
+
+    def add_list(self, lines):
+        for line in lines:
+            self.add_line(line)
+
+    def add_line(self, line):
+        line = line.strip()
+        if not line or line[0] in "![#":  # Comments, list headers and hosts-file comments
+            return
+        hosts_match = HOSTS_LINE.match(line)
+        if hosts_match:
+            host = hosts_match.group(1).lower()
+            if host not in HOSTS_IGNORED:
+                self.block_hosts.add(host)
+                self.rule_count += 1
+            return
+        if any(marker in line for marker in COSMETIC_MARKERS):
+            return  # Element hiding rules do not affect requests
+
+        allow = line.startswith("@@")
+        if allow:
+            line = line[2:]
+        pattern, _, option_text = line.partition("$")
+        options = parse_options(option_text) if option_text else (ALL_TYPES, None, frozenset(), frozenset())
+        if options is None or "match-case" in option_text or (pattern.startswith("/") and pattern.endswith("/")):
+            self.skipped_count += 1  # Unsupported options and regular expression rules
+            return
+        pattern = pattern.lower()
+        self.rule_count += 1
+
+        domain = pattern[2:].rstrip("^") if pattern.startswith("||") else ""
+        if domain and PLAIN_DOMAIN.match(domain) and pattern[2 + len(domain):] in ("", "^"):
+            if options == (ALL_TYPES, None, frozenset(), frozenset()):
+                (self.allow_hosts if allow else self.block_hosts).add(domain)
+            else:
+                host_rules = self.allow_host_rules if allow else self.block_host_rules
+                host_rules.setdefault(domain, []).append((None,) + options)
+            return
+        if not allow and not option_text and PLAIN_DOMAIN.match(pattern):
+            self.block_hosts.add(pattern)  # A bare domain, as in domain-only lists
+            return
+
+        rule = (pattern,) + options
+        tokens = self.allow_tokens if allow else self.block_tokens
+        candidates = rule_tokens(pattern)
+        if candidates:
+            # Common words like "ads" would put thousands of rules behind one token that most URLs contain, so
+            # file the rule under whichever of its tokens has the fewest rules so far, preferring longer ones
+            token = min(candidates, key=lambda token: (len(tokens.get(token, ())), -len(token)))
+            tokens.setdefault(token, []).append(rule)
+        else:
+            (self.allow_generic if allow else self.block_generic).append(rule)
+
+    def should_block(self, url, host, first_party_host, resource_type):
+        """True if a request should be blocked. url should be lower case and resource_type one TYPE_OPTIONS bit."""
+        third_party = base_domain(host) != base_domain(first_party_host)
+        if not self.matches(url, host, first_party_host, resource_type, third_party,
+                            self.block_hosts, self.block_host_rules, self.block_tokens, self.block_generic):
+            return False
+        # Exceptions are only looked at for the few requests that a blocking rule matched
+        return not self.matches(url, host, first_party_host, resource_type, third_party,
+                                self.allow_hosts, self.allow_host_rules, self.allow_tokens, self.allow_generic)
+
+    def matches(self, url, host, first_party_host, resource_type, third_party,
+                hosts, host_rules, token_rules, generic_rules):
+        for suffix in host_suffixes(host):
+            if suffix in hosts:
+                return True
+            rules = host_rules.get(suffix)
+            if rules and any(self.applies(rule, url, first_party_host, resource_type, third_party) for rule in rules):
+                return True
+        if token_rules:
+            for token in TOKEN_PATTERN.findall(url):
+                rules = token_rules.get(token)
+                if rules and any(self.applies(rule, url, first_party_host, resource_type, third_party)
+                                 for rule in rules):
+                    return True
+        return any(self.applies(rule, url, first_party_host, resource_type, third_party) for rule in generic_rules)
+
+    def applies(self, rule, url, first_party_host, resource_type, third_party):
+        pattern, types, rule_third_party, include, exclude = rule
+        if not types & resource_type:
+            return False
+        if rule_third_party is not None and rule_third_party != third_party:
+            return False
+        if include or exclude:
+            domains = list(host_suffixes(first_party_host))
+            if any(domain in exclude for domain in domains):
+                return False
+            if include and not any(domain in include for domain in domains):
+                return False
+        if pattern is None:
+            return True
+        regex = self.regexes.get(pattern)
+        if regex is None:
+            regex = self.regexes[pattern] = pattern_regex(pattern)
+        return regex.search(url) is not None
+
+
+def cache_key(paths):
+    digest = hashlib.sha1(f"{CACHE_VERSION} {sys.version_info[:2]}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path} {stat.st_size} {stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def compile_rules(paths):
+    rules = FilterRules()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            rules.add_list(file)
+    return rules
+
+
+def load_rules(paths=None, cache=None):
+    """Return compiled rules for the filter lists, from the cache when none of the lists changed."""
+    paths = filter_paths() if paths is None else paths
+    cache = cache or cache_path()
+    key = cache_key(paths)
+    try:
+        with open(cache, "rb") as file:
+            cached_key, rules = pickle.load(file)
+        if cached_key == key:
+            return rules
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, TypeError):
+        pass  # Missing or stale cache; compile below
+    rules = compile_rules(paths)
+    try:
+        with open(cache + ".tmp", "wb") as file:
+            pickle.dump((key, rules), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass  # Blocking still works, the lists are just compiled again next time
+    return rules
+
+
+class FilterLoader(QThread):
+    """Compiles or loads the filter lists off the GUI thread."""
+
+    loaded = pyqtSignal(object)
+
+    def run(self):
+        self.loaded.emit(load_rules())
+
+
+class ContentBlocker(QWebEngineUrlRequestInterceptor):
+    """Profile-wide request interceptor that blocks ads and trackers matched by the filter lists."""
+
+    blocked = pyqtSignal(QUrl, QUrl)  # First-party (page) URL, blocked URL
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rules = FilterRules()  # Nothing is blocked until the lists have loaded
+        self.enabled = True
+        self.blocked_count = 0
+        self.loader = FilterLoader(self)
+        self.loader.loaded.connect(self.set_rules)
+
+    def load(self):
+        self.loader.start()
+
+    def set_rules(self, rules):
+        self.rules = rules
+
+    def interceptRequest(self, info):
+        """Runs for every request on the network path, so it does as little as possible."""
+        resource_type = info.resourceType()
+        if not self.enabled or resource_type == QWebEngineUrlRequestInfo.ResourceTypeMainFrame:
+            return  # Pages the user navigates to are never blocked
+        url = info.requestUrl()
+        if url.scheme() not in BLOCKABLE_SCHEMES:
+            return
+        first_party = info.firstPartyUrl()
+        if self.rules.should_block(url.toString().lower(), url.host(), first_party.host(),
+                                   RESOURCE_TYPES.get(resource_type, TYPE_OPTIONS["other"])):
+            info.block(True)
+            self.blocked_count += 1
+            self.blocked.emit(first_party, url)
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import errno
+import shutil
+import sqlite3
+import threading
+from PyQt5.QtCore import QStandardPaths
+
+CACHE_DIRECTORY = 'downloads'
+INDEX_FILE = 'index.db'
+DEFAULT_MAX_CACHE_MB = 4096  # Objects beyond this are evicted, least recently used first
+FICLONE = 0x40049409  # Linux ioctl that shares a file's blocks copy-on-write (btrfs, XFS, ...)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS urls (
+        url TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT
+    );
+    CREATE TABLE IF NOT EXISTS objects (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used);
+'''
+
+
+def cache_directory():
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), CACHE_DIRECTORY)
+
+
+def reflink(source, destination):
+    """Copy source to destination sharing its blocks; raises OSError where the filesystem cannot."""
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, 'Reflinks are only tried on Linux')
+    import fcntl
+    with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+        try:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            destination_file.close()
+            os.remove(destination)
+            raise
+
+
+def clone(source, destination, copy=True):
+    """Give destination the content of source, sharing its blocks where the filesystem allows.
+
+    A reflink is an independent copy, so editing a download never changes the cache or another download; hard
+    links would. Without reflinks the file is copied, or left alone if copy is False. Returns True if
+    destination was written.
+    """
+    temp_path = destination + '.link-tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        reflink(source, temp_path)
+    except OSError:
+        if not copy:
+            return False
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+    return True
+
+
+class ContentCache:
+    """Downloaded files stored once per SHA-256, with the validators of the URLs they came from.
+
+    Safe to use from several download threads at once.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_CACHE_MB * 1024 * 1024):
+        self.directory = directory or cache_directory()
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def object_path(self, sha256):
+        return os.path.join(self.directory, 'objects', sha256[:2], sha256)
+
+    def validators(self, url):
+        """Return (sha256, etag, last_modified) for a cached URL whose object is still there, or None."""
+        with self._lock:
+            row = self.db.execute('SELECT sha256, etag, last_modified FROM urls WHERE url = ?', (url,)).fetchone()
+        if row is None or not os.path.exists(self.object_path(row[0])):
+            return None
+        return row
+
+    def find(self, sha256):
+        """Return the path of the object with this hash, or None."""
+        path = self.object_path(sha256)
+        return path if os.path.exists(path) else None
+
+    def store(self, url, path, sha256, etag=None, last_modified=None):
+        """Add a downloaded file; if the same content is already cached, path shares its blocks where it can.
+
+        A new object is only made where it can share the download's blocks: a full copy of every download would
+        double the disk space they take. Returns False if the file was not cached.
+        """
+        object_path = self.object_path(sha256)
+        if os.path.exists(object_path):
+            clone(object_path, path, copy=False)  # Frees the duplicate blocks; a copy would not
+        else:
+            if os.path.getsize(path) > self.max_bytes:
+                return False  # It would only evict everything else and then itself
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if not clone(path, object_path, copy=False):
+                return False
+        with self._lock, self.db:
+            self.db.execute('INSERT INTO objects (sha256, size, last_used) VALUES (?, ?, ?) ON CONFLICT (sha256)'
+                            ' DO UPDATE SET last_used = excluded.last_used',
+                            (sha256, os.path.getsize(object_path), time.time()))
+            if url:
+                self.db.execute('INSERT OR REPLACE INTO urls (url, sha256, etag, last_modified) VALUES (?, ?, ?, ?)',
+                                (url, sha256, etag, last_modified))
+        self.evict()
+        return True
+
+    def restore(self, sha256, path):
+        """Put a cached object at path; returns False if it has been evicted."""
+        object_path = self.find(sha256)
+        if object_path is None:
+            return False
+        clone(object_path, path)
+        with self._lock, self.db:
+            self.db.execute('UPDATE objects SET last_used = ? WHERE sha256 = ?', (time.time(), sha256))
+        return True
+
+    def discard(self, sha256):
+        """Forget an object, e.g. one that no longer has the content it is stored under."""
+        with self._lock, self.db:
+            try:
+                os.remove(self.object_path(sha256))
+            except OSError:
+                pass
+            self.db.execute('DELETE FROM objects WHERE sha256 = ?', (sha256,))
+            self.db.execute('DELETE FROM urls WHERE sha256 = ?', (sha256,))
+
+    def evict(self):
+        """Drop least recently used objects until the cache fits in max_bytes."""
+        with self._lock, self.db:
+            total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for sha256, size in self.db.execute('SELECT sha256, size FROM objects ORDER BY last_used').fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self.object_path(sha256))
+                except OSError:
+                    pass
+                self.db.execute('DELETE FROM objects WHERE sha256 = ?', (sha256,))
+                self.db.execute('DELETE FROM urls WHERE sha256 = ?', (sha256,))
+                total -= size
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,339 @@
+import os
+import re
+import sys
+import ssl
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from urllib.parse import urlsplit, urljoin, unquote, quote
+
+DEFAULT_JOBS = 16
+MAX_JOBS = 1024
+MAX_CONNECTIONS_PER_HOST = 16  # Same cap as the window's downloads; more only gets a client throttled or dropped
+CHUNK_SIZE = 256 * 1024
+CONNECT_TIMEOUT = 30
+READ_TIMEOUT = 60  # Seconds without a byte before a transfer is retried
+MAX_REDIRECTS = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # Seconds, doubled after every retry
+PROGRESS_INTERVAL = 0.5  # Seconds between progress events of one transfer
+PART_SUFFIX = '.part'  # Unfinished downloads, resumed with a range request on the next run
+USER_AGENT = 'ShieldBrowser-Downloader/1.0'
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PATH_SAFE_CHARACTERS = "/%:@!$&'()*+,;=~-._"
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-\d+/(\d+|\*)')
+
+
+class DownloadError(Exception):
+    """A transfer failed; retryable errors are tried again before they are reported."""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def read_batch(lines):
+    """Yield (url, file name or None) from lines of "URL [file name]"; blank lines and # comments are skipped."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        url, _, name = line.partition(' ')
+        yield url, name.strip() or None
+
+
+def file_name(url):
+    """The last path segment of a URL, safe to use as a file name."""
+    name = os.path.basename(unquote(urlsplit(url).path))
+    return name.strip('. ') or 'download'
+
+
+def unique_path(directory, name, taken):
+    """Join directory and name, adding " (n)" before the extension if another job already uses the path."""
+    stem, extension = os.path.splitext(name)
+    path = os.path.join(directory, name)
+    number = 1
+    while path in taken:
+        number += 1
+        path = os.path.join(directory, f"{stem} ({number}){extension}")
+    taken.add(path)
+    return path
+
+
+class Response:
+    """Status, headers and body stream of an HTTP/1.1 response on its own connection."""
+
+    def __init__(self, status, headers, reader, writer, url):
+        self.status = status
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+        self.url = url
+
+    async def read(self, size):
+        try:
+            return await asyncio.wait_for(self.reader.read(size), READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise DownloadError(f"No data for {READ_TIMEOUT} seconds", retryable=True)
+
+    async def readline(self):
+        try:
+            return await asyncio.wait_for(self.reader.readline(), READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise DownloadError(f"No data for {READ_TIMEOUT} seconds", retryable=True)
+
+    @property
+    def content_length(self):
+        try:
+            return int(self.headers['content-length'])
+        except (KeyError, ValueError):
+            return None
+
+    async def chunks(self):
+        """Yield the body as it arrives, undoing chunked transfer encoding."""
+        if 'chunked' in self.headers.get('transfer-encoding', '').lower():
+            while True:
+                size = int((await self.readline()).split(b';')[0].strip() or b'0', 16)
+                if not size:
+                    while (await self.readline()).strip():
+                        pass  # Trailers
+                    return
+                while size:
+                    data = await self.read(min(CHUNK_SIZE, size))
+                    if not data:
+                        raise DownloadError("Connection closed in the middle of a chunk", retryable=True)
+                    size -= len(data)
+                    yield data
+                await self.readline()
+        remaining = self.content_length
+        while remaining is None or remaining > 0:
+            data = await self.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not data:
+                if remaining is None:
+                    return  # The server marks the end by closing the connection
+                raise DownloadError(f"Connection closed with {remaining} bytes missing", retryable=True)
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.writer.close()
+
+
+class DownloadEngine:
+    """Runs many HTTP downloads concurrently on one asyncio event loop, without a thread per transfer.
+
+    Each transfer writes to a .part file that is renamed into place when it completes, is hashed (SHA-256) as it
+    is written, and resumes with a range request after a dropped connection or on a later run. Events are passed
+    to on_event as dicts: started, progress and finished (with ok, and error when it failed). No more than
+    per_host transfers talk to one host at a time, so high job counts pay off on lists spread over many hosts.
+    """
+
+    def __init__(self, jobs=DEFAULT_JOBS, on_event=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 progress_interval=PROGRESS_INTERVAL, ssl_context=None, per_host=MAX_CONNECTIONS_PER_HOST):
+        self.jobs = max(1, min(jobs, MAX_JOBS))
+        self.per_host = max(1, per_host)
+        self.host_slots = {}  # (scheme, host, port) -> asyncio.Semaphore
+        self.on_event = on_event or (lambda event: None)
+        self.retries = retries
+        self.backoff = backoff
+        self.progress_interval = progress_interval
+        self.ssl_context = ssl_context or ssl.create_default_context()
+
+    async def run(self, items):
+        """Download every (url, path) of items, at most jobs at a time, and return the finished events in order.
+
+        items may be a generator; it is only read as transfer slots free up, so a long list from stdin can start
+        downloading before it has been read to the end.
+        """
+        items = iter(enumerate(items))
+        results = {}
+
+        async def worker():
+            for index, (url, path) in items:
+                results[index] = await self.download(url, path)
+
+        await asyncio.gather(*(worker() for _ in range(self.jobs)))
+        return [results[index] for index in sorted(results)]
+
+    async def download(self, url, path):
+        """Download url to path and return its finished event; errors are reported in the event, not raised."""
+        started = time.monotonic()
+        self.on_event({'event': 'started', 'url': url, 'path': path})
+        result = {'event': 'finished', 'url': url, 'path': path}
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.host_slot(url):
+                    result.update(await self.fetch(url, path))
+                result['ok'] = True
+                break
+            except (OSError, DownloadError, ValueError) as e:
+                # Certificate errors will not go away by themselves
+                retryable = (isinstance(e, OSError) and not isinstance(e, ssl.SSLError)
+                             or getattr(e, 'retryable', False))
+                if not retryable or attempt == self.retries:
+                    result.update(ok=False, error=str(e) or type(e).__name__)
+                    break
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        result['seconds'] = round(time.monotonic() - started, 3)
+        self.on_event(result)
+        return result
+
+    def host_slot(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        if key not in self.host_slots:
+            self.host_slots[key] = asyncio.Semaphore(self.per_host)
+        return self.host_slots[key]
+
+    async def fetch(self, url, path):
+        part_path = path + PART_SUFFIX
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = await self.open(url, headers)
+        try:
+            if response.status == 416 and offset:
+                os.remove(part_path)  # The partial file no longer fits the remote one
+                raise DownloadError("Partial download does not match the server's file", retryable=True)
+            if response.status not in (200, 206):
+                raise DownloadError(f"HTTP {response.status}", retryable=response.status in RETRY_STATUSES)
+            if response.status == 200:
+                offset = 0  # The server sent the whole file instead of the rest
+                total = response.content_length
+            else:
+                match = CONTENT_RANGE_PATTERN.fullmatch(response.headers.get('content-range', ''))
+                if not match or int(match.group(1)) != offset:
+                    os.remove(part_path)
+                    raise DownloadError("Server sent a different range than asked for", retryable=True)
+                total = int(match.group(2)) if match.group(2).isdigit() else None
+            hasher = hashlib.sha256()
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(part_path, 'r+b' if offset else 'wb') as file:
+                if offset:
+                    # Hash what an earlier attempt already wrote, then append to it
+                    while True:
+                        data = file.read(CHUNK_SIZE)
+                        if not data:
+                            break
+                        hasher.update(data)
+                received = offset
+                last_event = time.monotonic()
+                last_received = received
+                # Writes land in the page cache, so they are not worth handing to a thread
+                async for data in response.chunks():
+                    file.write(data)
+                    hasher.update(data)
+                    received += len(data)
+                    now = time.monotonic()
+                    if self.progress_interval and now - last_event >= self.progress_interval:
+                        self.on_event({'event': 'progress', 'url': url, 'path': path, 'bytes': received,
+                                       'total': total, 'speed': round((received - last_received) / (now - last_event))})
+                        last_event, last_received = now, received
+                file.truncate()
+            if total is not None and received != total:
+                os.remove(part_path)  # Longer than the remote file, so it cannot be the start of it
+                raise DownloadError(f"Received {received} bytes of a {total} byte file", retryable=True)
+        finally:
+            response.close()
+        os.replace(part_path, path)
+        return {'bytes': received, 'sha256': hasher.hexdigest(), 'resumed_from': offset}
+
+    async def open(self, url, headers):
+        """Send a GET request, following redirects, and return the Response once its headers have arrived."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise DownloadError(f"Not an HTTP(S) URL: {url}")
+            secure = parts.scheme == 'https'
+            port = parts.port or (443 if secure else 80)
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                    parts.hostname, port, ssl=self.ssl_context if secure else None,
+                    server_hostname=parts.hostname if secure else None), CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise DownloadError(f"Could not connect to {parts.hostname} within {CONNECT_TIMEOUT} seconds",
+                                    retryable=True)
+            target = quote(parts.path or '/', safe=PATH_SAFE_CHARACTERS)
+            if parts.query:
+                target += '?' + parts.query
+            lines = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc.rpartition("@")[2]}',
+                     f'User-Agent: {USER_AGENT}', 'Accept-Encoding: identity', 'Connection: close']
+            lines += [f'{name}: {value}' for name, value in headers.items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+            response = Response(0, {}, reader, writer, url)
+            try:
+                status_line = (await response.readline()).decode('latin-1').split(None, 2)
+                if len(status_line) < 2 or not status_line[1].isdigit():
+                    raise DownloadError("Malformed response from server", retryable=True)
+                response.status = int(status_line[1])
+                while True:
+                    line = (await response.readline()).decode('latin-1')
+                    if not line.strip():
+                        break
+                    name, _, value = line.partition(':')
+                    response.headers[name.strip().lower()] = value.strip()
+            except BaseException:
+                response.close()
+                raise
+            if response.status in REDIRECT_STATUSES and 'location' in response.headers:
+                response.close()
+                url = urljoin(url, response.headers['location'])
+                continue
+            return response
+        raise DownloadError(f"More than {MAX_REDIRECTS} redirects")
+
+
+def write_event(event):
+    sys.stdout.write(json.dumps(event) + '\n')
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    """Command line batch downloads; prints JSON lines and exits with 1 if any download failed."""
+    parser = argparse.ArgumentParser(
+        description="Download files without the window, printing progress as JSON lines. "
+                    "Unfinished downloads are kept as .part files and resumed on the next run.")
+    parser.add_argument('urls', nargs='*', help="URLs to download")
+    parser.add_argument('--batch', metavar='FILE',
+                        help='file with one "URL [file name]" per line; - reads standard input')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help="downloads in flight at once")
+    parser.add_argument('--per-host', type=int, default=MAX_CONNECTIONS_PER_HOST,
+                        help="downloads from one host at once")
+    parser.add_argument('--out', default='.', help="folder the files are saved in")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress lines of a download; 0 turns them off")
+    args = parser.parse_args(argv)
+    if not args.urls and not args.batch:
+        parser.error("give URLs or --batch FILE")
+
+    def entries():
+        yield from ((url, None) for url in args.urls)
+        if args.batch == '-':
+            yield from read_batch(sys.stdin)
+        elif args.batch:
+            with open(args.batch, encoding='utf-8') as file:
+                yield from read_batch(file)
+
+    def jobs():
+        taken = set()
+        for url, name in entries():
+            yield url, unique_path(args.out, name or file_name(url), taken)
+
+    engine = DownloadEngine(args.jobs, write_event, args.retries, progress_interval=args.progress_interval,
+                            per_host=args.per_host)
+    started = time.monotonic()
+    results = asyncio.run(engine.run(jobs()))
+    failed = sum(not result['ok'] for result in results)
+    write_event({'event': 'summary', 'downloads': len(results), 'ok': len(results) - failed, 'failed': failed,
+                 'bytes': sum(result.get('bytes', 0) for result in results),
+                 'seconds': round(time.monotonic() - started, 3)})
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
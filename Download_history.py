@@ -0,0 +1,386 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+from PyQt5.QtCore import Qt, QThread, QStandardPaths, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QTableView, QHeaderView, QAbstractItemView, QLabel
+from History_manager import connect, like_pattern
+
+DOWNLOAD_HISTORY_FILE = "downloads.db"
+PAGE_SIZE = 200
+WRITE_BATCH_SIZE = 500
+FILTER_DELAY_MS = 150  # Typing pauses this long before the filter query runs
+# Filters matching fewer index entries than this read them all and sort them; commoner ones scan in sort order,
+# where a page fills up long before the end
+INDEX_MATCH_LIMIT = 5000
+# The trigram tokenizer (SQLite 3.34) finds any substring of three or more characters, so the index can narrow
+# a substring filter without changing its results; older SQLite filters by substring alone
+HAS_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+MIN_INDEX_TERM_LENGTH = 3
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS downloads (
+        id INTEGER PRIMARY KEY,
+        file TEXT NOT NULL,
+        url TEXT NOT NULL,
+        size INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL,
+        finished REAL NOT NULL,
+        duration REAL NOT NULL DEFAULT 0,
+        throughput REAL NOT NULL DEFAULT 0,
+        hash TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS downloads_finished ON downloads (finished);
+    CREATE INDEX IF NOT EXISTS downloads_file ON downloads (file);
+    CREATE INDEX IF NOT EXISTS downloads_size ON downloads (size);
+    CREATE INDEX IF NOT EXISTS downloads_status ON downloads (status);
+    CREATE INDEX IF NOT EXISTS downloads_duration ON downloads (duration);
+    CREATE INDEX IF NOT EXISTS downloads_throughput ON downloads (throughput);
+"""
+
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS downloads_fts USING fts5(
+        file, url, content='downloads', content_rowid='id', tokenize='trigram');
+    CREATE TRIGGER IF NOT EXISTS downloads_fts_insert AFTER INSERT ON downloads BEGIN
+        INSERT INTO downloads_fts (rowid, file, url) VALUES (new.id, new.file, new.url);
+    END;
+    CREATE TRIGGER IF NOT EXISTS downloads_fts_delete AFTER DELETE ON downloads BEGIN
+        INSERT INTO downloads_fts (downloads_fts, rowid, file, url) VALUES ('delete', old.id, old.file, old.url);
+    END;
+"""
+
+# Header, column and whether the column has an index to sort by; URLs and hashes are too long to be worth one
+COLUMNS = [
+    ("File", "file", True),
+    ("URL", "url", False),
+    ("Size", "size", True),
+    ("Status", "status", True),
+    ("Duration", "duration", True),
+    ("Throughput", "throughput", True),
+    ("Finished", "finished", True),
+    ("SHA-256", "hash", False),
+]
+FIELDS = ", ".join(["id"] + [column for _, column, _ in COLUMNS])
+DEFAULT_SORT = ("finished", True)  # Newest first
+
+
+def create_schema(db):
+    db.executescript(SCHEMA)
+    if not HAS_TRIGRAM:
+        return
+    row = db.execute("SELECT sql FROM sqlite_master WHERE name = 'downloads_fts'").fetchone()
+    if row is not None and "trigram" in row[0]:
+        return
+    # New database, or the word index of earlier versions, which only found words by their start
+    db.executescript("""
+        DROP TRIGGER IF EXISTS downloads_fts_insert;
+        DROP TRIGGER IF EXISTS downloads_fts_delete;
+        DROP TABLE IF EXISTS downloads_fts;
+    """)
+    db.executescript(FTS_SCHEMA)
+    with db:
+        db.execute("INSERT INTO downloads_fts (downloads_fts) VALUES ('rebuild')")
+
+
+def download_history_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, DOWNLOAD_HISTORY_FILE)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class DownloadHistoryWriter(QThread):
+    """Appends finished downloads on its own connection; whatever is queued when it wakes goes in one transaction."""
+
+    written = pyqtSignal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.jobs = queue.Queue()
+        self.ready = threading.Event()  # Set once the database and its tables exist
+
+    def run(self):
+        db = connect(self.path)
+        create_schema(db)
+        self.ready.set()
+        try:
+            while True:
+                batch = [self.jobs.get()]
+                while batch[-1] is not None and len(batch) < WRITE_BATCH_SIZE:
+                    try:
+                        batch.append(self.jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                entries = [job for job in batch if job is not None]
+                if entries:
+                    with db:
+                        db.executemany("INSERT INTO downloads (file, url, size, status, finished, duration,"
+                                       " throughput, hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+                    self.written.emit()
+                if batch[-1] is None:
+                    break
+        finally:
+            db.close()
+
+
+class DownloadHistoryStore:
+    """Finished, failed and cancelled downloads on disk, sorted and filtered by SQLite."""
+
+    def __init__(self, path=None):
+        self.path = path or download_history_path()
+        self.db = None
+        self.last_condition = (None, None)  # (text, condition) of the last filter; each page reuses it
+        self.writer = DownloadHistoryWriter(self.path)
+        self.writer.start()
+
+    @property
+    def written(self):
+        """Signal emitted after each batch of new entries has been written."""
+        return self.writer.written
+
+    def connection(self):
+        if self.db is None:
+            self.writer.ready.wait()
+            self.db = connect(self.path)
+        return self.db
+
+    def add(self, file, url, size, status, duration, hash="", finished=None):
+        """Queue a history entry; it is written in the background."""
+        throughput = size / duration if duration > 0 else 0.0
+        self.writer.jobs.put((file, url, size, status, finished or time.time(), duration, throughput, hash))
+
+    def close(self):
+        self.writer.jobs.put(None)
+        self.writer.wait()
+        if self.db is not None:
+            self.db.close()
+
+    def condition(self, text):
+        """SQL condition and parameters for rows whose file or URL contains every word of text.
+
+        Every word is matched by substring. When the trigram index has few rows containing the words of three or
+        more characters, it narrows the rows checked to those; commoner words are matched while walking the sort
+        index, which fills a page quickly. Either way the same rows match.
+        """
+        if not text.strip():
+            return "1", []
+        if self.last_condition[0] == text:
+            return self.last_condition[1]
+        terms = text.lower().split()
+        condition = (" AND ".join(["(file LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\')"] * len(terms)),
+                     [pattern for term in terms for pattern in (like_pattern(term),) * 2])
+        query = " ".join('"' + term.replace('"', '""') + '"' for term in terms if len(term) >= MIN_INDEX_TERM_LENGTH)
+        if query and HAS_TRIGRAM:
+            matches = self.connection().execute(
+                "SELECT COUNT(*) FROM (SELECT rowid FROM downloads_fts WHERE downloads_fts MATCH ? LIMIT ?)",
+                (query, INDEX_MATCH_LIMIT)).fetchone()[0]
+            if matches < INDEX_MATCH_LIMIT:
+                condition = ("id IN (SELECT rowid FROM downloads_fts WHERE downloads_fts MATCH ?) AND " + condition[0],
+                             [query] + condition[1])
+        self.last_condition = (text, condition)
+        return condition
+
+    def page(self, text="", sort=DEFAULT_SORT, after=None, limit=PAGE_SIZE):
+        """Return up to limit rows after the (sort value, id) key `after`, in sort order.
+
+        Paging by key instead of OFFSET lets every page start with an index seek, however far down it is.
+        """
+        column, descending = sort
+        condition, parameters = self.condition(text)
+        if after is not None:
+            condition += f" AND ({column}, id) {'<' if descending else '>'} (?, ?)"
+            parameters += list(after)
+        direction = "DESC" if descending else "ASC"
+        return self.connection().execute(
+            f"SELECT {FIELDS} FROM downloads WHERE {condition} ORDER BY {column} {direction}, id {direction}"
+            f" LIMIT ?", parameters + [limit]).fetchall()
+
+    def newer(self, after_id, text=""):
+        """Rows added after after_id that match text, newest first."""
+        condition, parameters = self.condition(text)
+        return self.connection().execute(
+            f"SELECT {FIELDS} FROM downloads WHERE id > ? AND {condition} ORDER BY finished DESC, id DESC",
+            [after_id] + parameters).fetchall()
+
+    def count(self, text=""):
+        condition, parameters = self.condition(text)
+        return self.connection().execute(f"SELECT COUNT(*) FROM downloads WHERE {condition}", parameters).fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+
+class DownloadHistoryModel(QAbstractTableModel):
+    """Table model that fetches download history a page at a time as the view scrolls."""
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []
+        self.text = ""
+        self.sort_key = DEFAULT_SORT
+        self.exhausted = False
+        self.rows = self.next_page()
+        store.written.connect(self.on_written)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        page = self.next_page()
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def next_page(self):
+        """Rows that follow the loaded ones, noting when there are no more."""
+        after = None
+        if self.rows:
+            last = self.rows[-1]
+            after = (last[self.sort_index()], last[0])
+        page = self.store.page(self.text, self.sort_key, after)
+        self.exhausted = len(page) < PAGE_SIZE
+        return page
+
+    def sort_index(self):
+        """Position of the sort column in a row; rows start with the id."""
+        return 1 + [column for _, column, _ in COLUMNS].index(self.sort_key[0])
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.rows = self.next_page()  # Row inserts are not allowed inside a reset
+        self.endResetModel()
+
+    def set_filter(self, text):
+        self.text = text
+        self.reload()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        _, name, sortable = COLUMNS[column]
+        if sortable:
+            self.sort_key = (name, order == Qt.DescendingOrder)
+            self.reload()
+
+    def on_written(self):
+        """Show new entries at the top when sorted newest first; other orders pick them up on the next reload."""
+        if self.sort_key != DEFAULT_SORT:
+            return
+        newest_id = max((row[0] for row in self.rows[:PAGE_SIZE]), default=0)
+        rows = self.store.newer(newest_id, self.text)
+        if rows:
+            self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+            self.rows[:0] = rows
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        value = row[index.column() + 1]
+        name = COLUMNS[index.column()][1]
+        if role == Qt.DisplayRole:
+            if name == "file":
+                return os.path.basename(value)
+            if name == "size":
+                return format_size(value)
+            if name == "duration":
+                return format_duration(value)
+            if name == "throughput":
+                return f"{format_size(value)}/s" if value else ""
+            if name == "finished":
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(value))
+            return value
+        if role == Qt.ToolTipRole and name in ("file", "url", "hash"):
+            return value
+        if role == Qt.TextAlignmentRole and name in ("size", "duration", "throughput"):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+
+class DownloadHistoryDialog(QDialog):
+    """Searchable, sortable view of every download, however many there are."""
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("Download History")
+        self.resize(900, 500)
+        layout = QVBoxLayout(self)
+
+        self.filter_input = QLineEdit(self)
+        self.filter_input.setPlaceholderText("Filter by file name or URL...")
+        self.filter_input.setClearButtonEnabled(True)
+        layout.addWidget(self.filter_input)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_input.textChanged.connect(self.filter_timer.start)
+
+        self.model = DownloadHistoryModel(store, self)
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().hide()
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # No per-row size measuring
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        header = self.table.horizontalHeader()
+        header.setSortIndicator([column for _, column, _ in COLUMNS].index(DEFAULT_SORT[0]), Qt.DescendingOrder)
+        header.sortIndicatorChanged.connect(self.on_sort_indicator_changed)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+
+        self.count_label = QLabel(self)
+        layout.addWidget(self.count_label)
+        self.update_count()
+        self.model.modelReset.connect(self.update_count)
+        self.model.rowsInserted.connect(self.update_count)
+
+    def on_sort_indicator_changed(self, section, order):
+        if not COLUMNS[section][2]:
+            # Put the indicator back on the column the rows are actually sorted by
+            column, descending = self.model.sort_key
+            header = self.table.horizontalHeader()
+            header.blockSignals(True)
+            header.setSortIndicator([name for _, name, _ in COLUMNS].index(column),
+                                    Qt.DescendingOrder if descending else Qt.AscendingOrder)
+            header.blockSignals(False)
+
+    def apply_filter(self):
+        self.model.set_filter(self.filter_input.text())
+
+    def update_count(self):
+        more = "+" if self.model.canFetchMore() else ""
+        self.count_label.setText(f"{self.model.rowCount()}{more} shown")
@@ -1,54 +1,928 @@
 import sys
 import os
+import errno
+import json
+import time
+import socket
+import hashlib
+import threading
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless batch mode needs neither Qt nor the history database: python Download_manager.py --batch urls.txt
+    import Download_engine
+    sys.exit(Download_engine.main(sys.argv[1:]))
+
 import requests
-from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QLineEdit, QPushButton, QLabel, QFileDialog, QProgressBar, QMessageBox
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from urllib3.util.retry import Retry
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel, QFileDialog, QProgressBar,
+    QMessageBox, QSpinBox, QComboBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QIcon  # Import QIcon
+from Download_history import DownloadHistoryStore, DownloadHistoryDialog
+from Download_cache import ContentCache
+import Download_engine
+
+
+DEFAULT_SEGMENTS = 4
+MAX_SEGMENTS = 16
+MIN_SEGMENT_SIZE = 1024 * 1024  # Smaller files are not worth splitting
+# Byte offsets only line up when the server sends the file as-is
+IDENTITY_ENCODING = {'Accept-Encoding': 'identity'}
+MIN_CHUNK_SIZE = 128 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+FAST_READ_SECONDS = 0.02  # Reads that fill the buffer faster than this grow the chunk size
+SLOW_READ_SECONDS = 0.25  # Reads slower than this shrink it so pause/cancel stay responsive
+PROGRESS_INTERVAL = 0.05  # Emit progress at most 20 times per second
+STATE_SUFFIX = '.download-state'  # Sidecar file holding resume information
+CHECKPOINT_INTERVAL = 1.0  # Seconds between sidecar state writes
+SEGMENT_RETRIES = 3
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError
 )
-from PyQt6.QtCore import QThread, pyqtSignal
-from PyQt6.QtGui import QIcon  # Import QIcon
+DNS_CACHE_TTL = 60  # Seconds a resolved address is reused
+DNS_CACHE_SIZE = 256
+POOLED_HOSTS = 32  # Hosts that keep idle keep-alive connections around
+MAX_CONNECTIONS_PER_HOST = 16
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # Seconds, doubled after every retry
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_MAX_ACTIVE = 3
+PRIORITIES = {"High": 0, "Normal": 1, "Low": 2}  # Lower values are scheduled first
+
+DEFAULT_HASH_ALGORITHMS = ('sha256',)  # sha256 is also the key of the content cache
+
+STATUS_QUEUED = "Queued"
+STATUS_DOWNLOADING = "Downloading"
+STATUS_PAUSED = "Paused"
+STATUS_COMPLETED = "Completed"
+STATUS_FAILED = "Failed"
+STATUS_CANCELLED = "Cancelled"
+
+
+def split_ranges(total_size, segments):
+    """Split total_size bytes into inclusive (start, end) ranges of near-equal size."""
+    segments = max(1, min(segments, total_size // MIN_SEGMENT_SIZE or 1))
+    segment_size = total_size // segments
+    ranges = []
+    for i in range(segments):
+        start = i * segment_size
+        end = total_size - 1 if i == segments - 1 else start + segment_size - 1
+        ranges.append((start, end))
+    return ranges
+
+
+def adapt_chunk_size(chunk_size, count, elapsed):
+    """Grow reads on fast links to cut per-call overhead and shrink them on slow links."""
+    if count == chunk_size and elapsed < FAST_READ_SECONDS:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    if elapsed > SLOW_READ_SECONDS:
+        return max(chunk_size // 2, MIN_CHUNK_SIZE)
+    return chunk_size
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_eta(seconds):
+    if seconds < 0:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class DNSCache:
+    """Small thread-safe cache of resolved host addresses with a time to live."""
+
+    def __init__(self, ttl=DNS_CACHE_TTL, max_entries=DNS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))  # Dicts keep insertion order, so this is the oldest
+            self._entries[key] = (now + self.ttl, address)
+        return address
+
+    def invalidate(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+DNS_CACHE = DNSCache()
+
+
+class CachedDNSConnectionMixin:
+    """Open new connections to the address in DNS_CACHE instead of resolving the host every time."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            address = DNS_CACHE.resolve(host, self.port)
+        except socket.gaierror:
+            return super()._new_conn()  # Let urllib3 report the resolution failure
+        # Only the TCP connect uses the address; TLS SNI and certificate checks still see the host name
+        self._dns_host = address
+        try:
+            return super()._new_conn()
+        except Exception:
+            DNS_CACHE.invalidate(host, self.port)  # The address may be stale, resolve again next time
+            raise
+        finally:
+            self._dns_host = host
+
+
+class CachedDNSHTTPConnection(CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class CachedDNSHTTPSConnection(CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDNSHTTPConnection
+
+
+class CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDNSHTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools resolve hosts through DNS_CACHE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CachedDNSHTTPConnectionPool,
+            'https': CachedDNSHTTPSConnectionPool,
+        }
+
+
+def create_session(max_per_host=MAX_CONNECTIONS_PER_HOST, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Build a session with keep-alive pools capped at max_per_host connections and retry with backoff."""
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=frozenset({'GET', 'HEAD'}), raise_on_status=False)
+    # pool_block makes extra requests wait for a free connection instead of exceeding the per-host limit
+    adapter = CachedDNSAdapter(pool_connections=POOLED_HOSTS, pool_maxsize=max_per_host, pool_block=True,
+                               max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the session shared by every download, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def configure_session(max_per_host=MAX_CONNECTIONS_PER_HOST, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                      dns_ttl=DNS_CACHE_TTL):
+    """Replace the shared session; transfers already running keep the session they started with."""
+    global _session
+    DNS_CACHE.ttl = dns_ttl
+    with _session_lock:
+        _session = create_session(max_per_host, retries, backoff)
+
+
+def parse_expected_hash(text):
+    """Split "algorithm:hexdigest" into its parts; a bare digest is taken to be SHA-256."""
+    text = text.strip()
+    if not text:
+        return None
+    algorithm, _, digest = text.rpartition(':')
+    algorithm = algorithm.strip().lower().replace('-', '') or 'sha256'
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+    return algorithm, digest.strip().lower()
+
+
+class StreamHasher:
+    """Hashes a file in order while it is written, whether it arrives as one stream or as parallel segments.
+
+    Bytes that continue the hashed prefix are hashed straight from the download buffer. Segments that arrive
+    ahead of the prefix are read back from the file when it catches up to them, while they are still in the
+    page cache.
+    """
+
+    def __init__(self, algorithms=DEFAULT_HASH_ALGORITHMS):
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+        self.offset = 0  # Bytes hashed so far
+        self._lock = threading.Lock()
+
+    def update(self, position, data):
+        """Hash data written at position if it continues the hashed prefix."""
+        with self._lock:
+            if position != self.offset:
+                return
+            for digest in self.hashes.values():
+                digest.update(data)
+            self.offset += len(data)
+
+    def catch_up(self, path, end):
+        """Hash what is already on disk between the hashed prefix and end."""
+        with self._lock:
+            if self.offset >= end:
+                return
+            buffer = memoryview(bytearray(MAX_CHUNK_SIZE))
+            with open(path, 'rb') as file:
+                file.seek(self.offset)
+                while self.offset < end:
+                    count = file.readinto(buffer[:min(MAX_CHUNK_SIZE, end - self.offset)])
+                    if not count:
+                        break
+                    for digest in self.hashes.values():
+                        digest.update(buffer[:count])
+                    self.offset += count
+
+    def hexdigests(self):
+        with self._lock:
+            return {algorithm: digest.hexdigest() for algorithm, digest in self.hashes.items()}
+
+
+class DownloadStopped(Exception):
+    """Raised inside a transfer once it has been asked to pause or cancel."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter; a rate of 0 means unlimited."""
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self.capacity = rate  # Allow bursts of up to one second of traffic
+            self.tokens = rate
+            self.timestamp = time.monotonic()
+
+    def consume(self, amount, cancel_event=None):
+        """Take amount tokens, sleeping off any debt; returns early when cancel_event is set."""
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay > 0:
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
 
 
 class DownloadThread(QThread):
     progress = pyqtSignal(int)
+    stats = pyqtSignal(float, float, float)  # Downloaded bytes, bytes per second, ETA in seconds (-1 if unknown)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
+    stopped = pyqtSignal()
 
-    def __init__(self, url, save_path):
+    def __init__(self, url, save_path, segments=DEFAULT_SEGMENTS, rate_limit=0, shared_limit=None, preallocate=True,
+                 session=None, expected_hash=None, cache=None, hash_algorithms=DEFAULT_HASH_ALGORITHMS):
         super().__init__()
         self.url = url
         self.save_path = save_path
+        self.expected_hash = expected_hash  # (algorithm, hexdigest) the finished file must match
+        self.cache = cache  # Download_cache.ContentCache used to skip unchanged files and store each content once
+        algorithms = set(hash_algorithms) | {'sha256'}
+        if expected_hash:
+            algorithms.add(expected_hash[0])
+        self.hash_algorithms = sorted(algorithms)
+        self.hashes = {}  # Hex digests of the finished file, by algorithm
+        self.opened_file = False  # Set once save_path holds this download's data rather than whatever was there
+        self._hasher = None
+        self.session = session or get_session()
+        self.segments = segments
+        self.preallocate = preallocate
+        self.rate_limit = TokenBucket(rate_limit)
+        self.shared_limit = shared_limit  # Bucket shared by every transfer, e.g. the queue's global limit
+        self.state_path = save_path + STATE_SUFFIX
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+        self._state = None
+        self._downloaded_size = 0
+        self._total_size = 0
+        self._last_emit_time = 0.0
+        self._last_emit_size = 0
+        self._speed = 0.0
 
     def run(self):
         try:
-            response = requests.get(self.url, stream=True)
-            response.raise_for_status()  # Raises HTTPError for bad responses
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-
-
-            with open(self.save_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        file.write(chunk)
-                        downloaded_size += len(chunk)
-                        progress_percent = int((downloaded_size / total_size) * 100)
-                        self.progress.emit(progress_percent)
+            self._hasher = StreamHasher(self.hash_algorithms)
+            cached = self.cache.validators(self.url) if self.cache is not None else None
+            remote = self.probe(cached)
+            remote['restored'] = remote['not_modified'] and self.restore_cached(cached[0])
+            if not remote['restored']:
+                if remote['accepts_ranges'] and remote['total_size'] > 0:
+                    self.download_segmented(remote)
+                else:
+                    self.clear_state()  # Without range support there is nothing to resume
+                    remote = self.download_single(None if remote['probed'] else cached)
+            if remote['restored']:
+                self.finished.emit("Not modified, restored from cache")
+                return
+            self.finish_hashes(remote)
 
             self.finished.emit("Download completed!")
+        except DownloadStopped:
+            self.stopped.emit()
         except requests.exceptions.RequestException as e:
             self.error.emit(f"Request error: {str(e)}")
         except Exception as e:
             self.error.emit(f"Unexpected error: {str(e)}")
 
+    def stop(self):
+        """Ask the transfer to stop; ranged downloads keep their checkpoint so they can resume later."""
+        self._abort.set()
+
+    def throttle(self, size):
+        """Wait until the rate limits allow size more bytes, or raise if the transfer was stopped."""
+        self.rate_limit.consume(size, self._abort)
+        if self.shared_limit is not None:
+            self.shared_limit.consume(size, self._abort)
+        if self._abort.is_set():
+            raise DownloadStopped()
+
+    def probe(self, cached=None):
+        """Return the size, range support and validators of the URL using a HEAD request.
+
+        With cached validators the request is conditional, and not_modified tells whether the cached copy is
+        still current.
+        """
+        remote = {'total_size': 0, 'accepts_ranges': False, 'etag': None, 'last_modified': None,
+                  'not_modified': False, 'probed': False}
+        try:
+            response = self.session.head(self.url, headers=self.request_headers(cached), allow_redirects=True,
+                                         timeout=10)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            # Some servers reject HEAD; the single stream path still works for them
+            return remote
+        self.read_validators(response, remote, cached)
+        remote['probed'] = True
+        remote['total_size'] = int(response.headers.get('content-length', 0))
+        remote['accepts_ranges'] = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        return remote
+
+    def request_headers(self, cached):
+        """Headers for a full request, conditional on the cached copy if there is one."""
+        headers = dict(IDENTITY_ENCODING)
+        if cached is not None:
+            sha256, etag, last_modified = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def read_validators(self, response, remote, cached):
+        etag = response.headers.get('etag')
+        remote['etag'] = etag if etag and not etag.startswith('W/') else None  # If-Range needs a strong ETag
+        remote['last_modified'] = response.headers.get('last-modified')
+        # Servers that ignore conditional requests still give away an unchanged file by its strong ETag
+        remote['not_modified'] = cached is not None and (
+            response.status_code == 304 or (remote['etag'] is not None and remote['etag'] == cached[1]))
+
+    def download_single(self, cached=None):
+        """Download the whole file over a single streamed connection and return its validators.
+
+        cached validators make the request conditional, for servers that could not be asked with HEAD.
+        """
+        remote = {'etag': None, 'last_modified': None, 'not_modified': False}
+        with self.session.get(self.url, headers=self.request_headers(cached), stream=True, timeout=30) as response:
+            response.raise_for_status()  # Raises HTTPError for bad responses
+            self.read_validators(response, remote, cached)
+            remote['restored'] = remote['not_modified'] and self.restore_cached(cached[0])
+            if remote['restored']:
+                return remote
+            if response.status_code == 304:
+                raise IOError("Server reported the file unchanged but the cached copy is gone")
+            response.raw.decode_content = True  # In case the server compresses anyway
+            total_size = int(response.headers.get('content-length', 0))
+            self.start_progress(total_size, 0)
+
+            self.opened_file = True
+            with open(self.save_path, 'wb') as file:
+                if total_size:
+                    self.preallocate_file(file, total_size)
+                self.copy_stream(response, file, position=0)
+                file.truncate()  # Drop any preallocated space the body did not fill
+        return remote
+
+    def restore_cached(self, sha256):
+        """Put the cached copy of an unchanged file at the save path.
+
+        False if it has been evicted since, or no longer hashes to sha256, in which case it is dropped from the
+        cache and the file has to be downloaded.
+        """
+        if not self.cache.restore(sha256, self.save_path):
+            return False
+        self.clear_state()  # A partial download there has just been overwritten
+        size = os.path.getsize(self.save_path)
+        hasher = StreamHasher(self.hash_algorithms)  # The download's own hasher stays fresh in case this fails
+        hasher.catch_up(self.save_path, size)
+        hashes = hasher.hexdigests()
+        if hashes['sha256'] != sha256:
+            self.cache.discard(sha256)
+            return False
+        self.start_progress(size, size)
+        self.hashes = hashes
+        self.verify_hash()
+        return True
+
+    def finish_hashes(self, remote):
+        """Hash whatever the download loop could not, check the expected hash and add the file to the cache."""
+        self._hasher.catch_up(self.save_path, os.path.getsize(self.save_path))
+        self.hashes = self._hasher.hexdigests()
+        self.verify_hash()
+        if self.cache is not None:
+            try:
+                self.cache.store(self.url, self.save_path, self.hashes['sha256'], remote['etag'],
+                                 remote['last_modified'])
+            except OSError:
+                pass  # The download itself is fine; it just will not be deduplicated
+
+    def verify_hash(self):
+        if not self.expected_hash:
+            return
+        algorithm, expected = self.expected_hash
+        actual = self.hashes[algorithm]
+        if actual != expected:
+            raise IOError(f"{algorithm} mismatch: expected {expected}, got {actual}")
+
+    def download_segmented(self, remote):
+        """Download byte ranges in parallel into a preallocated file, resuming a previous attempt if possible."""
+        total_size = remote['total_size']
+        state = self.load_state()
+        self.opened_file = True
+        if not self.can_resume(state, remote):
+            with open(self.save_path, 'wb') as file:
+                self.preallocate_file(file, total_size)
+            state = {
+                'url': self.url,
+                'etag': remote['etag'],
+                'last_modified': remote['last_modified'],
+                'total_size': total_size,
+                'segments': [{'start': start, 'end': end, 'received': 0}
+                             for start, end in split_ranges(total_size, self.segments)],
+            }
+
+        self._state = state
+        self.start_progress(total_size, sum(segment['received'] for segment in state['segments']))
+
+        pending = [segment for segment in state['segments']
+                   if segment['start'] + segment['received'] <= segment['end']]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+                futures = {pool.submit(self.fetch_range, segment) for segment in pending}
+                try:
+                    while futures:
+                        done, futures = wait(futures, timeout=CHECKPOINT_INTERVAL, return_when=FIRST_EXCEPTION)
+                        for future in done:
+                            future.result()
+                        self.save_state()
+                        # Hash segments the first one has reached while their bytes are still cached in memory
+                        self._hasher.catch_up(self.save_path, self.contiguous_size())
+                except Exception:
+                    self._abort.set()  # Stop the remaining workers early
+                    raise
+        finally:
+            # Workers have stopped here, so the checkpoint matches what is on disk
+            self.save_state()
+        self.clear_state()
+
+    def preallocate_file(self, file, size):
+        """Size the file up front; real block allocation avoids fragmentation and fails early on a full disk."""
+        file.truncate(size)
+        if self.preallocate and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(file.fileno(), 0, size)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise
+                # Filesystems without fallocate support keep the sparse file
+
+    def can_resume(self, state, remote):
+        """Check that a saved state still describes the same remote file and the partial file on disk."""
+        if not state or not (remote['etag'] or remote['last_modified']):
+            return False
+        return (state.get('url') == self.url
+                and state.get('total_size') == remote['total_size']
+                and state.get('etag') == remote['etag']
+                and state.get('last_modified') == remote['last_modified']
+                and os.path.exists(self.save_path)
+                and os.path.getsize(self.save_path) == remote['total_size'])
+
+    def fetch_range(self, segment):
+        """Fetch the rest of a segment, resuming from where a dropped connection stopped."""
+        for attempt in range(SEGMENT_RETRIES):
+            try:
+                self.fetch_remaining(segment)
+                return
+            except RETRYABLE_ERRORS:
+                if attempt == SEGMENT_RETRIES - 1 or self._abort.is_set():
+                    raise
+                time.sleep(2 ** attempt)
+
+    def fetch_remaining(self, segment):
+        """Fetch the missing bytes of a segment and write them at their offset in the file."""
+        start = segment['start'] + segment['received']
+        end = segment['end']
+        if start > end:
+            return
+
+        headers = dict(IDENTITY_ENCODING, Range=f'bytes={start}-{end}')
+        validator = self._state['etag'] or self._state['last_modified']
+        if validator:
+            headers['If-Range'] = validator  # The server sends the full file instead if it changed
+        with self.session.get(self.url, headers=headers, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Server ignored range request for bytes {start}-{end} or the file changed")
+
+            expected = end - start + 1
+            # Each worker has its own handle, so seeks never race with other segments
+            with open(self.save_path, 'r+b') as file:
+                file.seek(start)
+                received = self.copy_stream(response, file, segment, expected, start)
+
+            if received != expected:
+                raise requests.exceptions.ConnectionError(
+                    f"Connection closed after {received} of {expected} bytes of segment {start}-{end}")
+
+    def copy_stream(self, response, file, segment=None, expected=None, position=0):
+        """Copy a response body into file at position through one reusable buffer and return the bytes written.
+
+        Bytes that continue the hashed prefix are hashed on the way, without reading them back.
+        """
+        buffer = memoryview(bytearray(MAX_CHUNK_SIZE))
+        chunk_size = MIN_CHUNK_SIZE
+        written = 0
+        while expected is None or written < expected:
+            size = chunk_size if expected is None else min(chunk_size, expected - written)
+            started = time.monotonic()
+            try:
+                count = response.raw.readinto(buffer[:size])
+            except ProtocolError as e:  # Map urllib3 errors the same way iter_content does
+                raise requests.exceptions.ChunkedEncodingError(e)
+            except ReadTimeoutError as e:
+                raise requests.exceptions.ConnectionError(e)
+            if not count:
+                break
+            self.throttle(count)
+            file.write(buffer[:count])
+            if segment is not None:
+                file.flush()  # Only bytes handed to the OS may be recorded in the checkpoint
+            self._hasher.update(position + written, buffer[:count])
+            written += count
+            self.add_progress(segment, count)
+            chunk_size = adapt_chunk_size(chunk_size, count, time.monotonic() - started)
+        return written
+
+    def start_progress(self, total_size, downloaded_size):
+        with self._lock:
+            self._total_size = total_size
+            self._downloaded_size = downloaded_size
+            self._last_emit_size = downloaded_size
+            self._last_emit_time = time.monotonic()
+            self._speed = 0.0
+        self.emit_progress(total_size, downloaded_size, 0.0)  # Show how much a resumed download already has
+
+    def add_progress(self, segment, size):
+        """Fold a segment's bytes into the combined progress, emitting at most every PROGRESS_INTERVAL."""
+        with self._lock:
+            if segment is not None:
+                segment['received'] += size
+            self._downloaded_size += size
+            now = time.monotonic()
+            elapsed = now - self._last_emit_time
+            if elapsed < PROGRESS_INTERVAL:
+                return
+            speed = (self._downloaded_size - self._last_emit_size) / elapsed
+            self._speed = speed if not self._speed else 0.7 * self._speed + 0.3 * speed  # Smooth out bursts
+            self._last_emit_time = now
+            self._last_emit_size = self._downloaded_size
+            total_size, downloaded_size, speed = self._total_size, self._downloaded_size, self._speed
+        self.emit_progress(total_size, downloaded_size, speed)
+
+    def contiguous_size(self):
+        """Length of the prefix of the file that every segment up to it has written."""
+        size = 0
+        with self._lock:
+            for segment in self._state['segments']:
+                if segment['start'] != size:
+                    break
+                size = segment['start'] + segment['received']
+                if size <= segment['end']:
+                    break
+        return size
+
+    def emit_progress(self, total_size, downloaded_size, speed):
+        percent = min(100, downloaded_size * 100 // total_size) if total_size else 0
+        eta = (total_size - downloaded_size) / speed if total_size and speed else -1
+        self.progress.emit(percent)
+        self.stats.emit(downloaded_size, speed, eta)
+
+    def load_state(self):
+        """Return the sidecar state of an interrupted download, or None."""
+        try:
+            with open(self.state_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def save_state(self):
+        """Atomically write the current state so a crash never leaves a half-written sidecar."""
+        with self._lock:
+            data = json.dumps(self._state)
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(data)
+        os.replace(temp_path, self.state_path)
+
+    def clear_state(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+
+class DownloadItem:
+    """A queued download and its scheduling state."""
+
+    _sequence = itertools.count()
+
+    def __init__(self, url, save_path, priority=PRIORITIES["Normal"], segments=DEFAULT_SEGMENTS, rate_limit=0,
+                 expected_hash=None):
+        self.url = url
+        self.save_path = save_path
+        self.priority = priority
+        self.segments = segments
+        self.rate_limit = rate_limit
+        self.expected_hash = expected_hash  # (algorithm, hexdigest) from parse_expected_hash
+        self.hashes = {}  # Hex digests of the finished file, by algorithm
+        self.sequence = next(self._sequence)  # Keeps FIFO order within a priority
+        self.status = STATUS_QUEUED
+        self.progress = 0
+        self.downloaded_size = 0
+        self.speed = 0.0
+        self.eta = -1
+        self.message = ""
+        self.thread = None
+        self.active = False
+        self.stop_status = None  # Status to apply once an active transfer has stopped
+        self.opened_file = False  # Whether any run wrote save_path, which makes it this download's partial file
+        self.run_started = 0.0
+        self.active_seconds = 0.0  # Time spent transferring, not counting pauses
+
+
+class DownloadQueue(QObject):
+    """Schedules queued downloads with a concurrency limit and a global bandwidth limit."""
+
+    item_added = pyqtSignal(int)
+    item_changed = pyqtSignal(int)
+
+    def __init__(self, max_active=DEFAULT_MAX_ACTIVE, global_rate_limit=0, history=None, cache=None, parent=None):
+        super().__init__(parent)
+        self.items = []
+        self.history = history  # Download_history.DownloadHistoryStore that finished downloads are added to
+        self.cache = cache  # Download_cache.ContentCache shared by every transfer
+        self.max_active = max_active
+        self.global_limit = TokenBucket(global_rate_limit)
+
+    def add(self, url, save_path, priority=PRIORITIES["Normal"], segments=DEFAULT_SEGMENTS, rate_limit=0,
+            expected_hash=None):
+        item = DownloadItem(url, save_path, priority, segments, rate_limit, expected_hash)
+        self.items.append(item)
+        row = len(self.items) - 1
+        self.item_added.emit(row)
+        self.schedule()
+        return row
+
+    def set_max_active(self, max_active):
+        self.max_active = max_active
+        self.schedule()
+
+    def set_global_rate_limit(self, rate):
+        self.global_limit.set_rate(rate)
+
+    def schedule(self):
+        """Start the highest priority queued items while there are free transfer slots."""
+        free_slots = self.max_active - sum(1 for item in self.items if item.active)
+        if free_slots <= 0:
+            return
+        queued = sorted((item for item in self.items if item.status == STATUS_QUEUED),
+                        key=lambda item: (item.priority, item.sequence))
+        for item in queued[:free_slots]:
+            self.start_item(item)
+
+    def start_item(self, item):
+        if item.thread is not None:
+            item.thread.wait()  # The previous run has already signalled; let it return before replacing it
+        thread = DownloadThread(item.url, item.save_path, item.segments, item.rate_limit, self.global_limit,
+                                expected_hash=item.expected_hash, cache=self.cache)
+        thread.progress.connect(lambda value, item=item: self.on_progress(item, value))
+        thread.stats.connect(lambda size, speed, eta, item=item: self.on_stats(item, size, speed, eta))
+        thread.finished.connect(lambda message, item=item: self.on_done(item, STATUS_COMPLETED, message))
+        thread.error.connect(lambda message, item=item: self.on_done(item, STATUS_FAILED, message))
+        thread.stopped.connect(lambda item=item: self.on_stopped(item))
+        item.thread = thread
+        item.active = True
+        item.stop_status = None
+        item.status = STATUS_DOWNLOADING
+        item.message = ""
+        item.run_started = time.monotonic()
+        self.item_changed.emit(self.items.index(item))
+        thread.start()
+
+    def pause(self, row):
+        self.stop_item(self.items[row], STATUS_PAUSED)
+
+    def resume(self, row):
+        item = self.items[row]
+        if item.status in (STATUS_PAUSED, STATUS_FAILED):
+            item.status = STATUS_QUEUED
+            self.item_changed.emit(row)
+            self.schedule()
+
+    def cancel(self, row):
+        self.stop_item(self.items[row], STATUS_CANCELLED)
+
+    def stop_item(self, item, status):
+        if item.active:
+            item.stop_status = status
+            item.thread.stop()
+            return
+        if item.status in (STATUS_COMPLETED, STATUS_CANCELLED):
+            return
+        if status == STATUS_PAUSED and item.status != STATUS_QUEUED:
+            return
+        item.status = status
+        if status == STATUS_CANCELLED:
+            self.discard_partial(item)
+            self.record(item)
+        self.item_changed.emit(self.items.index(item))
+
+    def shutdown(self):
+        """Stop every active transfer, keeping checkpoints so they resume on the next run."""
+        for item in self.items:
+            if item.active:
+                item.stop_status = STATUS_PAUSED
+                item.thread.stop()
+        for item in self.items:
+            if item.thread is not None:
+                item.thread.wait()
+
+    def on_progress(self, item, value):
+        item.progress = value
+        self.item_changed.emit(self.items.index(item))
+
+    def on_stats(self, item, downloaded_size, speed, eta):
+        item.downloaded_size = downloaded_size
+        item.speed = speed
+        item.eta = eta
+        self.item_changed.emit(self.items.index(item))
+
+    def on_done(self, item, status, message):
+        item.active = False
+        item.active_seconds += time.monotonic() - item.run_started
+        item.speed = 0.0
+        item.eta = -1
+        item.opened_file = item.opened_file or item.thread.opened_file
+        item.status = status
+        item.message = message
+        if status == STATUS_COMPLETED:
+            item.progress = 100
+            item.hashes = item.thread.hashes
+        self.record(item)
+        self.item_changed.emit(self.items.index(item))
+        self.schedule()
+
+    def on_stopped(self, item):
+        item.active = False
+        item.active_seconds += time.monotonic() - item.run_started
+        item.speed = 0.0
+        item.eta = -1
+        item.opened_file = item.opened_file or item.thread.opened_file
+        item.status = item.stop_status or STATUS_PAUSED
+        if item.status == STATUS_CANCELLED:
+            self.discard_partial(item)
+            self.record(item)
+        self.item_changed.emit(self.items.index(item))
+        self.schedule()
+
+    def record(self, item):
+        """Add a download that completed, failed or was cancelled to the history."""
+        if self.history is None:
+            return
+        size = item.downloaded_size
+        if item.status == STATUS_COMPLETED and os.path.exists(item.save_path):
+            size = os.path.getsize(item.save_path)
+        status = f"{item.status}: {item.message}" if item.status == STATUS_FAILED and item.message else item.status
+        self.history.add(item.save_path, item.url, size, status, item.active_seconds, item.hashes.get('sha256', ""))
+
+    def discard_partial(self, item):
+        """Remove the partial file and checkpoint of a cancelled download.
+
+        A file the download never opened, such as one the user already had at the save path, is left alone.
+        """
+        if item.opened_file:
+            for path in (item.save_path, item.save_path + STATE_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+        item.progress = 0
+
+
+class BatchDownloadThread(QThread):
+    """Runs a list of downloads on one Download_engine event loop instead of a thread per download."""
+
+    event = pyqtSignal(object)  # Download_engine event dict
+
+    def __init__(self, items, jobs=Download_engine.DEFAULT_JOBS, parent=None):
+        super().__init__(parent)
+        self.items = items  # (url, save path) pairs
+        self.jobs = jobs
+        self._loop = None
+        self._task = None
+        self._stopped = False
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        engine = Download_engine.DownloadEngine(self.jobs, self.event.emit)
+        self._task = self._loop.create_task(engine.run(self.items))
+        if self._stopped:  # stop() came before the task existed
+            self._task.cancel()
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass  # Stopped; the .part files resume with the next batch
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        self._stopped = True
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._cancel)
+            except RuntimeError:
+                pass  # The loop closed in between; there is nothing left to stop
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
 
 class DownloadManager(QWidget):
-    def __init__(self):
+    COLUMNS = ["File", "URL", "Priority", "Status", "Downloaded", "Speed", "ETA", "Progress"]
+
+    def __init__(self, history=None, cache=None):
         super().__init__()
+        self.queue = DownloadQueue(history=history, cache=cache, parent=self)
+        self.queue.item_added.connect(self.add_row)
+        self.queue.item_changed.connect(self.update_row)
+        self.batch = None  # BatchDownloadThread of the URL list being downloaded
+        self.batch_stats = {}
         self.initUI()
 
     def initUI(self):
         self.setWindowTitle("sDownload Manager")
-        self.setGeometry(300, 200, 500, 250)
+        self.setGeometry(300, 200, 800, 450)
         # Set window icon (favicon)
         self.setWindowIcon(QIcon("favicon.ico"))  # Change "icon.ico" to your icon file
 
@@ -62,19 +936,86 @@ class DownloadManager(QWidget):
         self.extension_input.setPlaceholderText("Optional: Enter desired file extension (e.g., .txt, .mp4)")
         layout.addWidget(self.extension_input)
 
+        self.hash_input = QLineEdit(self)
+        self.hash_input.setPlaceholderText("Optional: Expected checksum (SHA-256 hex, or algorithm:hex such as md5:...)")
+        layout.addWidget(self.hash_input)
+
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel("Connections:", self))
+        self.segments_input = QSpinBox(self)
+        self.segments_input.setRange(1, MAX_SEGMENTS)
+        self.segments_input.setValue(DEFAULT_SEGMENTS)
+        options_layout.addWidget(self.segments_input)
+
+        options_layout.addWidget(QLabel("Priority:", self))
+        self.priority_input = QComboBox(self)
+        self.priority_input.addItems(list(PRIORITIES.keys()))
+        self.priority_input.setCurrentText("Normal")
+        options_layout.addWidget(self.priority_input)
+
+        options_layout.addWidget(QLabel("Limit (KB/s, 0 = none):", self))
+        self.rate_limit_input = QSpinBox(self)
+        self.rate_limit_input.setRange(0, 10 ** 6)
+        options_layout.addWidget(self.rate_limit_input)
+        layout.addLayout(options_layout)
+
         self.save_button = QPushButton("Choose Save Location", self)
         self.save_button.clicked.connect(self.choose_save_location)
         layout.addWidget(self.save_button)
 
-        self.download_button = QPushButton("Download", self)
+        self.download_button = QPushButton("Add to Queue", self)
         self.download_button.clicked.connect(self.start_download)
         layout.addWidget(self.download_button)
 
-        self.progress_bar = QProgressBar(self)
-        layout.addWidget(self.progress_bar)
+        # URL lists run on the asyncio engine, which keeps hundreds of transfers going without a thread each
+        batch_layout = QHBoxLayout()
+        self.batch_button = QPushButton("Download URL List...", self)
+        self.batch_button.clicked.connect(self.toggle_batch)
+        batch_layout.addWidget(self.batch_button)
+        batch_layout.addWidget(QLabel("Parallel:", self))
+        self.batch_jobs_input = QSpinBox(self)
+        self.batch_jobs_input.setRange(1, Download_engine.MAX_JOBS)
+        self.batch_jobs_input.setValue(Download_engine.DEFAULT_JOBS)
+        batch_layout.addWidget(self.batch_jobs_input)
+        self.batch_label = QLabel(self)
+        batch_layout.addWidget(self.batch_label, 1)
+        layout.addLayout(batch_layout)
+
+        # Queue-wide settings
+        queue_layout = QHBoxLayout()
+        queue_layout.addWidget(QLabel("Active downloads:", self))
+        self.max_active_input = QSpinBox(self)
+        self.max_active_input.setRange(1, 32)
+        self.max_active_input.setValue(self.queue.max_active)
+        self.max_active_input.valueChanged.connect(self.queue.set_max_active)
+        queue_layout.addWidget(self.max_active_input)
 
-        self.status_label = QLabel("", self)
-        layout.addWidget(self.status_label)
+        queue_layout.addWidget(QLabel("Global limit (KB/s, 0 = none):", self))
+        self.global_limit_input = QSpinBox(self)
+        self.global_limit_input.setRange(0, 10 ** 6)
+        self.global_limit_input.valueChanged.connect(lambda value: self.queue.set_global_rate_limit(value * 1024))
+        queue_layout.addWidget(self.global_limit_input)
+        layout.addLayout(queue_layout)
+
+        self.download_table = QTableWidget(0, len(self.COLUMNS), self)
+        self.download_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.download_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.download_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.download_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.download_table)
+
+        # Per-item controls act on the selected rows
+        controls_layout = QHBoxLayout()
+        for text, action in (("Pause", self.queue.pause), ("Resume", self.queue.resume),
+                             ("Cancel", self.queue.cancel)):
+            button = QPushButton(text, self)
+            button.clicked.connect(lambda checked=False, action=action: self.apply_to_selected(action))
+            controls_layout.addWidget(button)
+        if self.queue.history is not None:
+            history_button = QPushButton("History", self)
+            history_button.clicked.connect(self.show_history)
+            controls_layout.addWidget(history_button)
+        layout.addLayout(controls_layout)
 
         self.setLayout(layout)
 
@@ -100,39 +1041,131 @@ class DownloadManager(QWidget):
             QMessageBox.warning(self, "Warning", "Please provide a file extension or make sure the URL points to a file.")
             return
 
-        self.download_button.setEnabled(False)  # Disable download button during download
-        self.status_label.setText("Downloading...")
+        try:
+            expected_hash = parse_expected_hash(self.hash_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+
+        self.enqueue(url, self.save_path, expected_hash)
+
+        # Clear the inputs so the next URL can be queued straight away
+        self.url_input.clear()
+        self.hash_input.clear()
+        self.save_path = None
+
+    def enqueue(self, url, save_path, expected_hash=None):
+        """Queue a download with the current connection, priority and limit settings."""
+        return self.queue.add(url, save_path, PRIORITIES[self.priority_input.currentText()],
+                              self.segments_input.value(), self.rate_limit_input.value() * 1024, expected_hash)
+
+    def apply_to_selected(self, action):
+        for row in sorted({index.row() for index in self.download_table.selectedIndexes()}):
+            action(row)
+
+    def add_row(self, row):
+        self.download_table.insertRow(row)
+        for column in range(len(self.COLUMNS) - 1):
+            self.download_table.setItem(row, column, QTableWidgetItem())
+        self.download_table.setCellWidget(row, len(self.COLUMNS) - 1, QProgressBar(self.download_table))
+        self.update_row(row)
+
+    def update_row(self, row):
+        item = self.queue.items[row]
+        priority = next(name for name, value in PRIORITIES.items() if value == item.priority)
+        status = f"{item.status}: {item.message}" if item.status == STATUS_FAILED else item.status
+        if item.status == STATUS_COMPLETED and item.message.startswith("Not modified"):
+            status = f"{item.status} (not modified)"
+        speed = f"{format_size(item.speed)}/s" if item.speed else ""
+        texts = (os.path.basename(item.save_path), item.url, priority, status,
+                 format_size(item.downloaded_size), speed, format_eta(item.eta))
+        for column, text in enumerate(texts):
+            self.download_table.item(row, column).setText(text)
+        self.download_table.cellWidget(row, len(self.COLUMNS) - 1).setValue(item.progress)
+
+    def show_history(self):
+        DownloadHistoryDialog(self.queue.history, self).exec_()
+
+    def toggle_batch(self):
+        if self.batch is not None:
+            self.batch.stop()
+            return
+        list_path, _ = QFileDialog.getOpenFileName(self, "URL List", "", "Text Files (*.txt);;All Files (*)")
+        if not list_path:
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Save Files In")
+        if not directory:
+            return
+        with open(list_path, encoding='utf-8') as file:
+            entries = list(Download_engine.read_batch(file))
+        taken = set()
+        items = [(url, Download_engine.unique_path(directory, name or Download_engine.file_name(url), taken))
+                 for url, name in entries]
+        if not items:
+            QMessageBox.warning(self, "Warning", "The list has no URLs.")
+            return
+        self.batch_stats = {'total': len(items), 'done': 0, 'failed': 0, 'bytes': 0, 'speeds': {}}
+        self.batch = BatchDownloadThread(items, self.batch_jobs_input.value(), self)
+        self.batch.event.connect(self.on_batch_event)
+        self.batch.finished.connect(self.on_batch_finished)
+        self.batch_button.setText("Stop URL List")
+        self.batch_jobs_input.setEnabled(False)
+        self.batch.start()
+        self.update_batch_label()
+
+    def on_batch_event(self, event):
+        stats = self.batch_stats
+        if event['event'] == 'progress':
+            stats['speeds'][event['path']] = event['speed']
+        elif event['event'] == 'finished':
+            stats['speeds'].pop(event['path'], None)
+            stats['done'] += 1
+            stats['failed'] += not event['ok']
+            stats['bytes'] += event.get('bytes', 0)
+            if self.queue.history is not None:
+                status = STATUS_COMPLETED if event['ok'] else f"{STATUS_FAILED}: {event['error']}"
+                self.queue.history.add(event['path'], event['url'], event.get('bytes', 0), status, event['seconds'],
+                                       event.get('sha256', ""))
+        else:
+            return
+        self.update_batch_label()
 
-        # Show a pop-up message while downloading
-        self.in_progress_popup = QMessageBox(self)
-        self.in_progress_popup.setIcon(QMessageBox.Icon.Information)
-        self.in_progress_popup.setWindowTitle("Download in Progress")
-        self.in_progress_popup.setText("Download is in progress. Please wait...")
-        self.in_progress_popup.setStandardButtons(QMessageBox.StandardButton.NoButton)
-        self.in_progress_popup.show()
+    def update_batch_label(self):
+        stats = self.batch_stats
+        text = f"{stats['done']} of {stats['total']} done"
+        if stats['failed']:
+            text += f", {stats['failed']} failed"
+        speed = sum(stats['speeds'].values())
+        if speed:
+            text += f", {format_size(speed)}/s"
+        self.batch_label.setText(text)
 
-        self.download_thread = DownloadThread(url, self.save_path)
-        self.download_thread.progress.connect(self.progress_bar.setValue)
-        self.download_thread.finished.connect(self.download_finished)
-        self.download_thread.error.connect(self.download_error)
-        self.download_thread.start()
+    def on_batch_finished(self):
+        self.batch = None
+        self.batch_stats['speeds'].clear()
+        self.update_batch_label()
+        self.batch_button.setText("Download URL List...")
+        self.batch_jobs_input.setEnabled(True)
 
-    def download_finished(self, message):
-        self.download_button.setEnabled(True)  # Re-enable the download button
-        self.status_label.setText(message)
-        self.in_progress_popup.close()  # Close the in-progress pop-up
-        QMessageBox.information(self, "Success", message)
-        self.progress_bar.setValue(100)
+    def shutdown(self):
+        """Stop the queue and any URL list being downloaded, and wait for them to let go of the history and cache."""
+        self.queue.shutdown()
+        if self.batch is not None:
+            self.batch.stop()
+            self.batch.wait()
 
-    def download_error(self, error_message):
-        self.download_button.setEnabled(True)  # Re-enable the download button
-        self.status_label.setText(f"Error: {error_message}")
-        self.in_progress_popup.close()  # Close the in-progress pop-up
-        QMessageBox.critical(self, "Error", f"Download failed: {error_message}")
+    def closeEvent(self, event):
+        self.shutdown()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = DownloadManager()
+    history = DownloadHistoryStore()
+    cache = ContentCache()
+    window = DownloadManager(history, cache)
     window.show()
-    sys.exit(app.exec())
+    status = app.exec()
+    history.close()
+    cache.close()
+    sys.exit(status)
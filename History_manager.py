@@ -0,0 +1,309 @@
+import os
+import re
+import math
+import time
+import queue
+import sqlite3
+import itertools
+import threading
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtWidgets import QCompleter
+from PyQt5.QtCore import Qt, QThread, QStandardPaths
+
+HISTORY_FILE = "history.db"
+HALF_LIFE = 30 * 24 * 60 * 60  # A visit counts half as much after this many seconds
+VISIT_WEIGHT = 1.0
+BOOKMARK_BONUS = 2.0  # Bookmarked pages rank as if visited 2 ** 2 times as often
+MAX_SUGGESTIONS = 10
+SCAN_ROWS = 1000  # Most frecent pages searched by substring before falling back to the full-text index
+FTS_CANDIDATES = 500  # Full-text matches ranked per query; keeps very common words cheap
+MIN_FTS_TOKEN_LENGTH = 2  # The full-text prefix index starts at two characters
+URL_NOISE = {"http", "https", "www"}  # In nearly every URL, so they would only slow the full-text query down
+TOKEN_PATTERN = re.compile(r"\w+")
+WRITE_BATCH_SIZE = 200
+WRITE_BATCH_SECONDS = 2.0  # Longest a visit waits in memory before it is written
+EXPIRE_EVERY_VISITS = 5000
+DEFAULT_MAX_DAYS = 180
+DEFAULT_MAX_ENTRIES = 500000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS places (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL DEFAULT '',
+        visit_count INTEGER NOT NULL DEFAULT 0,
+        last_visit REAL NOT NULL,
+        frecency REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS places_frecency ON places (frecency DESC);
+    CREATE INDEX IF NOT EXISTS places_last_visit ON places (last_visit);
+    CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+        title, url, content='places', content_rowid='id', prefix='2 3');
+    CREATE TRIGGER IF NOT EXISTS places_fts_insert AFTER INSERT ON places BEGIN
+        INSERT INTO places_fts (rowid, title, url) VALUES (new.id, new.title, new.url);
+    END;
+    CREATE TRIGGER IF NOT EXISTS places_fts_delete AFTER DELETE ON places BEGIN
+        INSERT INTO places_fts (places_fts, rowid, title, url) VALUES ('delete', old.id, old.title, old.url);
+    END;
+    CREATE TRIGGER IF NOT EXISTS places_fts_update AFTER UPDATE OF title ON places
+    WHEN old.title IS NOT new.title BEGIN
+        INSERT INTO places_fts (places_fts, rowid, title, url) VALUES ('delete', old.id, old.title, old.url);
+        INSERT INTO places_fts (rowid, title, url) VALUES (new.id, new.title, new.url);
+    END;
+"""
+
+
+def history_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, HISTORY_FILE)
+
+
+def frecency(visits, now):
+    """Score for a page visited `visits` times just now.
+
+    Scores are stored as log2(score) + time / HALF_LIFE, so older scores decay without ever being rewritten
+    and sorting by the stored value matches sorting by the decayed score.
+    """
+    return math.log2(visits) + now / HALF_LIFE
+
+
+def decayed_visits(score, now):
+    """How many visits just now a stored frecency is worth."""
+    return 2.0 ** (score - now / HALF_LIFE)
+
+
+def bump_frecency(old, now, weight=VISIT_WEIGHT):
+    """Add a visit to a stored frecency."""
+    decayed = decayed_visits(old, now) if old is not None else 0.0
+    return frecency(decayed + weight, now)
+
+
+def like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def fts_query(text):
+    """Full-text query requiring every word of text; short and noise words are left to the caller to check.
+
+    Only a word still being typed at the end of text is matched as a prefix; finished words are matched
+    whole, which reads one index entry instead of merging every word that starts with them.
+    """
+    text = text.lower()
+    phrases = {}
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if len(token) >= MIN_FTS_TOKEN_LENGTH and token not in URL_NOISE:
+            phrases[f'"{token}"*' if match.end() == len(text) else f'"{token}"'] = None
+    return " ".join(phrases)
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")  # Readers in the GUI thread never wait for the writer
+    db.execute("PRAGMA synchronous = NORMAL")
+    return db
+
+
+class HistoryWriter(QThread):
+    """Writes visits and expiry jobs on its own connection, batching visits into one transaction."""
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.jobs = queue.Queue()
+        self.visits_since_expire = 0
+        self.limits = (DEFAULT_MAX_DAYS, DEFAULT_MAX_ENTRIES)
+        self.ready = threading.Event()  # Set once the database and its tables exist
+
+    def run(self):
+        db = sqlite3.connect(self.path)
+        # auto_vacuum only takes effect on a new database, before the first table is created
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.executescript(SCHEMA)
+        db.close()
+        self.ready.set()
+
+        db = connect(self.path)
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                batch = [job]
+                deadline = time.monotonic() + WRITE_BATCH_SECONDS
+                while len(batch) < WRITE_BATCH_SIZE:
+                    try:
+                        job = self.jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        break
+                    batch.append(job)
+                self.write(db, batch)
+                if job is None:
+                    break
+        finally:
+            db.close()
+
+    def write(self, db, batch):
+        visits = [job for job in batch if job[0] == "visit"]
+        if visits:
+            with db:
+                for kind, url, title, now in visits:
+                    row = db.execute("SELECT frecency FROM places WHERE url = ?", (url,)).fetchone()
+                    db.execute(
+                        "INSERT INTO places (url, title, visit_count, last_visit, frecency) VALUES (?, ?, 1, ?, ?)"
+                        " ON CONFLICT (url) DO UPDATE SET title = CASE WHEN excluded.title != '' THEN excluded.title"
+                        " ELSE title END, visit_count = visit_count + 1, last_visit = excluded.last_visit,"
+                        " frecency = excluded.frecency",
+                        (url, title, now, bump_frecency(row[0] if row else None, now)))
+            self.visits_since_expire += len(visits)
+        for job in batch:
+            if job[0] == "limits":
+                self.limits = job[1:]
+                self.visits_since_expire = EXPIRE_EVERY_VISITS
+        if self.visits_since_expire >= EXPIRE_EVERY_VISITS:
+            self.expire(db, *self.limits)
+            self.visits_since_expire = 0
+
+    def expire(self, db, max_days, max_entries):
+        """Drop pages not visited for max_days and the least frecent beyond max_entries, then give back the space."""
+        with db:
+            if max_days:
+                db.execute("DELETE FROM places WHERE last_visit < ?", (time.time() - max_days * 24 * 60 * 60,))
+            if max_entries:
+                db.execute("DELETE FROM places WHERE id IN (SELECT id FROM places ORDER BY frecency DESC"
+                           " LIMIT -1 OFFSET ?)", (max_entries,))
+            db.execute("INSERT INTO places_fts (places_fts) VALUES ('optimize')")
+        db.execute("PRAGMA incremental_vacuum").fetchall()  # Frees one page per step, so run it to the end
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+class HistoryStore:
+    """On-disk browsing history ranked by frecency; writes go through a background thread."""
+
+    def __init__(self, path=None):
+        self.path = path or history_path()
+        self.db = None
+        # The writer thread opens (and if needed creates) the database, keeping that off the GUI thread at startup
+        self.writer = HistoryWriter(self.path)
+        self.writer.start()
+
+    def connection(self, wait=False):
+        """Return the reading connection, or None while the writer is still setting up the database."""
+        if self.db is None and self.writer.ready.wait(None if wait else 0):
+            self.db = connect(self.path)
+        return self.db
+
+    def record_visit(self, url, title=""):
+        """Queue a visit; it is written with the next batch."""
+        self.writer.jobs.put(("visit", url, title or "", time.time()))
+
+    def expire(self, max_days=DEFAULT_MAX_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        """Set the retention limits and apply them with the next batch; 0 turns a limit off."""
+        self.writer.jobs.put(("limits", max_days, max_entries))
+
+    def close(self):
+        """Write out the queued visits and stop the writer thread."""
+        self.writer.jobs.put(None)
+        self.writer.wait()
+        if self.db is not None:
+            self.db.close()
+
+    def __len__(self):
+        return self.connection(wait=True).execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def frecencies(self, urls):
+        """Map the given URLs that are in history to their frecency."""
+        urls = list(urls)
+        db = self.connection()
+        if not urls or db is None:
+            return {}
+        placeholders = ", ".join("?" * len(urls))
+        return dict(db.execute(f"SELECT url, frecency FROM places WHERE url IN ({placeholders})", urls))
+
+    def suggest(self, text, limit=MAX_SUGGESTIONS):
+        """Return up to limit (frecency, url, title) rows containing every word of text, most frecent first.
+
+        The most frecent pages are searched by substring first, which fills the list for common input. Rarer
+        input falls back to the full-text prefix index, so neither path touches more than a few thousand rows.
+        """
+        terms = text.lower().split()
+        db = self.connection()
+        if not terms or db is None:
+            return []
+        condition = " AND ".join(["(title LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\')"] * len(terms))
+        patterns = [pattern for term in terms for pattern in (like_pattern(term),) * 2]
+        rows = db.execute(
+            f"SELECT frecency, url, title FROM (SELECT frecency, url, title FROM places ORDER BY frecency DESC"
+            f" LIMIT ?) WHERE {condition} LIMIT ?", [SCAN_ROWS, *patterns, limit]).fetchall()
+
+        query = fts_query(text)
+        if len(rows) < limit and query:
+            candidates = db.execute(
+                "SELECT frecency, url, title FROM places WHERE id IN (SELECT rowid FROM places_fts"
+                " WHERE places_fts MATCH ? LIMIT ?) ORDER BY frecency DESC", (query, FTS_CANDIDATES))
+            seen = {row[1] for row in rows}
+            for row in candidates:
+                # The index matches word prefixes; terms it skipped still have to appear somewhere
+                haystack = f"{row[2]} {row[1]}".lower()
+                if row[1] not in seen and all(term in haystack for term in terms):
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        break
+        rows.sort(reverse=True)
+        return rows
+
+
+class OmniboxCompleter(QCompleter):
+    """Search bar drop-down that suggests history and bookmarks, most frecent first."""
+
+    UrlRole = Qt.UserRole + 1
+    ScoreRole = Qt.UserRole + 2
+
+    def __init__(self, history, bookmarks, line_edit, site_cache=None):
+        super().__init__(line_edit)
+        self.history = history
+        self.bookmarks = bookmarks
+        self.site_cache = site_cache  # Site_cache.SiteCache for favicons, if the browser has one
+        self.suggestions = QStandardItemModel(self)
+        self.setModel(self.suggestions)
+        self.setCompletionRole(self.UrlRole)  # Choosing a suggestion puts its URL in the search bar
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)  # Rows are already filtered and ranked
+        self.setMaxVisibleItems(MAX_SUGGESTIONS)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_suggestions)
+
+    def update_suggestions(self, text):
+        rows = {url: (score, url, title) for score, url, title in self.history.suggest(text)}
+
+        index = self.bookmarks.index()
+        results = index.search(text)
+        if results is not None:
+            matches = [index.bookmarks[bookmark_id] for bookmark_id in itertools.islice(results, MAX_SUGGESTIONS)]
+            scores = self.history.frecencies(bookmark.url for bookmark in matches)
+            now = time.time()
+            for bookmark in matches:
+                score = scores.get(bookmark.url, frecency(1, now)) + BOOKMARK_BONUS
+                rows[bookmark.url] = (score, bookmark.url, bookmark.title)
+
+        self.suggestions.clear()
+        for score, url, title in sorted(rows.values(), reverse=True)[:MAX_SUGGESTIONS]:
+            item = QStandardItem(f"{title} - {url}" if title else url)
+            item.setData(url, self.UrlRole)
+            item.setData(score, self.ScoreRole)
+            item.setToolTip(url)
+            if self.site_cache is not None:
+                item.setIcon(self.site_cache.icon(url))
+            self.suggestions.appendRow(item)
+        if self.suggestions.rowCount():
+            self.complete()
+        else:
+            self.popup().hide()
+
+    def top_suggestion(self):
+        """(url, frecency) of the first suggestion, or None."""
+        item = self.suggestions.item(0)
+        return (item.data(self.UrlRole), item.data(self.ScoreRole)) if item is not None else None
@@ -0,0 +1,163 @@
+import os
+import csv
+import json
+import time
+from PyQt5.QtCore import QObject, QStandardPaths, pyqtSignal
+from Tab_manager import process_rss
+
+METRICS_FILE = "page_metrics.jsonl"
+MAX_LOG_BYTES = 5 * 1024 * 1024  # The log is rolled over to METRICS_FILE.1 past this size, keeping two files
+
+# Columns of the log, in the order the CSV export writes them
+FIELDS = ["time", "url", "ok", "first_progress_ms", "load_ms", "ttfb_ms", "dom_interactive_ms",
+          "dom_content_loaded_ms", "load_event_ms", "transfer_bytes", "resources", "renderer_pid", "renderer_rss_mb"]
+
+# Navigation Timing of the page that just loaded; times are in ms since the navigation started
+NAVIGATION_TIMING_SCRIPT = """
+(function() {
+    var entry = performance.getEntriesByType("navigation")[0];
+    if (!entry) return null;
+    return {
+        ttfb_ms: entry.responseStart,
+        dom_interactive_ms: entry.domInteractive,
+        dom_content_loaded_ms: entry.domContentLoadedEventEnd,
+        load_event_ms: entry.loadEventEnd,
+        transfer_bytes: entry.transferSize,
+        resources: performance.getEntriesByType("resource").length
+    };
+})()
+"""
+
+
+def log_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, METRICS_FILE)
+
+
+def read_log(path=None):
+    """Return the logged page loads, oldest first."""
+    path = path or log_path()
+    entries = []
+    for name in (path + ".1", path):
+        try:
+            with open(name, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        pass  # A line cut short by a crash
+        except OSError:
+            pass
+    return entries
+
+
+def export_csv(destination, path=None):
+    with open(destination, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(read_log(path))
+
+
+def export_json(destination, path=None):
+    with open(destination, "w", encoding="utf-8") as file:
+        json.dump(read_log(path), file, indent=1)
+
+
+def format_metrics(metrics):
+    """One line for the status bar HUD."""
+    parts = [f"Load {metrics['load_ms'] / 1000:.2f} s"]
+    if metrics.get("first_progress_ms") is not None:
+        parts.append(f"first progress {metrics['first_progress_ms']:.0f} ms")
+    if metrics.get("ttfb_ms"):
+        parts.append(f"TTFB {metrics['ttfb_ms']:.0f} ms")
+    if metrics.get("dom_content_loaded_ms"):
+        parts.append(f"DOM ready {metrics['dom_content_loaded_ms']:.0f} ms")
+    if metrics.get("resources") is not None:
+        parts.append(f"{metrics['resources']} resources")
+    if metrics.get("renderer_pid"):
+        parts.append(f"renderer {metrics['renderer_pid']}: {metrics['renderer_rss_mb']:.0f} MB")
+    return " | ".join(parts)
+
+
+class LoadRecord:
+    """Timing of the load in progress in one tab."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_progress = None
+
+
+class PageLoadMonitor(QObject):
+    """Times page loads in each tab and appends the results to a rolling JSON lines log."""
+
+    metrics_ready = pyqtSignal(object, dict)  # Web view, metrics as logged
+
+    def __init__(self, parent=None, path=None):
+        super().__init__(parent)
+        self.path = path or log_path()
+        self.webviews = set()
+        self.loads = {}  # Web view -> LoadRecord of the load in progress
+        self.latest = {}  # Web view -> metrics of its last finished load
+
+    def track(self, webview):
+        self.webviews.add(webview)
+        webview.loadStarted.connect(lambda webview=webview: self.on_load_started(webview))
+        webview.loadProgress.connect(lambda progress, webview=webview: self.on_load_progress(webview, progress))
+        webview.loadFinished.connect(lambda ok, webview=webview: self.on_load_finished(webview, ok))
+
+    def untrack(self, webview):
+        self.webviews.discard(webview)
+        self.loads.pop(webview, None)
+        self.latest.pop(webview, None)
+
+    def on_load_started(self, webview):
+        self.loads[webview] = LoadRecord()
+
+    def on_load_progress(self, webview, progress):
+        record = self.loads.get(webview)
+        if record is not None and record.first_progress is None and progress > 0:
+            record.first_progress = time.monotonic()
+
+    def on_load_finished(self, webview, ok):
+        record = self.loads.pop(webview, None)
+        url = webview.url()
+        if record is None or url.scheme() not in ("http", "https"):
+            return  # Discarded tabs and internal pages are not worth logging
+        finished = time.monotonic()
+        metrics = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "url": url.toString(),
+            "ok": ok,
+            "first_progress_ms": None if record.first_progress is None
+            else round((record.first_progress - record.started) * 1000, 1),
+            "load_ms": round((finished - record.started) * 1000, 1),
+        }
+        page = webview.page()
+        pid = page.renderProcessPid() if hasattr(page, "renderProcessPid") else 0  # Qt 5.15
+        metrics["renderer_pid"] = pid
+        metrics["renderer_rss_mb"] = round(process_rss(pid) / (1024 * 1024), 1)
+        if ok:
+            page.runJavaScript(NAVIGATION_TIMING_SCRIPT,
+                               lambda timing, webview=webview: self.finish(webview, metrics, timing))
+        else:
+            self.finish(webview, metrics, None)
+
+    def finish(self, webview, metrics, timing):
+        if isinstance(timing, dict):
+            for key, value in timing.items():
+                # loadEventEnd is still 0 when the load event handlers have not returned yet
+                metrics[key] = None if key.endswith("_ms") and not value else round(value, 1)
+        self.write(metrics)
+        if webview in self.webviews:  # The tab may have been closed while the script ran
+            self.latest[webview] = metrics
+            self.metrics_ready.emit(webview, metrics)
+
+    def write(self, metrics):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > MAX_LOG_BYTES:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(metrics) + "\n")
+        except OSError:
+            pass  # The HUD still shows the numbers
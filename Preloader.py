@@ -0,0 +1,253 @@
+import sys
+import time
+import html
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, QUrl
+from PyQt5.QtWebEngineWidgets import QWebEnginePage, QWebEngineSettings
+from History_manager import decayed_visits
+
+try:
+    from PyQt5.QtDBus import QDBusConnection, QDBusInterface
+except ImportError:
+    QDBusInterface = None  # Without QtDBus a metered connection is only known from the setting
+
+DEFAULT_PRECONNECT = True
+DEFAULT_PRERENDER = False
+DEFAULT_METERED = "detect"
+DEFAULT_MAX_PRECONNECTS_PER_MINUTE = 30
+DEFAULT_MAX_PRERENDERS_PER_HOUR = 20
+METERED_NAMES = {"detect": "Detect (NetworkManager)", "metered": "Always metered (no preloading)",
+                 "unmetered": "Never metered"}
+MIN_PREDICT_CHARS = 2  # Shorter input matches too much to guess from
+MIN_PRERENDER_VISITS = 4.0  # Decayed visits the top suggestion needs to be prerendered; a bookmark counts as 4
+PRECONNECT_REUSE_S = 10  # Chromium closes a preconnected socket that is not used within about this long
+PRERENDER_DELAY_MS = 400  # Typing pause before the top suggestion is prerendered
+PRERENDER_TIMEOUT_MS = 60 * 1000  # A prerendered page nobody opened is dropped after this long
+HINT_PAGE_IDLE_MS = 30 * 1000  # The page carrying preconnect hints gives its renderer back after this long
+METERED_CHECK_S = 60
+NM_METERED = (1, 3)  # NetworkManager's NM_METERED_YES and NM_METERED_GUESS_YES
+STATS_KEY = "preload/stats/"
+
+
+def origin_of(url):
+    """scheme://host[:port] of an http(s) URL, or None."""
+    url = QUrl(url)
+    if url.scheme() not in ("http", "https") or not url.host():
+        return None
+    return url.adjusted(QUrl.RemoveUserInfo | QUrl.RemovePath | QUrl.RemoveQuery | QUrl.RemoveFragment).toString()
+
+
+def same_page(first, second):
+    """True if two URLs load the same page; http usually redirects to https, so the scheme is ignored."""
+    first, second = QUrl(first), QUrl(second)
+    return ((first.host().lower(), first.port(), first.path().rstrip("/"), first.query())
+            == (second.host().lower(), second.port(), second.path().rstrip("/"), second.query()))
+
+
+def without_scheme(url):
+    url = url.lower().split("://", 1)[-1]
+    return url[4:] if url.startswith("www.") else url
+
+
+def network_is_metered():
+    """True if NetworkManager says the primary connection is (or is probably) metered; False if unknown."""
+    if QDBusInterface is None or not sys.platform.startswith("linux"):
+        return False
+    manager = QDBusInterface("org.freedesktop.NetworkManager", "/org/freedesktop/NetworkManager",
+                             "org.freedesktop.NetworkManager", QDBusConnection.systemBus())
+    return manager.isValid() and manager.property("Metered") in NM_METERED
+
+
+def stats_summary(settings):
+    """One line per kind of preloading, for the settings dialog."""
+    stats = {name: settings.value(STATS_KEY + name, 0, type=int)
+             for name in ("preconnect_hits", "preconnect_misses", "prerender_hits", "prerender_misses", "saved_ms")}
+    preconnects = stats["preconnect_hits"] + stats["preconnect_misses"]
+    prerenders = stats["prerender_hits"] + stats["prerender_misses"]
+    lines = [f"Preconnect: {stats['preconnect_hits']} of {preconnects} searches went to a warmed-up site"
+             + (f" ({stats['preconnect_hits'] * 100 // preconnects}%)" if preconnects else ""),
+             f"Prerender: {stats['prerender_hits']} of {prerenders} pages opened"
+             + (f", {stats['saved_ms'] / 1000:.1f} s of loading saved" if stats["prerender_hits"] else "")]
+    return "\n".join(lines)
+
+
+class Prerender:
+    """A page loading off screen for the URL the user is expected to open next."""
+
+    def __init__(self, page, url):
+        self.page = page
+        self.url = url
+        self.started = time.monotonic()
+        self.finished = None
+        self.ok = None
+
+
+class Preloader(QObject):
+    """Guesses where the search bar is going while the user types and gets there early.
+
+    Every guess preconnects: a hidden page carries <link rel=preconnect> hints, so DNS, TCP and TLS are done in
+    the profile's own socket pool by the time the page is opened. The top suggestion, when it has been visited
+    often enough and the input is a prefix of its URL, can also be prerendered in a page without a view and
+    handed to the tab with take(). Nothing is preloaded on a metered connection or beyond the hourly budgets.
+    Hits and misses are counted in QSettings, see stats_summary().
+    """
+
+    def __init__(self, profile, settings, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.settings = settings
+        self.hint_page = None
+        self.hint_timer = QTimer(self)
+        self.hint_timer.setSingleShot(True)
+        self.hint_timer.timeout.connect(self.release_hint_page)
+        self.preconnected = {}  # Origin -> monotonic time of its last preconnect
+        self.preconnect_times = deque()  # For the per-minute budget
+        self.typed_hosts = set()  # Hosts warmed up while the current input was typed
+        self.prerender = None
+        self.pending_url = None
+        self.prerender_times = deque()  # For the per-hour budget
+        self.prerender_timer = QTimer(self)
+        self.prerender_timer.setSingleShot(True)
+        self.prerender_timer.timeout.connect(self.start_prerender)
+        self.expiry_timer = QTimer(self)
+        self.expiry_timer.setSingleShot(True)
+        self.expiry_timer.timeout.connect(self.drop_prerender)
+        self.metered = None
+        self.metered_checked = 0.0
+        self.load_settings()
+
+    def load_settings(self):
+        self.preconnect_enabled = self.settings.value("preload/preconnect", DEFAULT_PRECONNECT, type=bool)
+        self.prerender_enabled = self.settings.value("preload/prerender", DEFAULT_PRERENDER, type=bool)
+        self.metered_mode = self.settings.value("preload/metered", DEFAULT_METERED)
+        self.max_preconnects = self.settings.value(
+            "preload/max_preconnects_per_minute", DEFAULT_MAX_PRECONNECTS_PER_MINUTE, type=int)
+        self.max_prerenders = self.settings.value(
+            "preload/max_prerenders_per_hour", DEFAULT_MAX_PRERENDERS_PER_HOUR, type=int)
+        if self.prerender is not None and (not self.prerender_enabled or self.is_metered()):
+            self.drop_prerender()
+
+    def is_metered(self):
+        if self.metered_mode != "detect":
+            return self.metered_mode == "metered"
+        now = time.monotonic()
+        if self.metered is None or now - self.metered_checked > METERED_CHECK_S:
+            self.metered = network_is_metered()
+            self.metered_checked = now
+        return self.metered
+
+    def count(self, name, amount=1):
+        key = STATS_KEY + name
+        self.settings.setValue(key, self.settings.value(key, 0, type=int) + amount)
+
+    def predict(self, text, search_url, top_suggestion):
+        """Called as the search bar is edited.
+
+        search_url is the selected engine's URL prefix, or '' when the input is visited as a URL.
+        top_suggestion is the (url, score) of the first omnibox suggestion, or None.
+        """
+        text = text.strip()
+        self.prerender_timer.stop()
+        self.pending_url = None
+        if len(text) < MIN_PREDICT_CHARS or self.is_metered():
+            return
+        # A half-typed address is not a host worth a lookup; the suggestions are
+        origins = [origin_of(search_url)] if search_url else []
+        candidate = None
+        if top_suggestion is not None:
+            url, score = top_suggestion
+            origins.append(origin_of(url))
+            if (decayed_visits(score, time.time()) >= MIN_PRERENDER_VISITS
+                    and without_scheme(url).startswith(without_scheme(text))):
+                candidate = url
+        if self.preconnect_enabled:
+            self.preconnect([origin for origin in dict.fromkeys(origins) if origin])
+        if candidate and self.prerender_enabled and self.max_prerenders:
+            if self.prerender is None or not same_page(self.prerender.url, candidate):
+                self.pending_url = candidate
+                self.prerender_timer.start(PRERENDER_DELAY_MS)
+
+    def preconnect(self, origins):
+        now = time.monotonic()
+        while self.preconnect_times and now - self.preconnect_times[0] > 60:
+            self.preconnect_times.popleft()
+        budget = max(self.max_preconnects - len(self.preconnect_times), 0)
+        cold = [origin for origin in origins
+                if now - self.preconnected.get(origin, -PRECONNECT_REUSE_S) >= PRECONNECT_REUSE_S][:budget]
+        for origin in cold:
+            self.preconnected[origin] = now
+            self.preconnect_times.append(now)
+        self.typed_hosts.update(QUrl(origin).host() for origin in origins if origin in self.preconnected)
+        if not cold:
+            return
+        if self.hint_page is None:
+            self.hint_page = QWebEnginePage(self.profile, self)
+            if hasattr(QWebEngineSettings, "DnsPrefetchEnabled"):  # Qt 5.12 and later
+                self.hint_page.settings().setAttribute(QWebEngineSettings.DnsPrefetchEnabled, True)
+        self.hint_page.setHtml("".join(f'<link rel="dns-prefetch" href="{html.escape(origin)}">'
+                                       f'<link rel="preconnect" href="{html.escape(origin)}">' for origin in cold))
+        self.hint_timer.start(HINT_PAGE_IDLE_MS)
+
+    def release_hint_page(self):
+        if self.hint_page is not None:
+            self.hint_page.deleteLater()
+            self.hint_page = None
+
+    def start_prerender(self):
+        url, self.pending_url = self.pending_url, None
+        if url is None or self.is_metered():
+            return
+        now = time.monotonic()
+        while self.prerender_times and now - self.prerender_times[0] > 60 * 60:
+            self.prerender_times.popleft()
+        if len(self.prerender_times) >= self.max_prerenders:
+            return
+        self.prerender_times.append(now)
+        self.drop_prerender()  # Only one guess is kept; the user has typed past the last one
+        page = QWebEnginePage(self.profile, self)
+        page.setAudioMuted(True)
+        self.prerender = Prerender(page, url)
+        page.loadFinished.connect(self.on_prerender_loaded)
+        page.load(QUrl(url))
+        self.expiry_timer.start(PRERENDER_TIMEOUT_MS)
+
+    def on_prerender_loaded(self, ok):
+        if self.prerender is not None and self.prerender.finished is None:
+            self.prerender.finished = time.monotonic()
+            self.prerender.ok = ok
+
+    def drop_prerender(self):
+        """Throw away the prerendered page, which counts as a miss."""
+        self.expiry_timer.stop()
+        if self.prerender is None:
+            return
+        self.prerender.page.loadFinished.disconnect(self.on_prerender_loaded)
+        self.prerender.page.deleteLater()
+        self.prerender = None
+        self.count("prerender_misses")
+
+    def take(self, url):
+        """Called when the user opens url from the search bar.
+
+        Returns (page, loaded) with the page prerendered for url, which the caller shows and owns from then on,
+        or (None, False) if there is none.
+        """
+        if self.typed_hosts:
+            self.count("preconnect_hits" if QUrl(url).host().lower() in self.typed_hosts else "preconnect_misses")
+            self.typed_hosts.clear()
+        self.prerender_timer.stop()
+        self.pending_url = None
+        prerender = self.prerender
+        if prerender is None or prerender.ok is False or not (
+                same_page(prerender.url, url) or same_page(prerender.page.url().toString(), url)):
+            self.drop_prerender()
+            return None, False
+        self.expiry_timer.stop()
+        self.prerender = None
+        page = prerender.page
+        page.loadFinished.disconnect(self.on_prerender_loaded)
+        page.setAudioMuted(False)
+        now = time.monotonic()
+        self.count("prerender_hits")
+        self.count("saved_ms", int((min(now, prerender.finished or now) - prerender.started) * 1000))
+        return page, prerender.finished is not None
@@ -0,0 +1,189 @@
+import os
+import sys
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView, QDialogButtonBox, QPushButton)
+from Tab_manager import process_rss
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FLAGS_VARIABLE = "QTWEBENGINE_CHROMIUM_FLAGS"
+
+# Stored value -> (text shown, Chromium switches)
+PROCESS_MODELS = {
+    "site-instance": ("One per site instance (default)", []),
+    "site": ("One per site", ["--process-per-site"]),
+    "single": ("Single process (least memory, no isolation)", ["--single-process"]),
+}
+GPU_MODES = {
+    "auto": ("Hardware acceleration (default)", []),
+    "software-raster": ("GPU compositing, software raster", ["--disable-gpu-rasterization"]),
+    "software": ("Software rendering only", ["--disable-gpu", "--disable-gpu-compositing"]),
+}
+DEFAULT_PROCESS_MODEL = "site-instance"
+DEFAULT_GPU_MODE = "auto"
+DEFAULT_RENDERER_LIMIT = 0  # 0 leaves the limit to Chromium, which scales it with system memory
+DEFAULT_V8_HEAP_MB = 0  # 0 leaves V8's old generation limit at its default
+
+PROCESS_MODEL_NAMES = {value: text for value, (text, flags) in PROCESS_MODELS.items()}
+GPU_MODE_NAMES = {value: text for value, (text, flags) in GPU_MODES.items()}
+
+
+def chromium_flags(settings):
+    """Chromium switches for the process settings stored in settings."""
+    model = settings.value("process/model", DEFAULT_PROCESS_MODEL)
+    gpu = settings.value("process/gpu", DEFAULT_GPU_MODE)
+    flags = list(PROCESS_MODELS.get(model, PROCESS_MODELS[DEFAULT_PROCESS_MODEL])[1])
+    flags += GPU_MODES.get(gpu, GPU_MODES[DEFAULT_GPU_MODE])[1]
+    renderer_limit = settings.value("process/renderer_limit", DEFAULT_RENDERER_LIMIT, type=int)
+    if renderer_limit and model != "single":
+        flags.append(f"--renderer-process-limit={renderer_limit}")
+    v8_heap_mb = settings.value("process/v8_heap_mb", DEFAULT_V8_HEAP_MB, type=int)
+    if v8_heap_mb:
+        flags.append(f"--js-flags=--max-old-space-size={v8_heap_mb}")
+    return flags
+
+
+def apply_flags(settings):
+    """Add the process settings to QTWEBENGINE_CHROMIUM_FLAGS; must run before QApplication is created.
+
+    Switches already in the environment win, so a launcher script can still override a setting.
+    """
+    existing = os.environ.get(FLAGS_VARIABLE, "").split()
+    names = {flag.split("=", 1)[0] for flag in existing}
+    added = [flag for flag in chromium_flags(settings) if flag.split("=", 1)[0] not in names]
+    if added:
+        os.environ[FLAGS_VARIABLE] = " ".join(existing + added)
+    return added
+
+
+def process_type(command_line):
+    """The --type= of a Chromium child process, or None for processes that are not part of the web engine."""
+    for argument in command_line:
+        if argument.startswith("--type="):
+            return argument[len("--type="):]
+    return None
+
+
+def child_processes():
+    """Yield (pid, command line) of every descendant of this process."""
+    if psutil is not None:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                yield child.pid, child.cmdline()
+            except psutil.Error:
+                pass  # Exited while we looked
+        return
+    if not sys.platform.startswith("linux"):
+        return
+    parents = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as file:
+                # The command name may contain spaces, so fields are counted from its closing parenthesis
+                parents[int(name)] = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            pass
+    descendants = {os.getpid()}
+    added = True
+    while added:
+        added = False
+        for pid, parent in parents.items():
+            if parent in descendants and pid not in descendants:
+                descendants.add(pid)
+                added = True
+    descendants.discard(os.getpid())
+    for pid in descendants:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as file:
+                yield pid, file.read().decode(errors="replace").split("\0")
+        except OSError:
+            pass
+
+
+def webengine_processes(tab_lifecycle=None):
+    """Map each web engine process type (renderer, gpu-process, utility, zygote) to (count, RSS bytes).
+
+    Without a way to list child processes, the renderers are found through the open tabs instead.
+    """
+    usage = {}
+    for pid, command_line in child_processes():
+        kind = process_type(command_line)
+        if kind is not None:
+            count, rss = usage.get(kind, (0, 0))
+            usage[kind] = (count + 1, rss + process_rss(pid))
+    if not usage and tab_lifecycle is not None:
+        renderers = tab_lifecycle.renderer_usage()
+        if renderers:
+            usage["renderer"] = (len(renderers), sum(rss for rss, webviews in renderers.values()))
+    return usage
+
+
+def format_mb(size):
+    return f"{size / (1024 * 1024):.0f} MB"
+
+
+class ProcessReadout(QDialog):
+    """Shows the active Chromium switches and how many web engine processes run, with their memory."""
+
+    def __init__(self, tab_lifecycle, parent=None):
+        super().__init__(parent)
+        self.tab_lifecycle = tab_lifecycle
+        self.setWindowTitle("Processes")
+        self.resize(480, 360)
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.flags_label = QLabel()
+        self.flags_label.setWordWrap(True)
+        self.flags_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        form.addRow("Chromium switches:", self.flags_label)
+        self.renderers_label = QLabel()
+        form.addRow("Renderers:", self.renderers_label)
+        self.total_label = QLabel()
+        form.addRow("Total memory:", self.total_label)
+        layout.addLayout(form)
+
+        self.table = QTableWidget(0, 3, self)
+        self.table.setHorizontalHeaderLabels(["Process", "Count", "Memory"])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close, self)
+        refresh_button = QPushButton("Refresh", self)
+        refresh_button.clicked.connect(self.refresh)
+        buttons.addButton(refresh_button, QDialogButtonBox.ActionRole)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.refresh()
+
+    def refresh(self):
+        self.flags_label.setText(os.environ.get(FLAGS_VARIABLE) or "None (Chromium defaults)")
+        rows = [("browser", 1, process_rss(os.getpid()))]
+        rows += sorted((kind, count, rss) for kind, (count, rss) in webengine_processes(self.tab_lifecycle).items())
+        self.table.setRowCount(len(rows))
+        for row, (kind, count, rss) in enumerate(rows):
+            for column, text in enumerate((kind, str(count), format_mb(rss))):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+        stats = self.tab_lifecycle.stats()
+        loaded_tabs = stats["live"] + stats["frozen"]
+        renderer_count = next((count for kind, count, rss in rows if kind == "renderer"), 0)
+        if renderer_count:
+            self.renderers_label.setText(f"{renderer_count} for {loaded_tabs} loaded tabs")
+        else:
+            self.renderers_label.setText(f"None listed; {loaded_tabs} loaded tabs (single process or no tabs)")
+        total = sum(rss for kind, count, rss in rows)
+        per_tab = f", {format_mb(total / loaded_tabs)} per loaded tab" if loaded_tabs else ""
+        self.total_label.setText(format_mb(total) + per_tab)
@@ -0,0 +1,167 @@
+import os
+from PyQt5.QtCore import Qt, QStandardPaths, QTimer
+from PyQt5.QtWidgets import QDialog, QFormLayout, QLabel, QDialogButtonBox, QPushButton, QVBoxLayout
+from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+
+PROFILE_NAME = "shield"  # A named profile is persistent; the implicit default profile's setup is up to Qt
+DEFAULT_CACHE_SIZE_MB = 512  # 0 lets Chromium pick a size from the free disk space
+DEFAULT_CACHE_TYPE = "disk"
+DEFAULT_COOKIES = "persistent"
+CLEAR_REFRESH_DELAY_MS = 1000  # clearHttpCache() returns before the files are gone
+
+CACHE_TYPES = {
+    "disk": QWebEngineProfile.DiskHttpCache,
+    "memory": QWebEngineProfile.MemoryHttpCache,
+    "none": QWebEngineProfile.NoCache,
+}
+CACHE_TYPE_NAMES = {"disk": "On disk", "memory": "In memory", "none": "Off"}
+COOKIE_POLICIES = {
+    "persistent": QWebEngineProfile.AllowPersistentCookies,
+    "session": QWebEngineProfile.NoPersistentCookies,
+    "force": QWebEngineProfile.ForcePersistentCookies,
+}
+COOKIE_POLICY_NAMES = {"persistent": "Keep until they expire", "session": "Until the browser closes",
+                       "force": "Keep all, including session cookies"}
+
+# Resource timing of the current page: transferSize is 0 for a cache hit and only the headers for a 304.
+# Cross-origin entries without Timing-Allow-Origin report no sizes, so they are left out.
+PAGE_CACHE_SCRIPT = """
+(function() {
+    var entries = performance.getEntriesByType("navigation").concat(performance.getEntriesByType("resource"));
+    var stats = [0, 0, 0, 0, 0];  // cached, revalidated, fetched, bytes transferred, bytes decoded
+    entries.forEach(function(entry) {
+        if (!entry.decodedBodySize) return;
+        if (entry.transferSize === 0) stats[0]++;
+        else if (entry.transferSize < entry.encodedBodySize) stats[1]++;
+        else stats[2]++;
+        stats[3] += entry.transferSize;
+        stats[4] += entry.decodedBodySize;
+    });
+    return stats;
+})()
+"""
+
+
+def storage_path(settings):
+    """Cookies, local storage and the rest of the profile's data; empty in settings means the default folder."""
+    path = settings.value("profile/storage_path", "")
+    if not path:
+        path = os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), PROFILE_NAME)
+    return path
+
+
+def cache_path(settings):
+    if settings.value("profile/storage_path", ""):
+        return os.path.join(storage_path(settings), "cache")
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), PROFILE_NAME)
+
+
+def create_profile(settings, parent=None):
+    """Create the browser's persistent profile. The storage paths are only read here, so they apply on restart."""
+    profile = QWebEngineProfile(PROFILE_NAME, parent)
+    profile.setPersistentStoragePath(storage_path(settings))
+    profile.setCachePath(cache_path(settings))
+    apply_settings(profile, settings)
+    return profile
+
+
+def apply_settings(profile, settings):
+    """Apply the cache and cookie settings, which Qt allows changing on a live profile."""
+    profile.setHttpCacheType(CACHE_TYPES.get(settings.value("profile/cache_type", DEFAULT_CACHE_TYPE),
+                                             CACHE_TYPES[DEFAULT_CACHE_TYPE]))
+    profile.setHttpCacheMaximumSize(settings.value("profile/cache_size_mb", DEFAULT_CACHE_SIZE_MB, type=int)
+                                    * 1024 * 1024)
+    profile.setPersistentCookiesPolicy(COOKIE_POLICIES.get(settings.value("profile/cookies", DEFAULT_COOKIES),
+                                                           COOKIE_POLICIES[DEFAULT_COOKIES]))
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Chromium removes cache entries while we walk
+    return total
+
+
+def format_size(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class CacheDiagnostics(QDialog):
+    """Shows where the profile keeps its cache, how big it is and how much of the current page came from it."""
+
+    def __init__(self, profile, page=None, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.page = page
+        self.setWindowTitle("Cache Diagnostics")
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.type_label = QLabel()
+        form.addRow("HTTP cache:", self.type_label)
+        self.limit_label = QLabel()
+        form.addRow("Maximum size:", self.limit_label)
+        self.size_label = QLabel()
+        form.addRow("Size on disk:", self.size_label)
+        self.cache_path_label = QLabel()
+        self.cache_path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        form.addRow("Cache folder:", self.cache_path_label)
+        self.storage_path_label = QLabel()
+        self.storage_path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        form.addRow("Profile folder:", self.storage_path_label)
+        self.page_label = QLabel()
+        self.page_label.setWordWrap(True)
+        form.addRow("Current page:", self.page_label)
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close, self)
+        refresh_button = QPushButton("Refresh", self)
+        refresh_button.clicked.connect(self.refresh)
+        buttons.addButton(refresh_button, QDialogButtonBox.ActionRole)
+        clear_button = QPushButton("Clear Cache", self)
+        clear_button.clicked.connect(self.clear_cache)
+        buttons.addButton(clear_button, QDialogButtonBox.ActionRole)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.refresh()
+
+    def refresh(self):
+        cache_type = {value: key for key, value in CACHE_TYPES.items()}.get(self.profile.httpCacheType(), "disk")
+        self.type_label.setText(CACHE_TYPE_NAMES[cache_type])
+        limit = self.profile.httpCacheMaximumSize()
+        self.limit_label.setText(format_size(limit) if limit else "Automatic")
+        self.size_label.setText(format_size(directory_size(self.profile.cachePath())))
+        self.cache_path_label.setText(self.profile.cachePath())
+        self.storage_path_label.setText(self.profile.persistentStoragePath())
+        if self.page is None:
+            self.page_label.setText("No page open")
+        else:
+            self.page_label.setText("Measuring...")
+            self.page.runJavaScript(PAGE_CACHE_SCRIPT, self.show_page_stats)
+
+    def show_page_stats(self, stats):
+        if not stats:
+            self.page_label.setText("Not available for this page")
+            return
+        cached, revalidated, fetched, transferred, decoded = (int(value) for value in stats)
+        total = cached + revalidated + fetched
+        if not total:
+            self.page_label.setText("No measurable resources")
+            return
+        self.page_label.setText(
+            f"{cached} of {total} resources from cache, {revalidated} revalidated, {fetched} downloaded; "
+            f"{format_size(transferred)} transferred for {format_size(decoded)} of content")
+
+    def clear_cache(self):
+        self.profile.clearHttpCache()
+        self.size_label.setText("Clearing...")
+        QTimer.singleShot(CLEAR_REFRESH_DELAY_MS, self.refresh)
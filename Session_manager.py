@@ -0,0 +1,80 @@
+import os
+import json
+import base64
+from PyQt5.QtCore import QByteArray, QDataStream, QIODevice, QSaveFile, QStandardPaths
+from PyQt5.QtWidgets import QWidget
+
+SESSION_FILE = "session.json"
+AUTOSAVE_INTERVAL_MS = 60 * 1000
+
+
+def session_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, SESSION_FILE)
+
+
+def serialize_history(history):
+    """Return the back/forward history of a page as base64 text."""
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.WriteOnly)
+    stream << history
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def restore_history(history, encoded):
+    """Load serialized history into a page, which also navigates it to the saved current entry."""
+    stream = QDataStream(QByteArray(base64.b64decode(encoded)), QIODevice.ReadOnly)
+    stream >> history
+    return stream.status() == QDataStream.Ok
+
+
+class LazyTab(QWidget):
+    """Placeholder for a restored tab; the browser swaps in a real QWebEngineView the first time it is shown."""
+
+    def __init__(self, entry, parent=None):
+        super().__init__(parent)
+        self.entry = entry
+
+    @property
+    def title(self):
+        return self.entry.get("title") or self.entry.get("url") or "New Tab"
+
+
+def tab_entry(widget):
+    """Describe a tab for the session file; placeholders that were never shown keep their saved entry."""
+    if isinstance(widget, LazyTab):
+        return widget.entry
+    if getattr(widget, "snapshot_entry", None):
+        return widget.snapshot_entry  # A reopened tab still showing its closed-tab snapshot
+    return {
+        "url": widget.url().toString(),
+        "title": widget.page().title(),
+        "zoom": widget.zoomFactor(),
+        "history": serialize_history(widget.history()),
+    }
+
+
+def save_session(tab_widget, path=None):
+    """Write the open tabs, in order, atomically so a crash mid-write keeps the previous session."""
+    session = {
+        "current": tab_widget.currentIndex(),
+        "tabs": [tab_entry(tab_widget.widget(index)) for index in range(tab_widget.count())],
+    }
+    file = QSaveFile(path or session_path())
+    if not file.open(QIODevice.WriteOnly):
+        return False
+    file.write(json.dumps(session).encode("utf-8"))
+    return file.commit()
+
+
+def load_session(path=None):
+    """Return the saved session, or None if there is none or it cannot be read."""
+    try:
+        with open(path or session_path(), encoding="utf-8") as file:
+            session = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not session.get("tabs"):
+        return None
+    return session
@@ -0,0 +1,125 @@
+import os
+import json
+import getpass
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+SERVER_NAME = "ShieldBrowser"
+NAME_VARIABLE = "SHIELD_BROWSER_INSTANCE"  # Overrides the server name, e.g. to test with a separate browser
+CONNECT_TIMEOUT_MS = 200  # A running instance answers in a few milliseconds; a stale socket fails at once
+REPLY_TIMEOUT_MS = 2000  # Waits for the running instance to confirm, in case its event loop is busy
+NEW_INSTANCE_OPTIONS = ("--new-instance", "--profile-startup")  # Launches that always start their own browser
+ACKNOWLEDGEMENT = b"ok\n"
+
+
+def server_name():
+    """One server per user, so two people on the same machine each get their own browser."""
+    if os.environ.get(NAME_VARIABLE):
+        return os.environ[NAME_VARIABLE]
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = str(os.getuid()) if hasattr(os, "getuid") else "user"
+    return f"{SERVER_NAME}-{user}"
+
+
+def urls_from_arguments(arguments):
+    """Turn command line arguments into absolute URLs.
+
+    An argument naming an existing file or folder is opened from the current folder; anything else is taken as
+    a web address, so "example.com" is the site even when no file of that name exists.
+    """
+    cwd = os.getcwd()
+    urls = []
+    for argument in arguments:
+        if argument.startswith("-"):
+            continue
+        if os.path.exists(os.path.join(cwd, argument)):
+            url = QUrl.fromLocalFile(os.path.abspath(os.path.join(cwd, argument)))
+        else:
+            url = QUrl.fromUserInput(argument, cwd)
+        if url.isValid():
+            urls.append(url.toString())
+    return urls
+
+
+def forward(arguments):
+    """Hand the URLs in arguments to an already running browser; returns True if it took them.
+
+    Only needs QtCore and QtNetwork, so a second launch can exit before the web engine is even imported.
+    """
+    if any(argument in NEW_INSTANCE_OPTIONS for argument in arguments):
+        return False
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        return False
+    socket.write(json.dumps({"urls": urls_from_arguments(arguments)}).encode("utf-8") + b"\n")
+    socket.flush()
+    reply = b""
+    while not reply.endswith(b"\n") and socket.waitForReadyRead(REPLY_TIMEOUT_MS):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return reply == ACKNOWLEDGEMENT
+
+
+def is_running():
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    running = socket.waitForConnected(CONNECT_TIMEOUT_MS)
+    socket.abort()
+    return running
+
+
+class InstanceServer(QObject):
+    """Listens for later launches of the browser and emits the URLs they were started with.
+
+    An empty list means the browser was launched without URLs, which opens a new tab.
+    """
+
+    urls_received = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+        self.buffers = {}  # Connected socket -> bytes received so far
+
+    def listen(self):
+        """Start listening; returns False if another instance already is."""
+        name = server_name()
+        if self.server.listen(name):
+            return True
+        if self.server.serverError() == QAbstractSocket.AddressInUseError and not is_running():
+            QLocalServer.removeServer(name)  # Left behind by a browser that crashed
+            return self.server.listen(name)
+        return False
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.on_disconnected(socket))
+
+    def on_ready_read(self, socket):
+        self.buffers[socket] += bytes(socket.readAll())
+        message, newline, _ = self.buffers[socket].partition(b"\n")
+        if not newline:
+            return
+        try:
+            urls = [url for url in json.loads(message.decode("utf-8")).get("urls", []) if isinstance(url, str)]
+        except (ValueError, AttributeError):
+            socket.abort()
+            return
+        socket.write(ACKNOWLEDGEMENT)
+        socket.flush()
+        self.urls_received.emit(urls)
+
+    def on_disconnected(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def close(self):
+        self.server.close()
@@ -0,0 +1,188 @@
+import os
+import time
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QObject, QSize, QStandardPaths, QTimer, QUrl, pyqtSignal
+
+SITE_CACHE_FILE = "site_cache.db"
+ICON_SIZE = 32  # Largest size a favicon is stored at; tabs and lists draw 16 px
+MEMORY_ICONS = 512  # Hosts whose decoded icon stays in memory
+MEMORY_TITLES = 4096
+MAX_ICONS = 5000  # Rows kept on disk, least recently seen dropped first
+MAX_TITLES = 50000
+FLUSH_DELAY_MS = 3000  # Changes are written together this long after the first one
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS icons (
+        host TEXT PRIMARY KEY,
+        png BLOB NOT NULL,
+        seen REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS titles (
+        url TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        seen REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS icons_seen ON icons (seen);
+    CREATE INDEX IF NOT EXISTS titles_seen ON titles (seen);
+"""
+
+
+def site_cache_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, SITE_CACHE_FILE)
+
+
+def host_of(url):
+    return QUrl(url).host().lower()
+
+
+def encode_icon(icon):
+    """PNG bytes of the icon at up to ICON_SIZE, or None for an empty icon."""
+    pixmap = icon.pixmap(QSize(ICON_SIZE, ICON_SIZE))
+    if pixmap.isNull():
+        return None
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    pixmap.save(buffer, "PNG")
+    return bytes(data)
+
+
+def decode_icon(png):
+    pixmap = QPixmap()
+    pixmap.loadFromData(png, "PNG")
+    return QIcon(pixmap)
+
+
+class LruCache(OrderedDict):
+    """Dict that forgets its least recently used keys beyond capacity; None values record misses."""
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.capacity = capacity
+
+    def lookup(self, key):
+        """Return (found, value), marking the key as recently used."""
+        if key not in self:
+            return False, None
+        self.move_to_end(key)
+        return True, self[key]
+
+    def store(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.capacity:
+            self.popitem(last=False)
+
+
+class SiteCache(QObject):
+    """Favicons by host and page titles by URL, kept on disk so tabs, bookmarks and suggestions show them at once.
+
+    Reads go through in-memory LRU caches; writes are batched into one transaction a few seconds after a change.
+    """
+
+    icon_changed = pyqtSignal(str)  # Host
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.db = sqlite3.connect(path or site_cache_path())
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        with self.db:
+            self.db.executescript(SCHEMA)
+        self.icons = LruCache(MEMORY_ICONS)  # Host -> QIcon, or None if the host has no stored icon
+        self.titles = LruCache(MEMORY_TITLES)
+        self.digests = {}  # Host -> SHA-1 of the PNG on disk, so an unchanged icon is not rewritten
+        self.dirty_icons = {}  # Host -> (PNG bytes or None to only mark it seen, time)
+        self.dirty_titles = {}  # URL -> (title, time)
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def icon(self, url):
+        """The cached favicon of url's host, or an empty QIcon."""
+        host = host_of(url)
+        if not host:
+            return QIcon()
+        found, icon = self.icons.lookup(host)
+        if not found:
+            row = self.db.execute("SELECT png FROM icons WHERE host = ?", (host,)).fetchone()
+            icon = decode_icon(row[0]) if row else None
+            self.icons.store(host, icon)
+        return icon if icon is not None else QIcon()
+
+    def title(self, url):
+        """The last title seen for url, or ''."""
+        found, title = self.titles.lookup(url)
+        if not found:
+            row = self.db.execute("SELECT title FROM titles WHERE url = ?", (url,)).fetchone()
+            title = row[0] if row else ""
+            self.titles.store(url, title)
+        return title
+
+    def set_icon(self, url, icon):
+        host = host_of(url)
+        png = encode_icon(icon) if host else None
+        if png is None:
+            return
+        if host not in self.digests:
+            row = self.db.execute("SELECT png FROM icons WHERE host = ?", (host,)).fetchone()
+            self.digests[host] = hashlib.sha1(row[0]).digest() if row else None
+        digest = hashlib.sha1(png).digest()
+        unchanged = self.digests[host] == digest
+        self.icons.store(host, icon)
+        self.digests[host] = digest
+        pending = self.dirty_icons.get(host, (None, 0))[0]  # A new icon not written yet stays queued
+        self.dirty_icons[host] = (pending if unchanged else png, time.time())
+        if not unchanged:
+            self.icon_changed.emit(host)
+        self.schedule_flush()
+
+    def set_title(self, url, title):
+        if not title or title == url or QUrl(url).scheme() not in ("http", "https"):
+            return  # Chromium reports the URL as the title until the page sets one
+        self.titles.store(url, title)
+        self.dirty_titles[url] = (title, time.time())
+        self.schedule_flush()
+
+    def track(self, webview):
+        """Keep the cache up to date from a web view's signals, as soon as they fire."""
+        webview.iconChanged.connect(lambda icon, webview=webview: self.set_icon(webview.url().toString(), icon))
+        webview.titleChanged.connect(lambda title, webview=webview: self.set_title(webview.url().toString(), title))
+
+    def schedule_flush(self):
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(FLUSH_DELAY_MS)
+
+    def flush(self):
+        self.flush_timer.stop()
+        if not (self.dirty_icons or self.dirty_titles):
+            return
+        with self.db:
+            for host, (png, seen) in self.dirty_icons.items():
+                if png is None:
+                    self.db.execute("UPDATE icons SET seen = ? WHERE host = ?", (seen, host))
+                else:
+                    self.db.execute("INSERT OR REPLACE INTO icons (host, png, seen) VALUES (?, ?, ?)",
+                                    (host, png, seen))
+            self.db.executemany("INSERT OR REPLACE INTO titles (url, title, seen) VALUES (?, ?, ?)",
+                                [(url, title, seen) for url, (title, seen) in self.dirty_titles.items()])
+        self.dirty_icons.clear()
+        self.dirty_titles.clear()
+
+    def prune(self):
+        """Drop the least recently seen rows beyond MAX_ICONS and MAX_TITLES."""
+        with self.db:
+            self.db.execute("DELETE FROM icons WHERE host IN (SELECT host FROM icons ORDER BY seen DESC"
+                            " LIMIT -1 OFFSET ?)", (MAX_ICONS,))
+            self.db.execute("DELETE FROM titles WHERE url IN (SELECT url FROM titles ORDER BY seen DESC"
+                            " LIMIT -1 OFFSET ?)", (MAX_TITLES,))
+
+    def close(self):
+        self.flush()
+        self.prune()
+        self.db.close()
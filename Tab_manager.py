@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+from PyQt5.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from PyQt5.QtWebEngineWidgets import QWebEnginePage
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# QWebEnginePage lifecycle states arrived in Qt 5.14; older versions fall back to unloading the page
+HAS_LIFECYCLE = hasattr(QWebEnginePage, 'LifecycleState')
+
+DEFAULT_FREEZE_AFTER_MINUTES = 5
+DEFAULT_MAX_LIVE_TABS = 20
+DEFAULT_MEMORY_BUDGET_MB = 0  # 0 disables the memory budget
+CHECK_INTERVAL_MS = 30 * 1000
+
+STATE_LIVE = "live"
+STATE_FROZEN = "frozen"
+STATE_DISCARDED = "discarded"
+
+
+def process_rss(pid):
+    """Return the resident memory of a process in bytes, or 0 if it is unknown or gone."""
+    if not pid:
+        return 0
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid}/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return 0
+    return 0
+
+
+class TabRecord:
+    """What the lifecycle manager remembers about one tab."""
+
+    def __init__(self):
+        self.last_active = time.monotonic()
+        self.state = STATE_LIVE
+        self.url = QUrl()
+        self.scroll = (0, 0)
+        self.restore_scroll = False
+
+
+class TabLifecycleManager(QObject):
+    """Freezes background tabs and discards the least recently used ones to cap renderer memory."""
+
+    stats_changed = pyqtSignal(str)
+
+    def __init__(self, tab_widget, settings, parent=None):
+        super().__init__(parent)
+        self.tab_widget = tab_widget
+        self.settings = settings
+        self.records = {}
+        self.current = None
+        self.frozen_count = 0
+        self.discarded_count = 0
+        self.restored_count = 0
+        self.reclaimed_bytes = 0
+        self.pending_reclaim = {}  # Renderer pid -> RSS before a discard, measured again on the next check
+        self.load_settings()
+
+        tab_widget.currentChanged.connect(self.on_current_changed)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(CHECK_INTERVAL_MS)
+
+    def load_settings(self):
+        self.freeze_after = self.settings.value("tabs/freeze_after_minutes", DEFAULT_FREEZE_AFTER_MINUTES, type=int) * 60
+        self.max_live_tabs = self.settings.value("tabs/max_live_tabs", DEFAULT_MAX_LIVE_TABS, type=int)
+        self.memory_budget = self.settings.value("tabs/memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB, type=int) * 1024 * 1024
+
+    def track(self, webview):
+        self.records[webview] = TabRecord()
+        webview.loadFinished.connect(lambda ok, webview=webview: self.on_load_finished(webview))
+        self.enforce_limits()
+        self.emit_stats()
+
+    def untrack(self, webview):
+        self.records.pop(webview, None)
+        if webview is self.current:
+            self.current = None
+        self.emit_stats()
+
+    def is_discarded(self, webview):
+        record = self.records.get(webview)
+        return record is not None and record.state == STATE_DISCARDED
+
+    def on_current_changed(self, index):
+        previous = self.current
+        if previous in self.records:
+            self.records[previous].last_active = time.monotonic()
+            self.remember_scroll(previous)
+        self.current = self.tab_widget.widget(index)
+        if self.current in self.records:
+            self.activate(self.current)
+
+    def activate(self, webview):
+        """Bring a frozen or discarded tab back; discarded tabs reload and then restore their scroll position."""
+        record = self.records[webview]
+        record.last_active = time.monotonic()
+        if record.state == STATE_LIVE:
+            return
+        if record.state == STATE_DISCARDED:
+            self.restored_count += 1
+            record.restore_scroll = True
+        record.state = STATE_LIVE
+        if HAS_LIFECYCLE:
+            webview.page().setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        else:
+            webview.load(record.url)
+        self.enforce_limits()
+        self.emit_stats()
+
+    def on_load_finished(self, webview):
+        record = self.records.get(webview)
+        if record is not None and record.restore_scroll and record.state == STATE_LIVE:
+            record.restore_scroll = False
+            webview.page().runJavaScript(f"window.scrollTo({record.scroll[0]}, {record.scroll[1]});")
+
+    def remember_scroll(self, webview):
+        record = self.records[webview]
+        if record.state == STATE_LIVE:
+            webview.page().runJavaScript("[window.scrollX, window.scrollY]",
+                                         lambda position, record=record: self.store_scroll(record, position))
+
+    def store_scroll(self, record, position):
+        if isinstance(position, list) and len(position) == 2:
+            record.scroll = (int(position[0]), int(position[1]))
+
+    def check(self):
+        """Freeze tabs that sat in the background too long, then apply the live tab and memory limits."""
+        self.measure_reclaimed()
+        if HAS_LIFECYCLE and self.freeze_after:
+            now = time.monotonic()
+            for webview, record in self.records.items():
+                if (record.state == STATE_LIVE and webview is not self.current and not self.is_busy(webview)
+                        and now - record.last_active >= self.freeze_after):
+                    self.freeze(webview)
+        self.enforce_limits()
+        self.emit_stats()
+
+    def is_busy(self, webview):
+        """Tabs playing audio are left alone, like Chromium does."""
+        return webview.page().recentlyAudible()
+
+    def freeze(self, webview):
+        webview.page().setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+        self.records[webview].state = STATE_FROZEN
+        self.frozen_count += 1
+
+    def discard(self, webview):
+        record = self.records[webview]
+        record.url = webview.url()
+        pid = self.renderer_pid(webview)
+        if pid and pid not in self.pending_reclaim:
+            self.pending_reclaim[pid] = process_rss(pid)
+        record.state = STATE_DISCARDED
+        if HAS_LIFECYCLE:
+            webview.page().setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        else:
+            webview.load(QUrl("about:blank"))  # Tab text and icon stay as they are until the tab is activated
+        self.discarded_count += 1
+
+    def enforce_limits(self):
+        """Discard least recently used background tabs until the live tab count and memory budget fit."""
+        loaded = [webview for webview, record in self.records.items() if record.state != STATE_DISCARDED]
+        candidates = sorted((webview for webview in loaded if webview is not self.current and not self.is_busy(webview)),
+                            key=lambda webview: self.records[webview].last_active)
+
+        excess = len(loaded) - self.max_live_tabs if self.max_live_tabs else 0
+        for webview in candidates[:max(0, excess)]:
+            self.discard(webview)
+
+        if self.memory_budget:
+            usage = self.renderer_usage()
+            total = sum(rss for rss, webviews in usage.values())
+            for webview in candidates[max(0, excess):]:
+                if total <= self.memory_budget:
+                    break
+                pid = self.renderer_pid(webview)
+                if pid in usage:
+                    # Tabs that share a renderer process are charged an equal share of it
+                    rss, webviews = usage[pid]
+                    total -= rss // len(webviews)
+                self.discard(webview)
+
+    def renderer_pid(self, webview):
+        # renderProcessPid() needs Qt 5.15
+        page = webview.page()
+        return page.renderProcessPid() if hasattr(page, 'renderProcessPid') else 0
+
+    def renderer_usage(self):
+        """Map each renderer pid of a loaded tab to (RSS, tabs using it)."""
+        usage = {}
+        for webview, record in self.records.items():
+            if record.state == STATE_DISCARDED:
+                continue
+            pid = self.renderer_pid(webview)
+            if pid:
+                usage.setdefault(pid, [0, []])[1].append(webview)
+        for pid, entry in usage.items():
+            entry[0] = process_rss(pid)
+        return {pid: tuple(entry) for pid, entry in usage.items()}
+
+    def measure_reclaimed(self):
+        for pid, rss_before in self.pending_reclaim.items():
+            self.reclaimed_bytes += max(0, rss_before - process_rss(pid))
+        self.pending_reclaim.clear()
+
+    def stats(self):
+        states = [record.state for record in self.records.values()]
+        return {
+            "live": states.count(STATE_LIVE),
+            "frozen": states.count(STATE_FROZEN),
+            "discarded": states.count(STATE_DISCARDED),
+            "frozen_total": self.frozen_count,
+            "discarded_total": self.discarded_count,
+            "restored_total": self.restored_count,
+            "reclaimed_bytes": self.reclaimed_bytes,
+        }
+
+    def emit_stats(self):
+        stats = self.stats()
+        self.stats_changed.emit(
+            f"Tabs: {stats['live']} live, {stats['frozen']} frozen, {stats['discarded']} discarded"
+            f" | Reclaimed {stats['reclaimed_bytes'] / (1024 * 1024):.0f} MB")
@@ -0,0 +1,138 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWebEngineWidgets import QWebEngineScript
+
+STYLE = "Fusion"  # Draws everything from the palette, so a theme looks the same on every platform
+
+# Sizes only. Colors come from the palette: a style sheet color is fixed when a widget is polished, so changing
+# colors through the style sheet means re-polishing every widget in the window.
+APPLICATION_STYLE_SHEET = """
+    QPushButton {
+        padding: 5px 10px;
+        margin: 3px;
+    }
+    QTabBar::tab {
+        min-height: 28px;
+        min-width: 80px;
+    }
+"""
+
+THEMES = {
+    "light": {
+        QPalette.Window: "#ffffff", QPalette.WindowText: "#000000",
+        QPalette.Base: "#ffffff", QPalette.AlternateBase: "#f5f5f5", QPalette.Text: "#000000",
+        QPalette.Button: "#f0f0f0", QPalette.ButtonText: "#000000", QPalette.BrightText: "#ff0000",
+        QPalette.Light: "#ffffff", QPalette.Midlight: "#e3e3e3", QPalette.Mid: "#cccccc", QPalette.Dark: "#a0a0a0",
+        QPalette.Shadow: "#696969", QPalette.Highlight: "#308cc6", QPalette.HighlightedText: "#ffffff",
+        QPalette.Link: "#0000ff", QPalette.ToolTipBase: "#ffffdc", QPalette.ToolTipText: "#000000",
+    },
+    "dark": {
+        QPalette.Window: "#2e2e2e", QPalette.WindowText: "#ffffff",
+        QPalette.Base: "#3a3a3a", QPalette.AlternateBase: "#444444", QPalette.Text: "#ffffff",
+        QPalette.Button: "#555555", QPalette.ButtonText: "#ffffff", QPalette.BrightText: "#ff5555",
+        QPalette.Light: "#777777", QPalette.Midlight: "#666666", QPalette.Mid: "#444444", QPalette.Dark: "#333333",
+        QPalette.Shadow: "#111111", QPalette.Highlight: "#2a82da", QPalette.HighlightedText: "#ffffff",
+        QPalette.Link: "#6cb4ff", QPalette.ToolTipBase: "#2e2e2e", QPalette.ToolTipText: "#ffffff",
+    },
+}
+DISABLED_TEXT = {"light": "#a0a0a0", "dark": "#808080"}
+
+DARK_MODE_SCRIPT_NAME = "shield-dark-mode"
+DARK_MODE_STYLE_ID = "shield-dark-mode"
+# Inverts the page and inverts media back, which works on any site without knowing its colors
+DARK_MODE_CSS = (
+    "html { filter: invert(1) hue-rotate(180deg) !important; background-color: #ffffff !important; }"
+    " img, video, picture, canvas, iframe, embed, object, svg image, [style*='background-image']"
+    " { filter: invert(1) hue-rotate(180deg) !important; }"
+)
+# Adds the style sheet as soon as the document has a root element; safe to run more than once
+DARK_MODE_SOURCE = """
+(function() {
+    if (document.getElementById("%(id)s")) return;
+    var style = document.createElement("style");
+    style.id = "%(id)s";
+    style.textContent = "%(css)s";
+    function attach() { (document.head || document.documentElement).appendChild(style); }
+    if (document.documentElement) {
+        attach();
+    } else {
+        new MutationObserver(function(mutations, observer) {
+            if (document.documentElement) {
+                observer.disconnect();
+                attach();
+            }
+        }).observe(document, {childList: true});
+    }
+})();
+""" % {"id": DARK_MODE_STYLE_ID, "css": DARK_MODE_CSS}
+LIGHT_MODE_SOURCE = """
+(function() {
+    var style = document.getElementById("%s");
+    if (style) style.remove();
+})();
+""" % DARK_MODE_STYLE_ID
+
+
+def prepare_application():
+    """Must run before QApplication is created."""
+    # Without this, a style sheet pins every widget's palette and later palette changes never reach them
+    QApplication.setAttribute(Qt.AA_UseStyleSheetPropagationInWidgetStyles)
+
+
+def build_palette(name):
+    palette = QPalette()
+    for role, color in THEMES[name].items():
+        palette.setColor(role, QColor(color))
+    for role in (QPalette.WindowText, QPalette.Text, QPalette.ButtonText):
+        palette.setColor(QPalette.Disabled, role, QColor(DISABLED_TEXT[name]))
+    return palette
+
+
+def dark_mode_script():
+    script = QWebEngineScript()
+    script.setName(DARK_MODE_SCRIPT_NAME)
+    script.setSourceCode(DARK_MODE_SOURCE)
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.ApplicationWorld)  # Kept apart from the page's own scripts
+    script.setRunsOnSubFrames(True)
+    return script
+
+
+class ThemeManager:
+    """Switches between precompiled palettes and turns page dark mode on and off.
+
+    The style sheet is set once; a switch only swaps the application palette, which repaints widgets without
+    re-polishing them. Pages get dark mode from a script the profile injects when each document is created, and
+    pages that are already open are switched with a one-off script.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.palettes = {name: build_palette(name) for name in THEMES}
+        self.dark_script = dark_mode_script()
+        self.profile = None
+        self.current = None
+        app.setStyle(STYLE)
+        app.setStyleSheet(APPLICATION_STYLE_SHEET)
+
+    def set_profile(self, profile):
+        self.profile = profile
+        if self.current == "dark":
+            profile.scripts().insert(self.dark_script)
+
+    def apply(self, name, pages=()):
+        """Switch to a theme; pages are the open QWebEnginePages to update without reloading."""
+        if name == self.current:
+            return
+        self.app.setPalette(self.palettes[name])
+        dark = name == "dark"
+        if self.profile is not None:
+            scripts = self.profile.scripts()
+            if dark:
+                scripts.insert(self.dark_script)
+            else:
+                scripts.remove(self.dark_script)
+        for page in pages:
+            page.runJavaScript(DARK_MODE_SOURCE if dark else LIGHT_MODE_SOURCE, QWebEngineScript.ApplicationWorld)
+        self.current = name
@@ -0,0 +1,87 @@
+"""Compare the asyncio batch engine against the thread-per-download queue on many small files.
+
+Run from the repository root:
+
+    python benchmarks/batch_download.py --files 1000 --size-kb 64 --latency-ms 20
+
+The local server waits latency-ms before every response, so the run is bound by round trips like a real list of
+remote files rather than by loopback bandwidth.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+
+import Download_engine
+from Download_manager import DownloadQueue, STATUS_COMPLETED, STATUS_FAILED
+from local_server import LocalServer
+
+
+def run_engine(urls, directory, jobs):
+    """Download every URL with the engine; returns (seconds, failures)."""
+    engine = Download_engine.DownloadEngine(jobs=jobs, progress_interval=0)
+    items = [(url, os.path.join(directory, f"{index}.bin")) for index, url in enumerate(urls)]
+    started = time.perf_counter()
+    results = asyncio.run(engine.run(items))
+    return time.perf_counter() - started, sum(1 for result in results if not result["ok"])
+
+
+def run_queue(urls, directory, jobs):
+    """Download every URL through DownloadQueue, one DownloadThread per transfer; returns (seconds, failures)."""
+    queue = DownloadQueue(max_active=jobs)
+    loop = QEventLoop()
+    remaining = [len(urls)]
+
+    def changed(row):
+        if queue.items[row].status in (STATUS_COMPLETED, STATUS_FAILED):
+            remaining[0] -= 1
+            if not remaining[0]:
+                loop.quit()
+
+    queue.item_changed.connect(changed)
+    started = time.perf_counter()
+    for index, url in enumerate(urls):
+        queue.add(url, os.path.join(directory, f"{index}.bin"), segments=1)
+    loop.exec()
+    elapsed = time.perf_counter() - started
+    for item in queue.items:
+        item.thread.wait()
+    return elapsed, sum(1 for item in queue.items if item.status == STATUS_FAILED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--jobs", default="1,16,64,256", help="comma separated concurrency levels")
+    parser.add_argument("--skip-queue", action="store_true", help="only measure the engine")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    with LocalServer(latency=args.latency_ms / 1000) as server:
+        # A different size per file, so each one is a distinct URL and payload
+        urls = [server.url(args.size_kb * 1024 + index) for index in range(args.files)]
+        for url in urls:
+            server.resource(url[url.rindex("/"):])
+        total_mb = sum(args.size_kb * 1024 + index for index in range(args.files)) / (1024 * 1024)
+        print(f"{'variant':<10} {'jobs':>5} {'seconds':>8} {'files/s':>8} {'MB/s':>7} {'failed':>7}")
+        for jobs in (int(value) for value in args.jobs.split(",")):
+            variants = [("engine", run_engine)] + ([] if args.skip_queue else [("queue", run_queue)])
+            for name, run in variants:
+                with tempfile.TemporaryDirectory() as directory:
+                    elapsed, failed = run(urls, directory, jobs)
+                print(f"{name:<10} {jobs:>5} {elapsed:>8.2f} {args.files / elapsed:>8.0f} {total_mb / elapsed:>7.1f}"
+                      f" {failed:>7}")
+    del app
+
+
+if __name__ == "__main__":
+    main()
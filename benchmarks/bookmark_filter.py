@@ -0,0 +1,94 @@
+"""Measure as-you-type bookmark filtering: index build time and per-keystroke search latency.
+
+Run from the repository root:
+
+    python benchmarks/bookmark_filter.py --bookmarks 100000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Bookmark_manager import PAGE_SIZE, Bookmark, BookmarkIndex
+
+LETTERS = "etaoinshrdlcumwfgypbvkjxqz"
+QUERIES = ["github python", "dashboard", "wiki", "doc qt", "zzz", "mail", "c"]
+
+
+def zipf_sampler(rng, items):
+    """Pick items with Zipf's law (weight 1 / rank), the way words are spread over natural text."""
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, len(items) + 1)))
+    return lambda count: rng.choices(items, cum_weights=cumulative, k=count)
+
+
+def generate_vocabulary(rng, size):
+    words = ["github", "python", "dashboard", "wiki", "docs", "qt", "mail", "news", "blog", "home"]
+    while len(words) < size:
+        # Skew towards common letters so prefixes overlap the way natural words do
+        words.append("".join(LETTERS[min(len(LETTERS) - 1, int(rng.expovariate(0.25)))]
+                             for _ in range(rng.randint(3, 10))))
+    return words
+
+
+def generate_bookmarks(count, seed=1):
+    rng = random.Random(seed)
+    words = generate_vocabulary(rng, 30000)
+    domains = [f"{word}.{rng.choice(['com', 'org', 'io', 'net'])}" for word in rng.sample(words, 5000)]
+    pick_words = zipf_sampler(rng, words)
+    hosts = zipf_sampler(rng, domains)
+    bookmarks = []
+    for bookmark_id in range(1, count + 1):
+        title = " ".join(word.capitalize() for word in pick_words(rng.randint(2, 8)))
+        path = "/".join(pick_words(rng.randint(1, 4)))
+        url = f"https://www.{hosts(1)[0]}/{path}?id={bookmark_id}"
+        bookmarks.append(Bookmark(bookmark_id, title, url, ""))
+    return bookmarks
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookmarks", type=int, default=100000)
+    args = parser.parse_args()
+
+    bookmarks = generate_bookmarks(args.bookmarks)
+    started = time.perf_counter()
+    index = BookmarkIndex(bookmarks)
+    print(f"build: {(time.perf_counter() - started) * 1000:.0f} ms for {args.bookmarks} bookmarks")
+
+    print(f"{'query':<16} {'matches':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    all_timings = []
+    for query in QUERIES:
+        timings = []
+        for length in range(1, len(query) + 1):  # One search per keystroke
+            started = time.perf_counter()
+            # The filtered list shows the first page straight away and ranks the rest as it scrolls
+            list(itertools.islice(index.search(query[:length]), PAGE_SIZE))
+            timings.append((time.perf_counter() - started) * 1000)
+        matches = sum(1 for _ in index.search(query))
+        all_timings.extend(timings)
+        print(f"{query:<16} {matches:>8} {statistics.median(timings):>8.2f} "
+              f"{percentile(timings, 0.95):>8.2f} {max(timings):>8.2f}")
+    print(f"{'all keystrokes':<16} {'':>8} {statistics.median(all_timings):>8.2f} "
+          f"{percentile(all_timings, 0.95):>8.2f} {max(all_timings):>8.2f}")
+
+    extra = generate_bookmarks(1000, seed=2)
+    started = time.perf_counter()
+    for bookmark in extra:
+        index.add(bookmark._replace(id=bookmark.id + args.bookmarks))
+    for bookmark in extra:
+        index.remove(bookmark._replace(id=bookmark.id + args.bookmarks))
+    print(f"incremental add + remove: {(time.perf_counter() - started) * 1000 / len(extra):.3f} ms per bookmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Measure the content blocker: filter list compile and cache load times, and per-request matching cost.
+
+Run from the repository root:
+
+    python benchmarks/content_blocker.py --rules 100000 --requests 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Content_blocker import TYPE_OPTIONS, compile_rules, load_rules
+
+WORDS = ["ad", "ads", "banner", "track", "pixel", "analytics", "beacon", "promo", "sponsor", "stats", "metrics",
+         "tag", "count", "click", "affiliate", "popup", "widget", "media", "static", "cdn", "img", "api", "v2"]
+TLDS = ["com", "net", "org", "io", "co.uk", "de"]
+
+
+def random_domain(rng):
+    labels = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 12)))
+              for _ in range(rng.randint(1, 2))]
+    return ".".join(labels) + "." + rng.choice(TLDS)
+
+
+def generate_list(count, rng):
+    """An EasyList-like mix: mostly domain rules, then path patterns, options and exceptions."""
+    lines = ["[Adblock Plus 2.0]", "! Synthetic list for benchmarking"]
+    domains = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.65:
+            domain = random_domain(rng)
+            domains.append(domain)
+            lines.append(f"||{domain}^")
+        elif kind < 0.75:
+            lines.append(f"||{random_domain(rng)}^$third-party,{rng.choice(['script', 'image', 'xmlhttprequest'])}")
+        elif kind < 0.92:
+            word, other = rng.sample(WORDS, 2)
+            lines.append(rng.choice([f"/{word}/{other}_{rng.randint(1, 99999)}.", f"-{word}-{other}{rng.randint(1, 9999)}-",
+                                     f"&{word}{rng.randint(1, 99999)}=", f"/{word}{rng.randint(1, 99999)}/*.js"]))
+        elif kind < 0.97:
+            lines.append(f"||{random_domain(rng)}/{rng.choice(WORDS)}/*$domain={random_domain(rng)}|~{random_domain(rng)}")
+        else:
+            lines.append(f"@@||{rng.choice(domains) if domains else random_domain(rng)}^${rng.choice(['script', 'image'])}")
+        if kind < 0.01:
+            lines.append(f"{random_domain(rng)}##.ad-banner")
+    return lines, domains
+
+
+def generate_requests(count, domains, rng):
+    """Mostly ordinary page resources, with a share of requests to listed ad domains."""
+    page_hosts = [random_domain(rng) for _ in range(200)]
+    requests = []
+    for _ in range(count):
+        page = rng.choice(page_hosts)
+        if rng.random() < 0.1 and domains:
+            host = "www." + rng.choice(domains)
+        else:
+            host = rng.choice([page, "cdn." + page, "static." + rng.choice(page_hosts)])
+        path = "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        url = f"https://{host}/{path}/{rng.randint(1, 10 ** 6)}.{rng.choice(['js', 'png', 'css', 'json'])}?v={rng.randint(1, 99)}"
+        requests.append((url, host, page, rng.choice(list(TYPE_OPTIONS.values()))))
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    lines, domains = generate_list(args.rules, rng)
+    directory = tempfile.mkdtemp()
+    list_path = os.path.join(directory, "list.txt")
+    cache = os.path.join(directory, "filters.bin")
+    with open(list_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines))
+
+    started = time.perf_counter()
+    rules = compile_rules([list_path])
+    print(f"compile: {(time.perf_counter() - started) * 1000:.0f} ms for {rules.rule_count} rules "
+          f"({rules.skipped_count} unsupported)")
+    started = time.perf_counter()
+    load_rules([list_path], cache)
+    print(f"compile + write cache: {(time.perf_counter() - started) * 1000:.0f} ms, "
+          f"{os.path.getsize(cache) / 1024:.0f} KB")
+    started = time.perf_counter()
+    rules = load_rules([list_path], cache)
+    print(f"load from cache: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    requests = generate_requests(args.requests, domains, rng)
+    timings = []
+    blocked = 0
+    should_block = rules.should_block
+    started = time.perf_counter()
+    for url, host, page, resource_type in requests:
+        request_started = time.perf_counter()
+        blocked += should_block(url, host, page, resource_type)
+        timings.append((time.perf_counter() - request_started) * 1e6)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    print(f"matched {len(requests)} requests, {blocked} blocked: {len(requests) / elapsed:,.0f} requests/s")
+    print(f"per request: mean {statistics.mean(timings):.1f} us, p50 {timings[len(timings) // 2]:.1f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.1f} us, max {timings[-1]:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Measure how quickly the download history opens, sorts, filters and scrolls with many entries.
+
+Run from the repository root:
+
+    python benchmarks/download_history.py --rows 1000000
+
+Filling the database takes a while; pass --keep to reuse it on the next run.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QModelIndex, Qt
+from PyQt5.QtWidgets import QApplication
+
+from bookmark_filter import generate_vocabulary, zipf_sampler
+from Download_history import COLUMNS, DownloadHistoryDialog, DownloadHistoryStore
+
+STATUSES = ["Completed"] * 8 + ["Failed", "Cancelled"]
+EXTENSIONS = ["zip", "pdf", "iso", "mp4", "tar.gz", "exe", "csv", "png"]
+
+
+def fill(store, rows, seed=1):
+    rng = random.Random(seed)
+    words = generate_vocabulary(rng, 20000)
+    pick_words = zipf_sampler(rng, words)
+    now = time.time()
+    db = store.connection()
+    batch = []
+    for number in range(rows):
+        name = "_".join(pick_words(rng.randint(1, 3))) + "." + rng.choice(EXTENSIONS)
+        size = int(rng.paretovariate(1.1) * 100000)
+        duration = max(0.1, size / rng.uniform(1e5, 5e7))
+        batch.append((f"/home/user/Downloads/{name}", f"https://{pick_words(1)[0]}.com/files/{number}/{name}", size,
+                      rng.choice(STATUSES), now - rng.uniform(0, 5 * 365 * 24 * 60 * 60), duration,
+                      size / duration, "%064x" % rng.getrandbits(256)))
+        if len(batch) == 10000:
+            with db:
+                db.executemany("INSERT INTO downloads (file, url, size, status, finished, duration, throughput, hash)"
+                               " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    with db:
+        db.executemany("INSERT INTO downloads (file, url, size, status, finished, duration, throughput, hash)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+
+def timed(action):
+    started = time.perf_counter()
+    action()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--keep", action="store_true", help="keep the database in the temp folder for later runs")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    path = os.path.join(tempfile.gettempdir(), f"download-history-benchmark-{args.rows}.db")
+    if not args.keep and os.path.exists(path):
+        os.remove(path)
+    store = DownloadHistoryStore(path)
+    try:
+        if not len(store):
+            started = time.perf_counter()
+            fill(store, args.rows)
+            print(f"fill: {time.perf_counter() - started:.0f} s for {args.rows} rows, "
+                  f"{os.path.getsize(path) / (1024 * 1024):.0f} MB")
+
+        dialog = None
+
+        def open_dialog():
+            nonlocal dialog
+            dialog = DownloadHistoryDialog(store)
+            dialog.show()
+            app.processEvents()
+        print(f"open history window: {timed(open_dialog):.1f} ms")
+        model = dialog.model
+
+        for column, (header, _, sortable) in enumerate(COLUMNS):
+            if sortable:
+                for order in (Qt.AscendingOrder, Qt.DescendingOrder):
+                    print(f"sort by {header} {'asc' if order == Qt.AscendingOrder else 'desc'}:"
+                          f" {timed(lambda: model.sort(column, order)):.1f} ms")
+        model.sort(6, Qt.DescendingOrder)
+
+        pages = [timed(lambda: model.fetchMore(QModelIndex())) for _ in range(50)]
+        print(f"scroll, per page of rows: median {statistics.median(pages):.2f} ms, max {max(pages):.2f} ms")
+
+        # The vocabulary is Zipf distributed: a very common word, a middling one with an extension, a rare one,
+        # a word that does not occur and a single letter that falls back to a substring scan
+        words = generate_vocabulary(random.Random(1), 20000)
+        for query in (words[0], f"{words[300]} pdf", words[15000], "zzzzzz", "a"):
+            timings = [timed(lambda: model.set_filter(query[:length])) for length in range(1, len(query) + 1)]
+            print(f"filter {query!r:<12} per keystroke: median {statistics.median(timings):6.1f} ms,"
+                  f" max {max(timings):6.1f} ms, {model.rowCount()} rows on the first page")
+        model.set_filter("")
+
+        started = time.perf_counter()
+        for number in range(1000):
+            store.add(f"/tmp/benchmark-{number}.bin", f"https://example.com/{number}", 1000, "Completed", 0.5)
+        print(f"add: {(time.perf_counter() - started) * 1000 / 1000:.4f} ms per call on the caller's thread")
+    finally:
+        store.close()
+        if not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
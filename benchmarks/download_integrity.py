@@ -0,0 +1,119 @@
+"""Measure inline download hashing, 304 revalidation through the content cache, and cache deduplication.
+
+Run from the repository root:
+
+    python benchmarks/download_integrity.py --size-mb 256
+
+Hashing in the write loop is compared with downloading first and hashing the file in a second pass. The second
+pass reads from the page cache here, which is its best case; on a cold cache it costs a full disk read.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+
+import Download_manager
+from Download_manager import DownloadThread
+from Download_cache import ContentCache
+from local_server import LocalServer
+
+
+class NullHasher(Download_manager.StreamHasher):
+    """Skips hashing, to time the download loop on its own."""
+
+    def update(self, position, data):
+        pass
+
+    def catch_up(self, path, end):
+        pass
+
+
+def run_download(url, save_path, segments, cache=None):
+    thread = DownloadThread(url, save_path, segments=segments, cache=cache)
+    result = {}
+    loop = QEventLoop()
+    thread.finished.connect(lambda message: (result.update(message=message), loop.quit()))
+    thread.error.connect(lambda message: (result.update(message=message), loop.quit()))
+    started = time.perf_counter()
+    thread.start()
+    loop.exec()
+    thread.wait()
+    return time.perf_counter() - started, result["message"], thread.hashes
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    buffer = memoryview(bytearray(Download_manager.MAX_CHUNK_SIZE))
+    with open(path, "rb") as file:
+        while True:
+            count = file.readinto(buffer)
+            if not count:
+                break
+            digest.update(buffer[:count])
+    return digest.hexdigest()
+
+
+def best_of(repeat, function):
+    return min((function() for _ in range(repeat)), key=lambda result: result[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    size = args.size_mb * 1024 * 1024
+    with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+        url = server.url(size)
+        expected = hashlib.sha256(server.payload(size)).hexdigest()
+        save_path = os.path.join(directory, "download.bin")
+
+        print(f"{'variant':<38} {'seconds':>8} {'MB/s':>8}")
+        for segments in (1, Download_manager.DEFAULT_SEGMENTS):
+            hasher = Download_manager.StreamHasher
+            Download_manager.StreamHasher = NullHasher
+            try:
+                plain = best_of(args.repeat, lambda: run_download(url, save_path, segments))[0]
+            finally:
+                Download_manager.StreamHasher = hasher
+            started = time.perf_counter()
+            assert hash_file(save_path) == expected
+            two_pass = plain + time.perf_counter() - started
+            inline, message, hashes = best_of(args.repeat, lambda: run_download(url, save_path, segments))
+            assert hashes["sha256"] == expected, message
+            for name, elapsed in (("no hash", plain), ("download, then hash", two_pass),
+                                  ("hash while writing", inline)):
+                print(f"{f'{segments} connection(s), {name}':<38} {elapsed:>8.2f} {args.size_mb / elapsed:>8.1f}")
+
+        cache = ContentCache(os.path.join(directory, "cache"))
+        first, _, _ = run_download(url, save_path, Download_manager.DEFAULT_SEGMENTS, cache)
+        again, message, hashes = run_download(url, save_path, Download_manager.DEFAULT_SEGMENTS, cache)
+        assert message.startswith("Not modified") and hashes["sha256"] == expected, message
+        print(f"{'first download into the cache':<38} {first:>8.2f}")
+        print(f"{'unchanged re-download (304)':<38} {again:>8.3f}")
+
+        # The same content from a second URL is stored once
+        copy_path = os.path.join(directory, "copy.bin")
+        with open(save_path, "rb") as source, open(copy_path, "wb") as copy:
+            copy.write(source.read())
+        cache.store("http://mirror.invalid/download.bin", copy_path, expected)
+        objects = sum(os.path.getsize(os.path.join(root, name))
+                      for root, _, names in os.walk(os.path.join(cache.directory, "objects")) for name in names)
+        # Reflinks share blocks where the filesystem has them, but every file stays independent of the cache
+        assert os.stat(copy_path).st_nlink == 1 and os.stat(save_path).st_nlink == 1
+        print(f"cache objects hold {objects / size:.0f}x the file for 2 URLs")
+        cache.close()
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the download write path against the original 1 KB chunk / per-chunk signal loop.
+
+Run from the repository root:
+
+    python benchmarks/download_throughput.py --size-mb 256
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+
+from Download_manager import DownloadThread
+from local_server import LocalServer
+
+
+class LegacyDownloadThread(DownloadThread):
+    """The original DownloadThread.run loop, kept for comparison."""
+
+    def run(self):
+        response = requests.get(self.url, stream=True)
+        response.raise_for_status()
+        total_size = int(response.headers.get('content-length', 0))
+        downloaded_size = 0
+        with open(self.save_path, 'wb') as file:
+            for chunk in response.iter_content(chunk_size=1024):
+                if chunk:
+                    file.write(chunk)
+                    downloaded_size += len(chunk)
+                    self.progress.emit(int((downloaded_size / total_size) * 100))
+        self.finished.emit("Download completed!")
+
+
+def run_download(thread_class, url, save_path):
+    """Run a download on its own thread while the main thread delivers its signals, like the GUI does."""
+    thread = thread_class(url, save_path, segments=1)
+    signals = [0]
+    thread.progress.connect(lambda value: signals.__setitem__(0, signals[0] + 1))
+    loop = QEventLoop()
+    thread.finished.connect(lambda message: loop.quit())
+    thread.error.connect(lambda message: (print(message), loop.quit()))
+    started = time.perf_counter()
+    thread.start()
+    loop.exec()
+    thread.wait()
+    return time.perf_counter() - started, signals[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    size = args.size_mb * 1024 * 1024
+    with LocalServer(ranges=False) as server, tempfile.TemporaryDirectory() as directory:
+        url = server.url(size)
+        server.payload(size)
+        save_path = os.path.join(directory, "download.bin")
+        print(f"{'variant':<10} {'seconds':>8} {'MB/s':>8} {'signals':>9}")
+        for name, thread_class in (("legacy", LegacyDownloadThread), ("current", DownloadThread)):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, signals = run_download(thread_class, url, save_path)
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, signals)
+            elapsed, signals = best
+            print(f"{name:<10} {elapsed:>8.2f} {args.size_mb / elapsed:>8.1f} {signals:>9}")
+    del app
+
+
+if __name__ == "__main__":
+    main()
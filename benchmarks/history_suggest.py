@@ -0,0 +1,93 @@
+"""Measure omnibox suggestion latency over a large history database.
+
+Run from the repository root:
+
+    python benchmarks/history_suggest.py --rows 1000000
+
+Filling the database takes a minute or two; pass --keep to reuse it on the next run.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmark_filter import generate_vocabulary, percentile, zipf_sampler
+from History_manager import HistoryStore, frecency
+
+QUERIES = ["github python", "dashboard", "wiki", "news.com", "zzz", "mail", "c", "https://www.q"]
+
+
+def fill(store, rows, seed=1):
+    rng = random.Random(seed)
+    words = generate_vocabulary(rng, 30000)
+    pick_words = zipf_sampler(rng, words)
+    hosts = zipf_sampler(rng, [f"{word}.{rng.choice(['com', 'org', 'io', 'net'])}" for word in rng.sample(words, 20000)])
+    now = time.time()
+    db = store.connection(wait=True)
+    batch = []
+    for place_id in range(1, rows + 1):
+        title = " ".join(word.capitalize() for word in pick_words(rng.randint(2, 8)))
+        url = f"https://www.{hosts(1)[0]}/{'/'.join(pick_words(rng.randint(1, 4)))}?id={place_id}"
+        visits = int(rng.paretovariate(1.2))
+        last_visit = now - rng.uniform(0, 180 * 24 * 60 * 60)
+        batch.append((url, title, visits, last_visit, frecency(visits, last_visit)))
+        if len(batch) == 10000:
+            with db:
+                db.executemany("INSERT INTO places (url, title, visit_count, last_visit, frecency)"
+                                     " VALUES (?, ?, ?, ?, ?)", batch)
+            batch = []
+    with db:
+        db.executemany("INSERT INTO places (url, title, visit_count, last_visit, frecency)"
+                             " VALUES (?, ?, ?, ?, ?)", batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--keep", action="store_true", help="keep the database in the temp folder for later runs")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), f"history-benchmark-{args.rows}.db")
+    if not args.keep and os.path.exists(path):
+        os.remove(path)
+    store = HistoryStore(path)
+    try:
+        if not len(store):
+            started = time.perf_counter()
+            fill(store, args.rows)
+            print(f"fill: {time.perf_counter() - started:.0f} s for {args.rows} rows, "
+                  f"{os.path.getsize(path) / (1024 * 1024):.0f} MB")
+
+        print(f"{'query':<16} {'shown':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        all_timings = []
+        for query in QUERIES:
+            timings = []
+            for length in range(1, len(query) + 1):  # One lookup per keystroke
+                started = time.perf_counter()
+                rows = store.suggest(query[:length])
+                timings.append((time.perf_counter() - started) * 1000)
+            all_timings.extend(timings)
+            print(f"{query:<16} {len(rows):>6} {statistics.median(timings):>8.2f} "
+                  f"{percentile(timings, 0.95):>8.2f} {max(timings):>8.2f}")
+        print(f"{'all keystrokes':<16} {'':>6} {statistics.median(all_timings):>8.2f} "
+              f"{percentile(all_timings, 0.95):>8.2f} {max(all_timings):>8.2f}")
+
+        started = time.perf_counter()
+        for place_id in range(1000):
+            store.record_visit(f"https://benchmark.example/{place_id}", "Benchmark page")
+        print(f"record_visit: {(time.perf_counter() - started) * 1000 / 1000:.4f} ms per call on the caller's thread")
+    finally:
+        store.close()
+        if not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
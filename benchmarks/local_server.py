@@ -0,0 +1,142 @@
+"""Local stand-in HTTP server used by the benchmarks, so runs never touch the network."""
+import os
+import re
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+CORPUS_PAGES = 8  # /page/<n>.html for n below this
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et"
+         " dolore magna aliqua").split()
+
+
+def corpus_page(number):
+    """A fixed HTML page: text, a table and images that grow with the page number, plus one style sheet."""
+    paragraphs = "".join(
+        "<p>" + " ".join(WORDS[(paragraph + word) % len(WORDS)] for word in range(60)) + "</p>"
+        for paragraph in range(20 * (number + 1)))
+    rows = "".join(f"<tr><td>{row}</td><td>{WORDS[row % len(WORDS)]}</td></tr>" for row in range(50 * number))
+    images = "".join(f'<img src="/asset/{number * 10 + image}.svg" width="64" height="64">'
+                     for image in range(2 * number + 1))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Corpus page {number}</title>'
+            f'<link rel="stylesheet" href="/asset/{number}.css"></head>'
+            f'<body><h1>Corpus page {number}</h1>{images}{paragraphs}<table>{rows}</table></body></html>'
+            ).encode("utf-8")
+
+
+def corpus_asset(number, extension):
+    if extension == "css":
+        return (f"body {{ font-family: sans-serif; margin: {number % 5 + 1}em; }}"
+                " td { border: 1px solid #ccc; padding: 2px; } img { margin: 2px; }").encode("utf-8")
+    hue = number * 37 % 360
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">'
+            f'<circle cx="32" cy="32" r="30" fill="hsl({hue}, 60%, 50%)"/></svg>').encode("utf-8")
+
+
+class Server(ThreadingHTTPServer):
+    request_queue_size = 256  # The default listen backlog of 5 drops connects from busy clients
+
+
+class LocalServer:
+    """Serves /<size>.bin payloads of random bytes, optionally with byte range support and 304 revalidation.
+
+    Also serves a fixed corpus of pages for page load benchmarks at /page/<n>.html. latency (seconds) delays every
+    response, to stand in for the round trip to a remote server.
+    """
+
+    def __init__(self, ranges=True, latency=0.0):
+        self.ranges = ranges
+        self.latency = latency
+        self.payloads = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this Nagle stalls every keep-alive request
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def do_HEAD(self):
+                self.respond(send_body=False)
+
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def respond(self, send_body):
+                if server.latency:
+                    time.sleep(server.latency)
+                data, content_type = server.resource(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{len(data)}"'
+                if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                status, body, headers = 200, memoryview(data), []
+                range_header = self.headers.get("Range")
+                if server.ranges and range_header:
+                    start, end = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header).groups()
+                    start, end = int(start), int(end) if end else len(data) - 1
+                    status, body = 206, body[start:end + 1]
+                    headers.append(("Content-Range", f"bytes {start}-{end}/{len(data)}"))
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Last-Modified", LAST_MODIFIED)
+                self.send_header("ETag", etag)
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+
+    def payload(self, size):
+        with self._lock:
+            if size not in self.payloads:
+                self.payloads[size] = os.urandom(size)
+            return self.payloads[size]
+
+    def resource(self, path):
+        """Return the body and content type served at path, or (None, None)."""
+        match = re.fullmatch(r"/(\d+)\.bin", path)
+        if match:
+            return self.payload(int(match.group(1))), "application/octet-stream"
+        match = re.fullmatch(r"/page/(\d+)\.html", path)
+        if match and int(match.group(1)) < CORPUS_PAGES:
+            return corpus_page(int(match.group(1))), "text/html; charset=utf-8"
+        match = re.fullmatch(r"/asset/(\d+)\.(css|svg)", path)
+        if match:
+            extension = match.group(2)
+            return corpus_asset(int(match.group(1)), extension), "text/css" if extension == "css" else "image/svg+xml"
+        return None, None
+
+    def url(self, size):
+        return f"http://127.0.0.1:{self.httpd.server_port}/{size}.bin"
+
+    def page_url(self, number):
+        return f"http://127.0.0.1:{self.httpd.server_port}/page/{number}.html"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
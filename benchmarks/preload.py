@@ -0,0 +1,93 @@
+"""Time opening a page from the search bar with and without it being prerendered while the user typed.
+
+Run from the repository root:
+
+    python benchmarks/preload.py --rounds 16 --latency 0.3
+
+The local server delays every response by --latency seconds to stand in for a remote site. Each round loads a
+corpus page straight away, then types the same URL into a Preloader, waits --pause seconds as a user picking the
+suggestion would, and opens it with take(). Times run from opening the page to its load finishing.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QEventLoop, QSettings, QTimer, QUrl
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWebEngineWidgets import QWebEnginePage, QWebEngineProfile, QWebEngineView
+
+import Preloader
+from History_manager import frecency
+from local_server import CORPUS_PAGES, LocalServer
+
+LOAD_TIMEOUT_MS = 30 * 1000
+
+
+def wait(signal=None, seconds=None):
+    loop = QEventLoop()
+    if signal is not None:
+        signal.connect(loop.quit)
+    QTimer.singleShot(LOAD_TIMEOUT_MS if seconds is None else int(seconds * 1000), loop.quit)
+    loop.exec_()
+    if signal is not None:
+        signal.disconnect(loop.quit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--pause", type=float, default=1.0)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    profile = QWebEngineProfile()  # Off the record, and without a cache so every round goes to the server
+    profile.setHttpCacheType(QWebEngineProfile.NoCache)
+    view = QWebEngineView()
+    view.setPage(QWebEnginePage(profile, view))
+    view.resize(1200, 800)
+    view.show()
+
+    with tempfile.TemporaryDirectory() as directory, LocalServer(latency=args.latency) as server:
+        settings = QSettings(os.path.join(directory, "settings.ini"), QSettings.IniFormat)
+        settings.setValue("preload/prerender", True)
+        settings.setValue("preload/metered", "unmetered")
+        settings.setValue("preload/max_prerenders_per_hour", args.rounds)
+        preloader = Preloader.Preloader(profile, settings)
+        cold, prerendered = [], []
+        for round_number in range(args.rounds):
+            url = server.page_url(round_number % CORPUS_PAGES)
+
+            started = time.perf_counter()
+            view.load(QUrl(url))
+            wait(view.loadFinished)
+            cold.append(time.perf_counter() - started)
+
+            preloader.predict(Preloader.without_scheme(url), "", (url, frecency(10, time.time())))
+            wait(seconds=Preloader.PRERENDER_DELAY_MS / 1000 + args.pause)
+            started = time.perf_counter()
+            page, loaded = preloader.take(url)
+            if page is None:
+                sys.exit(f"Round {round_number}: nothing was prerendered")
+            page.setParent(view)
+            previous = view.page()
+            view.setPage(page)
+            if not loaded:
+                wait(page.loadFinished)
+            prerendered.append(time.perf_counter() - started)
+            previous.deleteLater()
+        summary = Preloader.stats_summary(settings)
+
+    print(f"{'open':<14} {'runs':>5} {'median ms':>10} {'max ms':>8}")
+    for name, times in (("cold load", cold), ("prerendered", prerendered)):
+        print(f"{name:<14} {len(times):>5} {statistics.median(times) * 1000:>10.0f} {max(times) * 1000:>8.0f}")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
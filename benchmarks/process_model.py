@@ -0,0 +1,129 @@
+"""Compare renderer process count and memory across process model settings, to pick one empirically.
+
+Run from the repository root:
+
+    python benchmarks/process_model.py --tabs 12 --output process_model.json
+
+Chromium reads its switches once per process, so each configuration runs in a fresh browser process that opens
+the same corpus pages (spread over several local "sites") and reports what Process_model.webengine_processes sees.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_server import CORPUS_PAGES, LocalServer
+
+SITES = ("127.0.0.1", "localhost")  # Different hosts are different sites to Chromium
+SETTLE_SECONDS = 2.0  # Let renderers finish starting up and allocating before measuring
+
+# Name -> process settings, as stored under process/ in QSettings
+CONFIGURATIONS = {
+    "default": {},
+    "per-site": {"model": "site"},
+    "limit-2": {"renderer_limit": 2},
+    "per-site, limit-1, 128 MB heap": {"model": "site", "renderer_limit": 1, "v8_heap_mb": 128},
+    "software rendering": {"gpu": "software"},
+    "single process": {"model": "single"},
+}
+
+
+class Settings(dict):
+    """Enough of QSettings for Process_model.chromium_flags."""
+
+    def value(self, key, default=None, type=None):
+        value = self.get(key.split("/", 1)[1], default)
+        return type(value) if type is not None else value
+
+
+def worker(port, tabs):
+    """Open tabs in a browser window and print the process readout as JSON."""
+    from PyQt5.QtCore import QEventLoop, QTimer, QUrl
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+    import Process_model
+    from Tab_manager import process_rss
+
+    app = QApplication(sys.argv[:1])
+    views = []
+    loop = QEventLoop()
+    pending = [tabs]
+
+    def loaded(ok):
+        pending[0] -= 1
+        if not pending[0]:
+            loop.quit()
+
+    for number in range(tabs):
+        view = QWebEngineView()
+        view.resize(1024, 768)
+        view.show()
+        view.loadFinished.connect(loaded)
+        host = SITES[number % len(SITES)]
+        view.load(QUrl(f"http://{host}:{port}/page/{number % CORPUS_PAGES}.html"))
+        views.append(view)
+    QTimer.singleShot(60 * 1000, loop.quit)
+    loop.exec_()
+    settle = QEventLoop()
+    QTimer.singleShot(int(SETTLE_SECONDS * 1000), settle.quit)
+    settle.exec_()
+
+    processes = Process_model.webengine_processes()
+    renderers = processes.get("renderer", (0, 0))
+    browser = process_rss(os.getpid())
+    print(json.dumps({
+        "flags": os.environ.get(Process_model.FLAGS_VARIABLE, ""),
+        "tabs_loaded": tabs - pending[0],
+        "renderers": renderers[0],
+        "renderer_mb": round(renderers[1] / (1024 * 1024), 1),
+        "browser_mb": round(browser / (1024 * 1024), 1),
+        "total_mb": round((browser + sum(rss for count, rss in processes.values())) / (1024 * 1024), 1),
+        "processes": {kind: count for kind, (count, rss) in processes.items()},
+    }))
+    del views, app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, default=12)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--worker", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.tabs)
+        return
+
+    import Process_model
+    results = {}
+    with LocalServer() as server:
+        port = server.httpd.server_port
+        print(f"{'configuration':<32} {'renderers':>9} {'renderer MB':>12} {'total MB':>9} {'seconds':>8}")
+        for name, values in CONFIGURATIONS.items():
+            environment = dict(os.environ)
+            flags = Process_model.chromium_flags(Settings(values))
+            environment[Process_model.FLAGS_VARIABLE] = " ".join(
+                environment.get(Process_model.FLAGS_VARIABLE, "").split() + flags)
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", str(port),
+                                     "--tabs", str(args.tabs)], env=environment, capture_output=True, text=True)
+            lines = output.stdout.strip().splitlines()
+            if output.returncode or not lines:
+                print(f"{name:<32} failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(lines[-1])
+            result["seconds"] = round(time.perf_counter() - started, 2)
+            results[name] = result
+            print(f"{name:<32} {result['renderers']:>9} {result['renderer_mb']:>12.0f} {result['total_mb']:>9.0f}"
+                  f" {result['seconds']:>8.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time opening a link in the running browser against starting a new one.
+
+Run from the repository root:
+
+    python benchmarks/single_instance.py --links 20
+
+A first browser is started on a throwaway profile and its own instance name, then main.py is launched once per
+link the way another application would, and must hand the link over and exit. The cold start it is compared with
+is main.py --new-instance --profile-startup, which exits after the first page has loaded.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Single_instance
+from local_server import CORPUS_PAGES, LocalServer
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+START_TIMEOUT = 60  # Seconds for the first browser to start listening
+
+
+def launch(arguments, environment):
+    """Run main.py to completion; returns (seconds, exit code)."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, MAIN] + arguments, env=environment, capture_output=True)
+    return time.perf_counter() - started, result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=20)
+    parser.add_argument("--cold-starts", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as profile, LocalServer() as server:
+        environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+                           XDG_CONFIG_HOME=profile, XDG_DATA_HOME=profile, XDG_CACHE_HOME=profile)
+        environment[Single_instance.NAME_VARIABLE] = os.environ[Single_instance.NAME_VARIABLE] = \
+            f"ShieldBrowser-benchmark-{os.getpid()}"
+
+        cold = [launch(["--new-instance", "--profile-startup", server.page_url(0)], environment)[0]
+                for _ in range(args.cold_starts)]
+
+        browser = subprocess.Popen([sys.executable, MAIN, server.page_url(0)], env=environment,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + START_TIMEOUT
+            while not Single_instance.is_running():
+                if browser.poll() is not None or time.monotonic() > deadline:
+                    sys.exit("The first browser did not start listening")
+                time.sleep(0.1)
+            forwarded = []
+            for number in range(args.links):
+                seconds, code = launch([server.page_url(number % CORPUS_PAGES)], environment)
+                if code:
+                    sys.exit(f"Link {number} was not handed over (exit code {code})")
+                forwarded.append(seconds)
+        finally:
+            browser.terminate()
+            browser.wait()
+
+    print(f"{'launch':<22} {'runs':>5} {'median ms':>10} {'max ms':>8}")
+    for name, times in (("cold start", cold), ("link to running", forwarded)):
+        print(f"{name:<22} {len(times):>5} {statistics.median(times) * 1000:>10.0f} {max(times) * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
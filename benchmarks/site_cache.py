@@ -0,0 +1,70 @@
+"""Time favicon and title lookups from the site cache, cold from disk and warm from memory, and batched writes.
+
+Run from the repository root:
+
+    python benchmarks/site_cache.py --hosts 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QColor, QIcon, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+import Site_cache
+
+
+def icon(number):
+    pixmap = QPixmap(Site_cache.ICON_SIZE, Site_cache.ICON_SIZE)
+    pixmap.fill(QColor.fromHsv(number % 360, 200, 200))
+    return QIcon(pixmap)
+
+
+def timed(function, count):
+    """Microseconds per call of function(number) over range(count)."""
+    started = time.perf_counter()
+    for number in range(count):
+        function(number)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    icons = [icon(number) for number in range(args.hosts)]
+    url = "https://site{}.example/page".format
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, Site_cache.SITE_CACHE_FILE)
+        cache = Site_cache.SiteCache(path)
+        results = [("set icon + title", timed(lambda n: (cache.set_icon(url(n), icons[n]),
+                                                         cache.set_title(url(n), f"Site {n}")), args.hosts))]
+        started = time.perf_counter()
+        cache.flush()
+        results.append(("flush (per host)", (time.perf_counter() - started) / args.hosts * 1e6))
+        cache.close()
+
+        cache = Site_cache.SiteCache(path)
+        warm = min(args.hosts, Site_cache.MEMORY_ICONS)
+        results.append(("icon, cold", timed(lambda n: cache.icon(url(n)), args.hosts)))
+        results.append(("icon, warm", timed(lambda n: cache.icon(url(n % warm)), args.hosts)))
+        results.append(("title, cold", timed(lambda n: cache.title(url(n)), args.hosts)))
+        results.append(("title, warm", timed(lambda n: cache.title(url(n % warm)), args.hosts)))
+        results.append(("unknown host", timed(lambda n: cache.icon(f"https://missing{n % warm}.example/"), args.hosts)))
+        cache.close()
+
+    print(f"{'operation':<20} {'us/call':>9}")
+    for name, microseconds in results:
+        print(f"{name:<20} {microseconds:>9.1f}")
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Run the browser and download hot path benchmarks headless and write the results as JSON.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --output after.json --compare results.json
+
+Everything runs offline against the local HTTP server on the offscreen Qt platform, with settings, profile and
+caches in a temporary folder (through the XDG directories), so runs start from the same state and never touch
+the real browser profile.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import weakref
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_server import CORPUS_PAGES, LocalServer
+
+BENCHMARKS = ("pages", "tabs", "downloads", "bookmarks")
+PAGE_TIMEOUT_MS = 30000
+
+
+def isolate(directory):
+    """Point settings, profile and caches at directory; must run before Qt is imported."""
+    for name in ("XDG_CONFIG_HOME", "XDG_DATA_HOME", "XDG_CACHE_HOME"):
+        os.environ[name] = os.path.join(directory, name.lower())
+        os.makedirs(os.environ[name], exist_ok=True)
+
+
+def summarize(values, digits=2):
+    values = sorted(values)
+    return {
+        "p50": round(statistics.median(values), digits),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], digits),
+        "max": round(values[-1], digits),
+        "n": len(values),
+    }
+
+
+def milliseconds(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def wait_for(signal, timeout_ms=PAGE_TIMEOUT_MS):
+    """Run the event loop until signal fires; returns its arguments, or None on timeout."""
+    from PyQt5.QtCore import QEventLoop, QTimer
+    loop = QEventLoop()
+    result = []
+    handler = lambda *args: (result.append(args), loop.quit())
+    signal.connect(handler)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec_()
+    signal.disconnect(handler)
+    return result[0] if result else None
+
+
+def drain_deletions():
+    """Deliver pending deleteLater() calls, the way returning to the event loop would."""
+    from PyQt5.QtCore import QCoreApplication, QEvent
+    for _ in range(3):  # Deleting a widget can post more deletions for its children
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        QCoreApplication.processEvents()
+
+
+def memory_mb(window):
+    """Resident memory of the browser process and of the renderers of its open tabs, in MB."""
+    from Tab_manager import process_rss
+    renderers = window.tab_lifecycle.renderer_usage()
+    return {
+        "browser_rss_mb": round(process_rss(os.getpid()) / (1024 * 1024), 1),
+        "renderer_rss_mb": round(sum(rss for rss, _ in renderers.values()) / (1024 * 1024), 1),
+    }
+
+
+def bench_pages(window, server, rounds):
+    """Load every corpus page in the current tab; the first round starts with an empty HTTP cache."""
+    webview = window.tab_widget.currentWidget()
+    results = {}
+    load_times = {"cold": [], "warm": []}
+    for round_number in range(rounds):
+        for number in range(CORPUS_PAGES):
+            webview.load(server.page_url(number))
+            metrics = wait_for(window.page_metrics.metrics_ready)
+            if metrics is None:
+                raise RuntimeError(f"Corpus page {number} did not load within {PAGE_TIMEOUT_MS} ms")
+            metrics = metrics[1]
+            load_times["cold" if round_number == 0 else "warm"].append(metrics["load_ms"])
+            page = results.setdefault(f"page_{number}", {"load_ms": [], "dom_content_loaded_ms": []})
+            page["load_ms"].append(metrics["load_ms"])
+            if metrics.get("dom_content_loaded_ms") is not None:
+                page["dom_content_loaded_ms"].append(metrics["dom_content_loaded_ms"])
+    for page in results.values():
+        for key, values in list(page.items()):
+            page[key] = summarize(values, 1) if values else None
+    results["cold_load_ms"] = summarize(load_times["cold"], 1)
+    if load_times["warm"]:
+        results["warm_load_ms"] = summarize(load_times["warm"], 1)
+    return results
+
+
+def bench_tabs(window, server, cycles, warmup=10):
+    """Open and close tabs through Browser.add_new_tab/close_tab and check that closed tabs are freed."""
+    from PyQt5 import sip
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+    from PyQt5.QtWidgets import QApplication
+
+    def live_views():
+        return sum(isinstance(widget, QWebEngineView) for widget in QApplication.allWidgets())
+
+    def cycle(number, timings):
+        started = time.perf_counter()
+        window.add_new_tab(server.page_url(number % CORPUS_PAGES))
+        timings["add_ms"].append(milliseconds(started))
+        webview = window.tabs[-1]
+        started = time.perf_counter()
+        loaded = wait_for(webview.loadFinished)
+        timings["load_ms"].append(milliseconds(started))
+        if loaded is None:
+            timings["timeouts"] += 1
+        started = time.perf_counter()
+        window.close_tab(window.tab_widget.indexOf(webview))
+        timings["close_ms"].append(milliseconds(started))
+        started = time.perf_counter()
+        drain_deletions()
+        timings["delete_ms"].append(milliseconds(started))
+        return webview
+
+    scratch = {"add_ms": [], "load_ms": [], "close_ms": [], "delete_ms": [], "timeouts": 0}
+    for number in range(warmup):  # Renderer start-up and first-use allocations are not churn
+        cycle(number, scratch)
+    gc.collect()
+    views_before = live_views()
+    memory_before = memory_mb(window)
+
+    timings = {"add_ms": [], "load_ms": [], "close_ms": [], "delete_ms": [], "timeouts": 0}
+    closed = []
+    for number in range(cycles):
+        closed.append(weakref.ref(cycle(number, timings)))
+    drain_deletions()
+    gc.collect()
+    memory_after = memory_mb(window)
+
+    # A wrapper that outlives its tab means something in the browser still holds on to the closed view
+    lingering = [ref() for ref in closed if ref() is not None]
+    results = {key: summarize(values) for key, values in timings.items() if key != "timeouts"}
+    results.update({
+        "cycles": cycles,
+        "load_timeouts": timings["timeouts"],
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+        "browser_rss_growth_mb_per_100_tabs": round(
+            (memory_after["browser_rss_mb"] - memory_before["browser_rss_mb"]) * 100 / cycles, 2),
+        "web_views_not_deleted": sum(not sip.isdeleted(view) for view in lingering),
+        "python_wrappers_still_referenced": len(lingering),
+        "web_view_count_change": live_views() - views_before,
+    })
+    return results
+
+
+def bench_downloads(server, sizes_mb, chunk_sizes_kb, repeat):
+    """DownloadThread throughput for each file size, fixed chunk size and connection count."""
+    import Download_manager
+    from PyQt5.QtCore import QEventLoop
+
+    def run(url, save_path, segments):
+        thread = Download_manager.DownloadThread(url, save_path, segments=segments)
+        loop = QEventLoop()
+        errors = []
+        thread.finished.connect(lambda message: loop.quit())
+        thread.error.connect(lambda message: (errors.append(message), loop.quit()))
+        started = time.perf_counter()
+        thread.start()
+        loop.exec_()
+        thread.wait()
+        if errors:
+            raise RuntimeError(errors[0])
+        return time.perf_counter() - started
+
+    adaptive = (Download_manager.MIN_CHUNK_SIZE, Download_manager.MAX_CHUNK_SIZE)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        save_path = os.path.join(directory, "download.bin")
+        for size_mb in sizes_mb:
+            size = size_mb * 1024 * 1024
+            url = server.url(size)
+            server.payload(size)  # Generate the payload outside the timing
+            for chunk_kb in list(chunk_sizes_kb) + [None]:
+                if chunk_kb is None:
+                    Download_manager.MIN_CHUNK_SIZE, Download_manager.MAX_CHUNK_SIZE = adaptive
+                else:
+                    Download_manager.MIN_CHUNK_SIZE = Download_manager.MAX_CHUNK_SIZE = chunk_kb * 1024
+                try:
+                    for segments in (1, Download_manager.DEFAULT_SEGMENTS):
+                        seconds = min(run(url, save_path, segments) for _ in range(repeat))
+                        chunk = "adaptive" if chunk_kb is None else f"{chunk_kb}kb"
+                        results[f"{size_mb}mb_{chunk}_{segments}conn"] = {
+                            "seconds": round(seconds, 4),
+                            "mb_per_s": round(size_mb / seconds, 1),
+                        }
+                finally:
+                    Download_manager.MIN_CHUNK_SIZE, Download_manager.MAX_CHUNK_SIZE = adaptive
+    return results
+
+
+def bench_bookmarks(window, counts, toggles):
+    """Toggle the current page's bookmark and rebuild the bookmark list with the Bookmark Manager open."""
+    from bookmark_filter import generate_bookmarks
+    from Bookmark_manager import BookmarkManager, BookmarkStore
+
+    results = {}
+    saved_store = window.bookmarks
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            store = BookmarkStore(os.path.join(directory, "bookmarks.db"))
+            with store.db:
+                store.db.executemany(
+                    "INSERT INTO bookmarks (id, title, url, folder, created) VALUES (?, ?, ?, ?, ?)",
+                    [(bookmark.id, bookmark.title, bookmark.url, "", 0.0) for bookmark in generate_bookmarks(count)])
+            window.bookmarks = store
+            try:
+                started = time.perf_counter()
+                dialog = BookmarkManager(window, store)
+                dialog.show()
+                drain_deletions()
+                open_ms = milliseconds(started)
+                started = time.perf_counter()
+                store.index()
+                index_ms = milliseconds(started)
+
+                toggle_times = []
+                for _ in range(toggles):
+                    started = time.perf_counter()
+                    window.toggle_bookmark()
+                    toggle_times.append(milliseconds(started))
+                rebuild_times, filter_times = [], []
+                for _ in range(max(1, toggles // 10)):
+                    started = time.perf_counter()
+                    dialog.model.set_filter(None)
+                    rebuild_times.append(milliseconds(started))
+                    started = time.perf_counter()
+                    dialog.apply_filter("wiki")
+                    filter_times.append(milliseconds(started))
+                dialog.close()
+                dialog.deleteLater()
+                drain_deletions()
+            finally:
+                window.bookmarks = saved_store
+                store.db.close()
+            results[str(count)] = {
+                "open_manager_ms": round(open_ms, 1),
+                "build_index_ms": round(index_ms, 1),
+                "toggle_ms": summarize(toggle_times, 3),
+                "rebuild_list_ms": summarize(rebuild_times),
+                "filter_list_ms": summarize(filter_times),
+            }
+    return results
+
+
+def flatten(results, prefix=""):
+    """Map dotted paths to every number in a results tree."""
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare(baseline, current):
+    old, new = flatten(baseline["benchmarks"]), flatten(current["benchmarks"])
+    print(f"\n{'metric':<64} {'baseline':>12} {'current':>12} {'change':>8}")
+    for path in sorted(old.keys() & new.keys()):
+        if path.endswith(".n"):
+            continue
+        change = f"{(new[path] - old[path]) * 100 / old[path]:+.1f}%" if old[path] else ""
+        print(f"{path:<64} {old[path]:>12} {new[path]:>12} {change:>8}")
+
+
+def parse_list(text):
+    return [int(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="results of an earlier run to compare against")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"comma separated subset of {BENCHMARKS}")
+    parser.add_argument("--page-rounds", type=int, default=5)
+    parser.add_argument("--tab-cycles", type=int, default=100)
+    parser.add_argument("--download-sizes-mb", type=parse_list, default=[1, 16, 128])
+    parser.add_argument("--chunk-sizes-kb", type=parse_list, default=[16, 128, 1024])
+    parser.add_argument("--download-repeat", type=int, default=3)
+    parser.add_argument("--bookmarks", type=parse_list, default=[10000, 100000])
+    parser.add_argument("--bookmark-toggles", type=int, default=100)
+    args = parser.parse_args()
+    selected = [name for name in args.only.split(",") if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    workspace = tempfile.TemporaryDirectory()
+    isolate(workspace.name)
+
+    from PyQt5.QtCore import QT_VERSION_STR, PYQT_VERSION_STR, QSettings
+    from PyQt5.QtWidgets import QApplication
+    import Session_manager
+    import Theme_manager
+    from main import Browser
+
+    Theme_manager.prepare_application()
+    app = QApplication(sys.argv[:1])
+    app.setOrganizationName("MyBrowser")
+    app.setApplicationName("Shield Browser")
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "arguments": vars(args),
+        },
+        "benchmarks": {},
+    }
+    benchmarks = report["benchmarks"]
+
+    with LocalServer() as server:
+        needs_window = set(selected) & {"pages", "tabs", "bookmarks"}
+        window = None
+        if needs_window:
+            # Start on a corpus page rather than the default search page, which would need the network
+            with open(Session_manager.session_path(), "w", encoding="utf-8") as file:
+                json.dump({"current": 0, "tabs": [{"url": server.page_url(0)}]}, file)
+            QSettings("MyBrowser", "Settings").setValue("session/restore", True)
+            started = time.perf_counter()
+            window = Browser()
+            window.show()
+            window.finish_startup()
+            wait_for(window.tab_widget.currentWidget().loadFinished)
+            benchmarks["startup_ms"] = round(milliseconds(started), 1)
+
+        for name in selected:
+            print(f"running {name}...", flush=True)
+            if name == "pages":
+                benchmarks["page_load"] = bench_pages(window, server, args.page_rounds)
+            elif name == "tabs":
+                benchmarks["tab_churn"] = bench_tabs(window, server, args.tab_cycles)
+            elif name == "downloads":
+                benchmarks["download_throughput"] = bench_downloads(
+                    server, args.download_sizes_mb, args.chunk_sizes_kb, args.download_repeat)
+            elif name == "bookmarks":
+                benchmarks["bookmarks"] = bench_bookmarks(window, args.bookmarks, args.bookmark_toggles)
+
+        if window is not None:
+            window.close()
+            drain_deletions()
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+    print(f"wrote {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+    del app
+    workspace.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Measure how long switching between light and dark mode takes with many tabs open.
+
+Run from the repository root:
+
+    python benchmarks/theme_toggle.py --tabs 50
+
+Each switch is timed up to the repaint of the window, and compared with swapping a window style sheet.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QToolBar,
+                             QLineEdit, QComboBox, QPushButton, QLabel, QStatusBar)
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+
+import Theme_manager
+
+FRAME_MS = 1000 / 60
+
+# What the window style sheets looked like before the palette themes
+DARK_STYLE_SHEET = """
+    QWidget { background-color: #2E2E2E; color: white; }
+    QLineEdit, QComboBox, QPushButton { background-color: #555; color: white; border: 1px solid #333; }
+    QPushButton:hover { background-color: #777; }
+"""
+LIGHT_STYLE_SHEET = """
+    QWidget { background-color: white; color: black; }
+    QLineEdit, QComboBox, QPushButton { background-color: #f0f0f0; color: black; border: 1px solid #ccc; }
+    QPushButton:hover { background-color: #ddd; }
+"""
+
+
+def build_window(tabs):
+    """A window shaped like the browser's: toolbar, a row of buttons, tabs and a status bar."""
+    window = QMainWindow()
+    window.resize(1200, 800)
+    container = QWidget()
+    layout = QVBoxLayout(container)
+    toolbar = QToolBar()
+    toolbar.addWidget(QLineEdit())
+    toolbar.addWidget(QComboBox())
+    toolbar.addWidget(QPushButton("Search"))
+    layout.addWidget(toolbar)
+    button_row = QHBoxLayout()
+    for text in ("Zoom In", "Zoom Out", "Dark Mode", "Download", "Bookmark", "Manage Bookmarks",
+                 "Download Manager", "Settings"):
+        button_row.addWidget(QPushButton(text))
+    layout.addLayout(button_row)
+    tab_widget = QTabWidget()
+    views = []
+    for index in range(tabs):
+        view = QWebEngineView()
+        tab_widget.addTab(view, f"Tab {index}")
+        views.append(view)
+    layout.addWidget(tab_widget)
+    window.setCentralWidget(container)
+    status_bar = QStatusBar()
+    status_bar.addPermanentWidget(QLabel("Tabs: 50 live"))
+    window.setStatusBar(status_bar)
+    return window, views
+
+
+def measure(app, window, switch, rounds):
+    timings = []
+    for round_number in range(rounds):
+        started = time.perf_counter()
+        switch(round_number % 2 == 0)
+        app.processEvents()  # Polish and layout
+        window.repaint()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:<28} median {statistics.median(timings):6.1f} ms, max {max(timings):6.1f} ms"
+          f" ({sum(timing < FRAME_MS for timing in timings)}/{len(timings)} within a 60 Hz frame)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=40)
+    args = parser.parse_args()
+
+    Theme_manager.prepare_application()
+    app = QApplication(sys.argv[:1])
+    theme = Theme_manager.ThemeManager(app)
+    theme.apply("light")
+    window, views = build_window(args.tabs)
+    window.show()
+    app.processEvents()
+
+    report("palette theme", measure(
+        app, window, lambda dark: theme.apply("dark" if dark else "light", [view.page() for view in views]),
+        args.rounds))
+    theme.apply("light")
+    report("window style sheet", measure(
+        app, window, lambda dark: window.setStyleSheet(DARK_STYLE_SHEET if dark else LIGHT_STYLE_SHEET), args.rounds))
+
+
+if __name__ == "__main__":
+    main()
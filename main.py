@@ -1,18 +1,50 @@
 import sys
+import time
+
+STARTUP_STARTED = time.perf_counter()  # Taken before the Qt imports so --profile-startup can include them
+
+if __name__ == "__main__":
+    # A link opened from another app goes to the running browser before the web engine is even imported
+    import Single_instance
+    if Single_instance.forward(sys.argv[1:]):
+        sys.exit(0)
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLineEdit, QPushButton, QComboBox, QTabWidget, QToolBar, QAction,
-                             QTabBar, QMenu, QStatusBar, QMenuBar, QDialog, QFormLayout,
-                             QCheckBox, QSpinBox, QLabel, QDialogButtonBox, QGroupBox, QTableView, QFileDialog,
-                             QListWidget, QAbstractItemView, QMessageBox)
-from PyQt5.QtCore import QUrl, QSettings, Qt, QTimer, QStandardPaths, QAbstractTableModel, QVariant, QProcess
+                             QMenu, QStatusBar, QMenuBar, QDialog, QFormLayout,
+                             QCheckBox, QSpinBox, QLabel, QDialogButtonBox, QGroupBox, QFileDialog,
+                             QAbstractItemView, QMessageBox, QDockWidget, QToolButton)
+from PyQt5.QtCore import (QUrl, QSettings, Qt, QTimer, QStandardPaths, QModelIndex,
+                          QObject, QEvent, pyqtSignal)
 from PyQt5.QtGui import QIcon, QMouseEvent, QColor
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEnginePage, QWebEngineProfile
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEnginePage
 import os
+import Tab_manager
+import Session_manager
+from Tab_manager import TabLifecycleManager
+from Session_manager import LazyTab
+from Bookmark_manager import BookmarkManager, BookmarkStore
+import History_manager
+from History_manager import HistoryStore, OmniboxCompleter
+from Content_blocker import ContentBlocker
+import Profile_manager
+import Page_metrics
+import Theme_manager
+import Process_model
+import Closed_tabs
+import Single_instance
+import Site_cache
+import Preloader
+
+FIRST_PAINT_TIMEOUT_MS = 1000  # Start the web engine anyway if the window is not painted by then
+PROFILE_TIMEOUT_MS = 30 * 1000  # --profile-startup reports without a first page load after this long
 
 
 class Browser(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None, urls=None):
         super().__init__()
+        self.profiler = profiler
+        self.pending_urls = list(urls or [])  # Opened as tabs once the web engine has started
 
         self.setWindowTitle("Shield Browser")
         self.setGeometry(100, 100, 1200, 800)
@@ -21,11 +53,25 @@ class Browser(QMainWindow):
 
         self.settings = QSettings("MyBrowser", "Settings")
         self.tabs = []
-        self.history_stack = []
-        self.current_history_index = -1
-        self.is_dark_mode = False
-        self.bookmarks = []  # List to store bookmarks
-        self.download_history = []  # List to store download history
+        self.history = HistoryStore()  # Visited pages, written in the background and ranked by frecency
+        self.apply_history_limits()
+        self.is_dark_mode = self.settings.value("appearance/dark_mode", False, type=bool)
+        self.theme = Theme_manager.ThemeManager(QApplication.instance())
+        self.bookmarks = BookmarkStore()  # Persistent bookmarks, indexed by URL
+        self.site_cache = Site_cache.SiteCache(parent=self)  # Favicons and titles, shown before pages load
+        self.download_history = None  # Download_history.DownloadHistoryStore, opened with the Download Manager
+        self.download_cache = None  # Download_cache.ContentCache, opened with the Download Manager
+        self.download_dock = None  # Created the first time downloads are needed
+        self.download_cookies = []  # Browser cookies waiting for the download engine to be loaded
+        self.profile = None  # Created with the web engine in finish_startup
+        self.content_blocker = None  # Installed with the web engine in finish_startup
+        self.blocked_counts = {}  # Web view -> requests blocked since its current page started loading
+        self.page_metrics = Page_metrics.PageLoadMonitor(self)  # Load times of every tab, logged to disk
+        self.page_metrics.metrics_ready.connect(self.on_page_metrics)
+        self.closed_tabs = Closed_tabs.ClosedTabs(self.settings, parent=self)  # Kept with snapshots for reopening
+        self.revalidations = {}  # Reopened web view still showing its snapshot -> Closed_tabs.Revalidation
+        self.preloader = None  # Preloader.Preloader, started with the web engine in finish_startup
+        self.swapped_pages = {}  # Web view showing a prerendered page -> the discarded page it replaced
 
         layout = QVBoxLayout()
         container = QWidget()
@@ -61,9 +107,32 @@ class Browser(QMainWindow):
         add_tab_action.triggered.connect(self.add_new_tab)
         toolbar.addAction(add_tab_action)
 
+        # Reopen Closed Tab, with a menu of the recently closed ones
+        self.reopen_action = QAction(QIcon.fromTheme("edit-undo"), "Reopen Closed Tab", self)
+        self.reopen_action.setShortcut("Ctrl+Shift+T")
+        self.reopen_action.setToolTip("Reopen the last closed tab (Ctrl+Shift+T)")
+        self.reopen_action.triggered.connect(lambda: self.reopen_closed_tab())
+        self.closed_tabs_menu = QMenu(self)
+        self.closed_tabs_menu.aboutToShow.connect(self.build_closed_tabs_menu)
+        self.reopen_action.setMenu(self.closed_tabs_menu)
+        toolbar.addAction(self.reopen_action)
+        toolbar.widgetForAction(self.reopen_action).setPopupMode(QToolButton.MenuButtonPopup)
+        self.closed_tabs.changed.connect(self.update_reopen_action)
+        self.update_reopen_action()
+
+        # Performance HUD in the status bar
+        self.hud_action = QAction(QIcon.fromTheme("utilities-system-monitor"), "Performance", self)
+        self.hud_action.setCheckable(True)
+        self.hud_action.setShortcut("Ctrl+Shift+P")
+        self.hud_action.setToolTip("Show page load metrics for the current tab (Ctrl+Shift+P)")
+        self.hud_action.toggled.connect(self.toggle_performance_hud)
+        toolbar.addAction(self.hud_action)
+
         # Search Bar and Engine Combo
         self.search_bar = QLineEdit()
         toolbar.addWidget(self.search_bar)
+        self.omnibox = OmniboxCompleter(self.history, self.bookmarks, self.search_bar, self.site_cache)
+        self.omnibox.activated[QModelIndex].connect(self.open_suggestion)
 
         self.search_engine_combo = QComboBox()
         toolbar.addWidget(self.search_engine_combo)
@@ -87,10 +156,13 @@ class Browser(QMainWindow):
         toolbar.addWidget(search_button)
 
         self.search_bar.returnPressed.connect(self.search)
+        self.search_bar.textEdited.connect(self.on_search_text_edited)  # After the omnibox has ranked its rows
 
         # Zoom and Dark Mode Buttons (One row below the search bar)
-        zoom_layout = QHBoxLayout()
-        layout.addLayout(zoom_layout)
+        button_bar = QWidget()
+        zoom_layout = QHBoxLayout(button_bar)
+        zoom_layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(button_bar)
 
         zoom_in_button = self.create_uniform_button("Zoom In", "zoom-in", self.zoom_in)
         zoom_layout.addWidget(zoom_in_button)
@@ -115,13 +187,15 @@ class Browser(QMainWindow):
         download_manager_button = self.create_uniform_button("Download Manager", None, self.execute_download_manager)
         zoom_layout.addWidget(download_manager_button)
 
+        settings_button = self.create_uniform_button("Settings", "preferences-system", self.open_settings)
+        zoom_layout.addWidget(settings_button)
+
         # Tab Widget
         self.tab_widget = QTabWidget()
         layout.addWidget(self.tab_widget)
 
-        self.tab_widget.setTabBar(CustomTabBar(self.tab_widget))
-
-        self.add_new_tab()
+        # Freezes and discards background tabs to keep renderer memory in check
+        self.tab_lifecycle = TabLifecycleManager(self.tab_widget, self.settings, self)
 
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
         self.tab_widget.setTabsClosable(True)
@@ -131,30 +205,97 @@ class Browser(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
 
+        self.tab_stats_label = QLabel()
+        self.status_bar.addPermanentWidget(self.tab_stats_label)
+        self.tab_lifecycle.stats_changed.connect(self.tab_stats_label.setText)
+        self.tab_lifecycle.emit_stats()
+
+        self.blocked_label = QLabel()
+        self.status_bar.addPermanentWidget(self.blocked_label)
+
+        # Clicking the HUD offers the metrics log for export
+        self.metrics_hud = QToolButton()
+        self.metrics_hud.setAutoRaise(True)
+        self.metrics_hud.setPopupMode(QToolButton.InstantPopup)
+        metrics_menu = QMenu(self.metrics_hud)
+        metrics_menu.addAction("Export Metrics as CSV...", lambda: self.export_page_metrics("csv"))
+        metrics_menu.addAction("Export Metrics as JSON...", lambda: self.export_page_metrics("json"))
+        self.metrics_hud.setMenu(metrics_menu)
+        self.status_bar.addWidget(self.metrics_hud)
+        self.hud_action.setChecked(self.settings.value("metrics/show_hud", False, type=bool))
+        self.metrics_hud.setVisible(self.hud_action.isChecked())
+
         # Initialize with the correct mode
         self.apply_theme()
+        self.mark_startup("window built")
+
+    def finish_startup(self):
+        """Start the web engine and open the first tabs; runs once the window is on screen."""
+        # One persistent profile for all tabs, so the disk cache and cookies survive restarts
+        self.profile = profile = Profile_manager.create_profile(self.settings, self)
+
+        # Downloads started by pages go through the same engine as the Download Manager
+        profile.downloadRequested.connect(self.handle_download_request)
+        profile.cookieStore().cookieAdded.connect(self.share_cookie_with_downloads)
+        profile.cookieStore().loadAllCookies()
+
+        # Ad and tracker blocking; the filter lists load in the background, so the first page may not wait for them
+        self.content_blocker = ContentBlocker(self)
+        self.content_blocker.enabled = self.settings.value("privacy/block_content", True, type=bool)
+        self.content_blocker.blocked.connect(self.on_request_blocked)
+        if hasattr(profile, "setUrlRequestInterceptor"):
+            profile.setUrlRequestInterceptor(self.content_blocker)
+        else:
+            profile.setRequestInterceptor(self.content_blocker)  # Qt before 5.13
+        self.content_blocker.load()
+        self.theme.set_profile(profile)  # Pages get dark mode from a profile script
+        self.preloader = Preloader.Preloader(profile, self.settings, self)
+        self.mark_startup("web engine started")
+
+        restored = self.settings.value("session/restore", True, type=bool) and self.restore_session()
+        if not (restored or self.pending_urls):
+            self.add_new_tab()
+        for url in self.pending_urls:
+            self.add_new_tab(url)
+        self.pending_urls = []
+        self.tab_widget.currentChanged.connect(self.on_current_tab_changed)
+        self.update_blocked_label()
+        self.mark_startup("first tab created")
+        if self.profiler is not None:
+            self.tab_widget.currentWidget().loadFinished.connect(self.profiler.first_load_finished)
+
+        # Save the session periodically too, so a crash loses at most a minute of tabs
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.save_session)
+        self.session_timer.start(Session_manager.AUTOSAVE_INTERVAL_MS)
+
+    def open_external_urls(self, urls):
+        """Open URLs handed over by a later launch of the browser, or a new tab if it was given none."""
+        if self.profile is None:
+            self.pending_urls += urls  # Still starting up; finish_startup opens them
+        else:
+            for url in urls or [None]:
+                self.add_new_tab(url)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def mark_startup(self, phase):
+        if self.profiler is not None:
+            self.profiler.mark(phase)
 
     def create_uniform_button(self, text, icon_name, callback):
         button = QPushButton(text)
         if icon_name:
             button.setIcon(QIcon.fromTheme(icon_name))
         button.clicked.connect(callback)
-        button.setStyleSheet(""" 
-            QPushButton {
-                background-color: white;
-                color: black;
-                border: 1px solid black;
-                border-radius: 5px;
-                padding: 5px;
-                margin: 3px;
-            }
-            QPushButton:hover {
-                background-color: #f0f0f0;
-            }
-        """)
         return button
 
     def search(self):
+        popup = self.omnibox.popup()
+        if popup.isVisible() and popup.currentIndex().isValid():
+            return  # Enter on a suggestion; open_suggestion loads it
         url = self.search_bar.text()
 
         # Get selected search engine or direct URL option
@@ -166,50 +307,307 @@ class Browser(QMainWindow):
                 url = "http://" + url  # Add http:// if no scheme is provided
             current_webview = self.tab_widget.currentWidget()
             if current_webview:
-                current_webview.load(QUrl(url))
+                self.navigate(current_webview, url)
         else:
             # Otherwise, use the selected search engine to search
             base_url = self.search_engines[selected_engine]
             url = base_url + url
             current_webview = self.tab_widget.currentWidget()
             if current_webview:
-                current_webview.load(QUrl(url))
+                self.navigate(current_webview, url)
 
         self.settings.setValue("default_search_engine", selected_engine)
 
-    def add_new_tab(self, url=None):
+    def on_search_text_edited(self, text):
+        if self.preloader is not None:
+            search_url = self.search_engines[self.search_engine_combo.currentText()]
+            self.preloader.predict(text, search_url, self.omnibox.top_suggestion())
+
+    def navigate(self, webview, url):
+        """Open a URL from the search bar, showing the page prerendered for it if there is one."""
+        page, loaded = None, False
+        if self.preloader is not None and webview not in self.revalidations:  # A snapshot's live page is on its way
+            page, loaded = self.preloader.take(url)
+        if page is None:
+            webview.load(QUrl(url))
+            return
+        previous = webview.page()
+        zoom = webview.zoomFactor()
+        page.setParent(webview)
+        webview.setPage(page)
+        webview.setZoomFactor(zoom)
+        self.reset_blocked_count(webview)
+        # The prerendered page has no history of its own, so Back swaps the old page in again
+        stale = self.swapped_pages.pop(webview, None)
+        if stale is not None:
+            stale.deleteLater()
+        if Tab_manager.HAS_LIFECYCLE:
+            previous.setVisible(False)
+            previous.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)  # Keeps the history, not the renderer
+            self.swapped_pages[webview] = previous
+        else:
+            previous.deleteLater()
+        if loaded:  # setPage does not emit loadFinished, so do what it would have triggered
+            self.update_tab_title(self.tab_widget.indexOf(webview), webview)
+            self.record_visit(webview, True)
+
+    def create_webview(self):
         webview = QWebEngineView()
+        webview.setPage(QWebEnginePage(self.profile, webview))
         webview.loadFinished.connect(lambda ok: self.update_tab_title(self.tab_widget.indexOf(webview), webview))
+        webview.loadFinished.connect(lambda ok: self.record_visit(webview, ok))
+        webview.loadStarted.connect(lambda: self.reset_blocked_count(webview))
+        # Titles and icons show up as soon as the page has them, not when it has finished loading
+        webview.titleChanged.connect(lambda title: self.on_title_changed(webview, title))
+        webview.iconChanged.connect(lambda icon: self.on_icon_changed(webview, icon))
+        self.site_cache.track(webview)
+        self.page_metrics.track(webview)
 
         settings = webview.settings()
         settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
+        return webview
+
+    def add_new_tab(self, url=None):
+        webview = self.create_webview()
 
-        index = self.tab_widget.addTab(webview, "Loading...")
+        url = url or "https://www.google.com"
+        index = self.tab_widget.addTab(webview, self.site_cache.icon(url), self.site_cache.title(url) or "Loading...")
+        self.tabs.append(webview)
+        self.tab_lifecycle.track(webview)
         self.tab_widget.setCurrentIndex(index)
+
+        webview.load(QUrl(url))
+
+    def restore_session(self):
+        """Recreate the saved tabs as placeholders; only the current one gets a web view straight away."""
+        session = Session_manager.load_session()
+        if session is None:
+            return False
+        self.tab_widget.blockSignals(True)  # Adding placeholders must not materialize them
+        try:
+            for entry in session["tabs"]:
+                placeholder = LazyTab(entry)
+                self.tab_widget.addTab(placeholder, self.site_cache.icon(entry.get("url", "")), placeholder.title)
+            current = min(max(session.get("current", 0), 0), self.tab_widget.count() - 1)
+            self.tab_widget.setCurrentIndex(current)
+        finally:
+            self.tab_widget.blockSignals(False)
+        self.materialize_tab(current)
+        return True
+
+    def on_current_tab_changed(self, index):
+        if isinstance(self.tab_widget.widget(index), LazyTab):
+            self.materialize_tab(index)
+        self.update_blocked_label()
+        self.update_metrics_hud()
+
+    def materialize_tab(self, index):
+        """Swap a restored placeholder for a real web view and load its saved history."""
+        placeholder = self.tab_widget.widget(index)
+        if not isinstance(placeholder, LazyTab):
+            return
+        entry = placeholder.entry
+        webview = self.create_webview()
+        self.tab_widget.blockSignals(True)
+        try:
+            self.tab_widget.insertTab(index, webview, self.tab_widget.tabIcon(index), placeholder.title)
+            self.tab_widget.removeTab(index + 1)
+            self.tab_widget.setCurrentIndex(index)
+        finally:
+            self.tab_widget.blockSignals(False)
+        placeholder.deleteLater()
+
         self.tabs.append(webview)
+        self.tab_lifecycle.track(webview)
+        self.tab_lifecycle.on_current_changed(index)  # Signals were blocked during the swap
+        self.load_entry(webview, entry)
+
+    def load_entry(self, webview, entry):
+        """Load a saved tab entry, with its back/forward history where it has one."""
+        if not (entry.get("history") and Session_manager.restore_history(webview.history(), entry["history"])):
+            webview.load(QUrl(entry.get("url") or "https://www.google.com"))
+        webview.setZoomFactor(entry.get("zoom", 1.0))
+
+    def save_session(self):
+        if self.tab_widget.count():  # Closed before startup finished; keep the previous session
+            Session_manager.save_session(self.tab_widget)
+
+    def record_visit(self, webview, ok):
+        url = webview.url()
+        if ok and url.scheme() in ("http", "https") and not self.tab_lifecycle.is_discarded(webview):
+            self.history.record_visit(url.toString(), webview.page().title())
+
+    def open_suggestion(self, index):
+        """Go straight to a suggested page, whatever search engine is selected."""
+        url = index.data(OmniboxCompleter.UrlRole)
+        current_webview = self.tab_widget.currentWidget()
+        if url and current_webview:
+            self.navigate(current_webview, url)
 
-        if url:
-            webview.load(QUrl(url))
+    def on_request_blocked(self, first_party_url, url):
+        """Count a blocked request against the tab showing the page that made it."""
+        current_webview = self.tab_widget.currentWidget()
+        candidates = [current_webview] + [webview for webview in self.tabs if webview is not current_webview]
+        for webview in candidates:
+            if webview in self.tabs and webview.url().matches(first_party_url, QUrl.RemoveFragment):
+                self.blocked_counts[webview] = self.blocked_counts.get(webview, 0) + 1
+                if webview is current_webview:
+                    self.update_blocked_label()
+                return
+
+    def reset_blocked_count(self, webview):
+        self.blocked_counts.pop(webview, None)
+        if webview is self.tab_widget.currentWidget():
+            self.update_blocked_label()
+
+    def update_blocked_label(self):
+        if self.content_blocker is None or not self.content_blocker.enabled:
+            self.blocked_label.setText("Blocking off")
         else:
-            webview.load(QUrl("https://www.google.com"))
+            self.blocked_label.setText(f"Blocked: {self.blocked_counts.get(self.tab_widget.currentWidget(), 0)}")
+
+    def toggle_performance_hud(self, visible):
+        self.settings.setValue("metrics/show_hud", visible)
+        self.metrics_hud.setVisible(visible)
+        self.update_metrics_hud()
+
+    def on_page_metrics(self, webview, metrics):
+        if webview is self.tab_widget.currentWidget():
+            self.update_metrics_hud()
+
+    def update_metrics_hud(self):
+        if not self.metrics_hud.isVisible():
+            return
+        metrics = self.page_metrics.latest.get(self.tab_widget.currentWidget())
+        self.metrics_hud.setText(Page_metrics.format_metrics(metrics) if metrics else "No page load measured yet")
+
+    def export_page_metrics(self, file_format):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Page Metrics", f"page_metrics.{file_format}",
+                                              f"{file_format.upper()} files (*.{file_format})")
+        if not path:
+            return
+        try:
+            if file_format == "csv":
+                Page_metrics.export_csv(path, self.page_metrics.path)
+            else:
+                Page_metrics.export_json(path, self.page_metrics.path)
+        except OSError as error:
+            QMessageBox.warning(self, "Error", f"Could not export the metrics: {error}")
+
+    def apply_history_limits(self):
+        self.history.expire(self.settings.value("history/max_days", History_manager.DEFAULT_MAX_DAYS, type=int),
+                            self.settings.value("history/max_entries", History_manager.DEFAULT_MAX_ENTRIES, type=int))
 
     def update_tab_title(self, index, webview):
-        title = webview.page().title() or "New Tab"
-        icon = webview.page().icon() or QIcon()
-        self.tab_widget.setTabIcon(index, icon)
+        if self.tab_lifecycle.is_discarded(webview):
+            return  # Keep the title and icon the tab had before it was discarded
+        url = webview.url().toString()
+        title = webview.page().title() or self.site_cache.title(url) or "New Tab"
+        icon = webview.page().icon()
+        self.tab_widget.setTabIcon(index, self.site_cache.icon(url) if icon.isNull() else icon)
         self.tab_widget.setTabText(index, title)
 
+    def on_title_changed(self, webview, title):
+        index = self.tab_widget.indexOf(webview)
+        # Until the page sets a title Chromium reports its URL, which is no better than the cached title
+        if index >= 0 and title and title != webview.url().toString() and not self.tab_lifecycle.is_discarded(webview):
+            self.tab_widget.setTabText(index, title)
+
+    def on_icon_changed(self, webview, icon):
+        index = self.tab_widget.indexOf(webview)
+        if index >= 0 and not icon.isNull() and not self.tab_lifecycle.is_discarded(webview):
+            self.tab_widget.setTabIcon(index, icon)
+
     def close_tab(self, index):
         if self.tab_widget.count() > 1:
             webview_to_close = self.tab_widget.widget(index)
             self.tab_widget.removeTab(index)
-            self.tabs.remove(webview_to_close)
+            if webview_to_close in self.tabs:  # Restored placeholders never became web views
+                revalidation = self.revalidations.pop(webview_to_close, None)
+                if revalidation is not None:
+                    revalidation.cancel()
+                    self.closed_tabs.push(revalidation.entry)  # Keeps the snapshot it is still showing
+                else:
+                    # The page outlives the tab until its snapshot is saved
+                    self.closed_tabs.push(Session_manager.tab_entry(webview_to_close), webview_to_close.page())
+                self.tabs.remove(webview_to_close)
+                self.tab_lifecycle.untrack(webview_to_close)
+                self.blocked_counts.pop(webview_to_close, None)
+                swapped = self.swapped_pages.pop(webview_to_close, None)
+                if swapped is not None:
+                    swapped.deleteLater()
+                self.page_metrics.untrack(webview_to_close)
+            else:
+                self.closed_tabs.push(webview_to_close.entry)
             webview_to_close.deleteLater()
 
+    def reopen_closed_tab(self, position=-1):
+        """Reopen a closed tab, showing its snapshot straight away while the live page loads behind it."""
+        if self.profile is None:
+            return  # The web engine has not started yet
+        entry = self.closed_tabs.pop(position)
+        if entry is None:
+            return
+        webview = self.create_webview()
+        index = self.tab_widget.addTab(webview, self.site_cache.icon(entry["url"]), entry.get("title") or entry["url"])
+        self.tabs.append(webview)
+        self.tab_lifecycle.track(webview)
+        self.tab_widget.setCurrentIndex(index)
+        snapshot_path = self.closed_tabs.snapshot_path(entry)
+        if snapshot_path is None:
+            self.load_entry(webview, entry)
+            return
+        revalidation = Closed_tabs.Revalidation(webview, entry, snapshot_path, self.profile, self)
+        revalidation.failed.connect(lambda: self.on_revalidation_failed(webview))
+        revalidation.finished.connect(lambda swapped: self.on_revalidation_finished(webview, swapped))
+        self.revalidations[webview] = revalidation
+
+    def on_revalidation_failed(self, webview):
+        if webview is self.tab_widget.currentWidget():
+            closed = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.revalidations[webview].entry["closed"]))
+            self.status_bar.showMessage(f"Offline copy from {closed}; the page could not be loaded. "
+                                        "Reload to try again.")
+
+    def on_revalidation_finished(self, webview, swapped):
+        revalidation = self.revalidations.pop(webview, None)
+        if revalidation is None:
+            return
+        self.closed_tabs.release(revalidation.entry)
+        revalidation.deleteLater()
+        if swapped:  # setPage does not emit loadFinished, so do what it would have triggered
+            self.update_tab_title(self.tab_widget.indexOf(webview), webview)
+            self.record_visit(webview, True)
+            if webview is self.tab_widget.currentWidget():
+                self.status_bar.clearMessage()
+
+    def build_closed_tabs_menu(self):
+        self.closed_tabs_menu.clear()
+        entries = self.closed_tabs.entries
+        for position in range(len(entries) - 1, -1, -1):
+            entry = entries[position]
+            title = entry.get("title") or entry["url"]
+            if entry.get("snapshot"):
+                title += "  (offline copy)"
+            action = self.closed_tabs_menu.addAction(title)
+            action.setToolTip(entry["url"])
+            action.triggered.connect(lambda checked, position=position: self.reopen_closed_tab(position))
+        if entries:
+            self.closed_tabs_menu.addSeparator()
+            self.closed_tabs_menu.addAction("Clear Closed Tabs", self.closed_tabs.clear)
+
+    def update_reopen_action(self):
+        self.reopen_action.setEnabled(bool(self.closed_tabs.entries))
+
     def navigate_back(self):
         current_webview = self.tab_widget.currentWidget()
         if current_webview and current_webview.history().canGoBack():
             current_webview.back()
+        elif current_webview in self.swapped_pages:
+            page = self.swapped_pages.pop(current_webview)
+            prerendered = current_webview.page()
+            current_webview.setPage(page)
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)  # Reloads where the tab was
+            prerendered.deleteLater()
 
     def navigate_forward(self):
         current_webview = self.tab_widget.currentWidget()
@@ -218,6 +616,9 @@ class Browser(QMainWindow):
 
     def reload_page(self):
         current_webview = self.tab_widget.currentWidget()
+        if current_webview in self.revalidations:
+            self.revalidations[current_webview].retry()  # Reloading an offline copy tries the live page again
+            return
         if current_webview:
             current_webview.reload()
 
@@ -240,42 +641,42 @@ class Browser(QMainWindow):
 
     def toggle_dark_mode(self):
         self.is_dark_mode = not self.is_dark_mode
+        self.settings.setValue("appearance/dark_mode", self.is_dark_mode)
         self.apply_theme()
 
     def apply_theme(self):
-        if self.is_dark_mode:
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: #2E2E2E;
-                    color: white;
-                }
-                QLineEdit, QComboBox, QPushButton {
-                    background-color: #555;
-                    color: white;
-                    border: 1px solid #333;
-                }
-                QPushButton:hover {
-                    background-color: #777;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: white;
-                    color: black;
-                }
-                QLineEdit, QComboBox, QPushButton {
-                    background-color: #f0f0f0;
-                    color: black;
-                    border: 1px solid #ccc;
-                }
-                QPushButton:hover {
-                    background-color: #ddd;
-                }
-            """)
+        pages = [webview.page() for webview in self.tabs if not self.tab_lifecycle.is_discarded(webview)]
+        self.theme.apply("dark" if self.is_dark_mode else "light", pages)
+
+    def open_settings(self):
+        dialog = SettingsDialog(self.settings, self)
+        dialog.cache_diagnostics_requested.connect(self.open_cache_diagnostics)
+        dialog.process_readout_requested.connect(self.open_process_readout)
+        if dialog.exec_() == QDialog.Accepted:
+            self.tab_lifecycle.load_settings()
+            self.tab_lifecycle.check()
+            self.apply_history_limits()
+            self.closed_tabs.load_settings()
+            if self.preloader is not None:
+                self.preloader.load_settings()
+            if self.profile is not None:
+                Profile_manager.apply_settings(self.profile, self.settings)
+            if self.content_blocker is not None:
+                self.content_blocker.enabled = self.settings.value("privacy/block_content", True, type=bool)
+                self.update_blocked_label()
+
+    def open_cache_diagnostics(self):
+        if self.profile is None:
+            return  # The web engine has not started yet
+        current_webview = self.tab_widget.currentWidget()
+        page = current_webview.page() if isinstance(current_webview, QWebEngineView) else None
+        Profile_manager.CacheDiagnostics(self.profile, page, self).exec_()
+
+    def open_process_readout(self):
+        Process_model.ProcessReadout(self.tab_lifecycle, self).exec_()
 
     def open_bookmark_manager(self):
-        dialog = BookmarkManager(self, self.bookmarks)
+        dialog = BookmarkManager(self, self.bookmarks, self.site_cache)
         dialog.exec_()
 
     def toggle_bookmark(self):
@@ -284,10 +685,8 @@ class Browser(QMainWindow):
             url = current_webview.url().toString()
             title = current_webview.page().title()
 
-            if url not in [bm[1] for bm in self.bookmarks]:
-                self.bookmarks.append((title, url))
-            else:
-                self.bookmarks = [bm for bm in self.bookmarks if bm[1] != url]
+            if not self.bookmarks.remove(url):
+                self.bookmarks.add(title, url)
 
     def open_downloads_folder(self):
         """Opens the system's Downloads folder."""
@@ -303,141 +702,315 @@ class Browser(QMainWindow):
         else:
             QMessageBox.warning(self, "Error", "Download folder not found.")
 
-    def execute_download_manager(self):
-        # Executes the external download manager
-        download_manager_path = os.path.join(os.path.dirname(__file__), 'Download_manager.py')
-        process = QProcess(self)
-        process.start(f'python "{download_manager_path}"')
-
+    def download_panel(self):
+        """Return the in-process Download Manager, docking it into the window on first use."""
+        if self.download_dock is None:
+            import Download_manager  # Pulls in requests, so it is only loaded once downloads are used
+            from Download_history import DownloadHistoryStore
+            from Download_cache import ContentCache
+            for entry in self.download_cookies:
+                self.set_download_cookie(*entry)
+            self.download_cookies = []
+            self.download_history = DownloadHistoryStore()
+            self.download_cache = ContentCache()
+            panel = Download_manager.DownloadManager(self.download_history, self.download_cache)
+            self.download_dock = QDockWidget("Download Manager", self)
+            self.download_dock.setWidget(panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.download_dock)
+        return self.download_dock.widget()
 
-class BookmarkManager(QDialog):
-    def __init__(self, parent=None, bookmarks=None):
-        super().__init__(parent)
-        self.setWindowTitle("Bookmark Manager")
-        self.setGeometry(300, 200, 400, 300)
-
-        self.layout = QVBoxLayout(self)
-
-        # List widget to display the bookmarks
-        self.bookmark_list = QListWidget(self)
-        self.layout.addWidget(self.bookmark_list)
-
-        # Button to visit selected bookmark
-        self.visit_button = QPushButton("Visit", self)
-        self.visit_button.clicked.connect(self.visit_bookmark)
-        self.layout.addWidget(self.visit_button)
-
-        # Button to remove selected bookmark
-        self.remove_button = QPushButton("Remove", self)
-        self.remove_button.clicked.connect(self.remove_selected_bookmark)
-        self.layout.addWidget(self.remove_button)
-
-        # Initialize bookmarks list
-        self.bookmarks = bookmarks if bookmarks else []
-        self.load_bookmarks()
-
-    def load_bookmarks(self):
-        """Load bookmarks and display them in the list."""
-        self.bookmark_list.clear()
-        for title, url in self.bookmarks:
-            self.bookmark_list.addItem(f"{title} - {url}")
-
-    def add_bookmark(self, title, url):
-        """Add a new bookmark and refresh the list."""
-        self.bookmarks.append((title, url))
-        self.load_bookmarks()
-
-    def visit_bookmark(self):
-        """Visit the selected bookmark."""
-        selected_items = self.bookmark_list.selectedItems()
-        for item in selected_items:
-            bookmark = item.text().split(" - ")
-            url = bookmark[1]
-
-            # Here, we simulate opening the URL in a new tab in a browser
-            # You should replace this with actual browser functionality in your project
-            print(f"Visiting: {url}")  # This simulates opening a URL in a new tab
-
-    def remove_selected_bookmark(self):
-        """Remove the selected bookmark(s) after confirmation."""
-        selected_items = self.bookmark_list.selectedItems()
-        if selected_items:
-            for item in selected_items:
-                bookmark = item.text().split(" - ")
-                url = bookmark[1]
-
-                # Confirm deletion for each selected bookmark
-                confirmation = QMessageBox.question(self, "Confirm Removal",
-                                                    f"Are you sure you want to remove the bookmark '{bookmark[0]}'?",
-                                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-
-                if confirmation == QMessageBox.Yes:
-                    # Remove the bookmark
-                    self.bookmarks = [bm for bm in self.bookmarks if bm[1] != url]
-            self.load_bookmarks()  # Reload the updated bookmark list
-
-    def exec_(self):
-        """Override exec_ to make sure the dialog is modal."""
-        super().exec_()
-        self.setModal(True)
-        self.raise_()  # Ensure it pops up above all other windows
-
-
-class CustomTabBar(QTabBar):
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.setStyleSheet("""
-            QTabBar::tab {
-                background-color: #F0F0F0;
-                color: black;
-                padding: 10px;
-                border: 1px solid #CCC;
-                margin-right: 2px;
-            }
-            QTabBar::tab:selected {
-                background-color: #D0D0D0;
-            }
-            QTabBar::tab:hover {
-                background-color: #E0E0E0;
-            }
-        """)
-
-class DownloadManager(QDialog):
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.setWindowTitle("Download Manager")
-        self.setGeometry(300, 200, 500, 400)
-        layout = QVBoxLayout(self)
-
-        self.download_history_view = QTableView(self)
-        layout.addWidget(self.download_history_view)
-
-        self.download_history_view.setModel(self.create_download_history_model())
-
-    def create_download_history_model(self):
-        class DownloadHistoryModel(QAbstractTableModel):
-            def __init__(self, data):
-                super().__init__()
-                self.data = data
+    def execute_download_manager(self):
+        self.download_panel()
+        self.download_dock.setVisible(not self.download_dock.isVisible() or self.download_dock.isFloating())
+        self.download_dock.raise_()
+
+    def handle_download_request(self, download):
+        """Hand page-triggered HTTP(S) downloads to the download engine instead of QtWebEngine."""
+        if self.closed_tabs.handle_download(download):
+            return  # A closed tab's snapshot being written
+        if download.url().scheme() not in ("http", "https"):
+            download.accept()  # blob: and data: URLs only exist inside the page
+            return
+        url = download.url().toString()
+        save_path = download.path()
+        download.cancel()
+        self.download_panel().enqueue(url, save_path)
+        self.download_dock.show()
+
+    def share_cookie_with_downloads(self, cookie):
+        """Mirror browser cookies into the download session so logged-in downloads keep working."""
+        entry = (bytes(cookie.name()).decode(errors="replace"), bytes(cookie.value()).decode(errors="replace"),
+                 cookie.domain(), cookie.path() or "/")
+        if self.download_dock is None:
+            self.download_cookies.append(entry)  # Handed over when the download engine is loaded
+        else:
+            self.set_download_cookie(*entry)
 
-            def rowCount(self, parent):
-                return len(self.data)
+    def set_download_cookie(self, name, value, domain, path):
+        import Download_manager
+        Download_manager.get_session().cookies.set(name, value, domain=domain, path=path)
 
-            def columnCount(self, parent):
-                return len(self.data[0]) if self.data else 0
+    def closeEvent(self, event):
+        self.save_session()
+        self.history.close()
+        self.site_cache.close()
+        if self.download_dock is not None:
+            self.download_dock.widget().shutdown()
+            self.download_history.close()
+            self.download_cache.close()
+        super().closeEvent(event)
 
-            def data(self, index, role):
-                if role == Qt.DisplayRole:
-                    return QVariant(self.data[index.row()][index.column()])
 
-        data = [(download["file"], download["url"], download["status"]) for download in self.parent().download_history]
-        return DownloadHistoryModel(data)
+class SettingsDialog(QDialog):
+    """Edits the browser settings stored in QSettings."""
 
-    def show_download_manager(self):
-        self.exec_()
+    cache_diagnostics_requested = pyqtSignal()
+    process_readout_requested = pyqtSignal()
 
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.setWindowTitle("Settings")
+        layout = QVBoxLayout(self)
 
-app = QApplication(sys.argv)
-window = Browser()
-window.show()
-app.exec_()
+        # Tab lifecycle
+        tabs_group = QGroupBox("Background Tabs", self)
+        tabs_form = QFormLayout(tabs_group)
+        self.freeze_after_input = self.create_spin_box(
+            "tabs/freeze_after_minutes", Tab_manager.DEFAULT_FREEZE_AFTER_MINUTES, 0, 24 * 60, " min")
+        tabs_form.addRow("Freeze after (0 = never):", self.freeze_after_input)
+        self.max_live_tabs_input = self.create_spin_box(
+            "tabs/max_live_tabs", Tab_manager.DEFAULT_MAX_LIVE_TABS, 0, 1000)
+        tabs_form.addRow("Max live tabs (0 = unlimited):", self.max_live_tabs_input)
+        self.memory_budget_input = self.create_spin_box(
+            "tabs/memory_budget_mb", Tab_manager.DEFAULT_MEMORY_BUDGET_MB, 0, 1024 * 1024, " MB")
+        tabs_form.addRow("Memory budget (0 = off):", self.memory_budget_input)
+        self.restore_session_input = self.create_check_box("session/restore", True)
+        tabs_form.addRow("Restore tabs on startup:", self.restore_session_input)
+        layout.addWidget(tabs_group)
+
+        # Recently closed tabs and their offline snapshots
+        closed_group = QGroupBox("Closed Tabs", self)
+        closed_form = QFormLayout(closed_group)
+        self.closed_tabs_input = self.create_spin_box(
+            "closed_tabs/max_tabs", Closed_tabs.DEFAULT_MAX_CLOSED_TABS, 0, 1000)
+        closed_form.addRow("Remember (0 = none):", self.closed_tabs_input)
+        self.snapshot_budget_input = self.create_spin_box(
+            "closed_tabs/snapshot_budget_mb", Closed_tabs.DEFAULT_SNAPSHOT_BUDGET_MB, 0, 100 * 1024, " MB")
+        closed_form.addRow("Offline copies (0 = off):", self.snapshot_budget_input)
+        layout.addWidget(closed_group)
+
+        # Preloading from the search bar
+        preload_group = QGroupBox("Preloading", self)
+        preload_form = QFormLayout(preload_group)
+        self.preconnect_input = self.create_check_box("preload/preconnect", Preloader.DEFAULT_PRECONNECT)
+        preload_form.addRow("Connect to likely sites while typing:", self.preconnect_input)
+        self.prerender_input = self.create_check_box("preload/prerender", Preloader.DEFAULT_PRERENDER)
+        preload_form.addRow("Load the top suggestion in advance:", self.prerender_input)
+        self.metered_input = self.create_combo_box(
+            "preload/metered", Preloader.DEFAULT_METERED, Preloader.METERED_NAMES)
+        preload_form.addRow("Metered connection:", self.metered_input)
+        self.max_preconnects_input = self.create_spin_box(
+            "preload/max_preconnects_per_minute", Preloader.DEFAULT_MAX_PRECONNECTS_PER_MINUTE, 0, 1000, " / min")
+        preload_form.addRow("Max connections:", self.max_preconnects_input)
+        self.max_prerenders_input = self.create_spin_box(
+            "preload/max_prerenders_per_hour", Preloader.DEFAULT_MAX_PRERENDERS_PER_HOUR, 0, 1000, " / hour")
+        preload_form.addRow("Max pages loaded in advance:", self.max_prerenders_input)
+        preload_form.addRow(QLabel(Preloader.stats_summary(self.settings), self))
+        layout.addWidget(preload_group)
+
+        # History retention
+        history_group = QGroupBox("History", self)
+        history_form = QFormLayout(history_group)
+        self.history_days_input = self.create_spin_box(
+            "history/max_days", History_manager.DEFAULT_MAX_DAYS, 0, 100 * 365, " days")
+        history_form.addRow("Keep pages for (0 = forever):", self.history_days_input)
+        self.history_entries_input = self.create_spin_box(
+            "history/max_entries", History_manager.DEFAULT_MAX_ENTRIES, 0, 10 * 1000 * 1000)
+        history_form.addRow("Max pages (0 = unlimited):", self.history_entries_input)
+        layout.addWidget(history_group)
+
+        # Content blocking
+        privacy_group = QGroupBox("Privacy", self)
+        privacy_form = QFormLayout(privacy_group)
+        self.block_content_input = self.create_check_box("privacy/block_content", True)
+        privacy_form.addRow("Block ads and trackers:", self.block_content_input)
+        layout.addWidget(privacy_group)
+
+        # Profile cache and storage
+        cache_group = QGroupBox("Cache and Storage", self)
+        cache_form = QFormLayout(cache_group)
+        self.cache_type_input = self.create_combo_box(
+            "profile/cache_type", Profile_manager.DEFAULT_CACHE_TYPE, Profile_manager.CACHE_TYPE_NAMES)
+        cache_form.addRow("HTTP cache:", self.cache_type_input)
+        self.cache_size_input = self.create_spin_box(
+            "profile/cache_size_mb", Profile_manager.DEFAULT_CACHE_SIZE_MB, 0, 1024 * 1024, " MB")
+        cache_form.addRow("Cache size (0 = automatic):", self.cache_size_input)
+        self.cookies_input = self.create_combo_box(
+            "profile/cookies", Profile_manager.DEFAULT_COOKIES, Profile_manager.COOKIE_POLICY_NAMES)
+        cache_form.addRow("Cookies:", self.cookies_input)
+        self.storage_path_input = QLineEdit(self.settings.value("profile/storage_path", ""), self)
+        self.storage_path_input.setPlaceholderText("Default (takes effect after restart)")
+        self.storage_path_input.setProperty("settings_key", "profile/storage_path")
+        cache_form.addRow("Profile folder:", self.storage_path_input)
+        diagnostics_button = QPushButton("Cache Diagnostics...", self)
+        diagnostics_button.clicked.connect(self.cache_diagnostics_requested)
+        cache_form.addRow(diagnostics_button)
+        layout.addWidget(cache_group)
+
+        # Chromium process model; the switches are only read when the web engine starts
+        process_group = QGroupBox("Processes (take effect after restart)", self)
+        process_form = QFormLayout(process_group)
+        self.process_model_input = self.create_combo_box(
+            "process/model", Process_model.DEFAULT_PROCESS_MODEL, Process_model.PROCESS_MODEL_NAMES)
+        process_form.addRow("Renderer processes:", self.process_model_input)
+        self.renderer_limit_input = self.create_spin_box(
+            "process/renderer_limit", Process_model.DEFAULT_RENDERER_LIMIT, 0, 100)
+        process_form.addRow("Max renderers (0 = automatic):", self.renderer_limit_input)
+        self.gpu_mode_input = self.create_combo_box(
+            "process/gpu", Process_model.DEFAULT_GPU_MODE, Process_model.GPU_MODE_NAMES)
+        process_form.addRow("Graphics:", self.gpu_mode_input)
+        self.v8_heap_input = self.create_spin_box(
+            "process/v8_heap_mb", Process_model.DEFAULT_V8_HEAP_MB, 0, 16 * 1024, " MB")
+        process_form.addRow("JavaScript heap per renderer (0 = default):", self.v8_heap_input)
+        readout_button = QPushButton("Show Processes...", self)
+        readout_button.clicked.connect(self.process_readout_requested)
+        process_form.addRow(readout_button)
+        layout.addWidget(process_group)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def create_spin_box(self, key, default, minimum, maximum, suffix=""):
+        spin_box = QSpinBox(self)
+        spin_box.setRange(minimum, maximum)
+        spin_box.setSuffix(suffix)
+        spin_box.setValue(self.settings.value(key, default, type=int))
+        spin_box.setProperty("settings_key", key)
+        return spin_box
+
+    def create_check_box(self, key, default):
+        check_box = QCheckBox(self)
+        check_box.setChecked(self.settings.value(key, default, type=bool))
+        check_box.setProperty("settings_key", key)
+        return check_box
+
+    def create_combo_box(self, key, default, choices):
+        """choices maps the stored value to the text shown."""
+        combo_box = QComboBox(self)
+        for value, text in choices.items():
+            combo_box.addItem(text, value)
+        combo_box.setCurrentIndex(max(combo_box.findData(self.settings.value(key, default)), 0))
+        combo_box.setProperty("settings_key", key)
+        return combo_box
+
+    def accept(self):
+        for spin_box in self.findChildren(QSpinBox):
+            self.settings.setValue(spin_box.property("settings_key"), spin_box.value())
+        for check_box in self.findChildren(QCheckBox):
+            self.settings.setValue(check_box.property("settings_key"), check_box.isChecked())
+        for combo_box in self.findChildren(QComboBox):
+            self.settings.setValue(combo_box.property("settings_key"), combo_box.currentData())
+        for line_edit in self.findChildren(QLineEdit):
+            if line_edit.property("settings_key"):  # Spin boxes have line edits of their own
+                self.settings.setValue(line_edit.property("settings_key"), line_edit.text().strip())
+        super().accept()
+
+
+class FirstPaintWatcher(QObject):
+    """Emits painted once, right after the window is first painted."""
+
+    painted = pyqtSignal()
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.fired = False
+        QApplication.instance().installEventFilter(self)
+        QTimer.singleShot(FIRST_PAINT_TIMEOUT_MS, self.fire)  # A minimized window may not paint at all
+
+    def eventFilter(self, watched, event):
+        if (event.type() == QEvent.Paint and not self.fired and isinstance(watched, QWidget)
+                and watched.window() is self.window):
+            QTimer.singleShot(0, self.fire)  # Let the rest of the window paint first
+        return False
+
+    def fire(self):
+        if not self.fired:
+            self.fired = True
+            QApplication.instance().removeEventFilter(self)
+            self.painted.emit()
+
+
+class StartupProfiler:
+    """Records when each startup phase finished, for --profile-startup."""
+
+    def __init__(self, started):
+        self.started = started
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        self.phases.append((phase, time.perf_counter()))
+
+    def first_load_finished(self, ok):
+        self.mark("first page loaded" if ok else "first page failed")
+        self.finish()
+
+    def finish(self):
+        if self.reported:
+            return
+        self.reported = True
+        print(f"{'phase':<22} {'since start':>12} {'step':>10}", file=sys.stderr)
+        previous = self.started
+        for phase, finished in self.phases:
+            print(f"{phase:<22} {(finished - self.started) * 1000:>9.1f} ms {(finished - previous) * 1000:>7.1f} ms",
+                  file=sys.stderr)
+            previous = finished
+        QApplication.instance().quit()
+
+
+def main(argv=None):
+    argv = list(sys.argv if argv is None else argv)
+    profiler = None
+    if "--profile-startup" in argv:
+        argv.remove("--profile-startup")
+        profiler = StartupProfiler(STARTUP_STARTED)
+        profiler.mark("imports")
+
+    new_instance = "--new-instance" in argv
+    if new_instance:
+        argv.remove("--new-instance")
+
+    Process_model.apply_flags(QSettings("MyBrowser", "Settings"))  # Chromium reads its switches only once
+    Theme_manager.prepare_application()
+    app = QApplication(argv)
+    app.setOrganizationName("MyBrowser")
+    app.setApplicationName("Shield Browser")
+    arguments = app.arguments()[1:]  # Without the options Qt took for itself
+    if profiler is not None:
+        profiler.mark("QApplication created")
+        QTimer.singleShot(PROFILE_TIMEOUT_MS, profiler.finish)
+
+    # Later launches hand their URLs to this browser instead of starting another one
+    instance_server = Single_instance.InstanceServer(app)
+    if profiler is None and not instance_server.listen() and not new_instance:
+        if Single_instance.forward(arguments):
+            return 0  # Another instance started at the same moment and got the server first
+
+    window = Browser(profiler, Single_instance.urls_from_arguments(arguments))
+    instance_server.urls_received.connect(window.open_external_urls)
+    window.show()
+    window.mark_startup("window shown")
+
+    # The web engine and the first page load wait until the window chrome is on screen
+    watcher = FirstPaintWatcher(window)
+    watcher.painted.connect(lambda: window.mark_startup("first paint"))
+    watcher.painted.connect(window.finish_startup)
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())